@@ -5,18 +5,21 @@ MIT License - Copyright (c) 2025 7DaysWithU@GitHub
 
 import os
 import sys
+import json
+import time
 import argparse
 import warnings
 import traceback
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 import eventlet
-from eventlet import wsgi
+from eventlet import wsgi, tpool
 from typing import Any
 
 from control import GeneralDispatch
-from utils.task import TaskManager
+from utils.task import TaskManager, Task, CancellationToken, ProgressReporter
+from common import TaskState
 
 warnings.filterwarnings('ignore', category = FutureWarning)
 
@@ -25,6 +28,26 @@ run = GeneralDispatch()
 
 task_manager = TaskManager(max_workers = 2)
 
+# 长轮询及事件流在事件循环中检查任务状态的间隔(s)
+TASK_POLL_INTERVAL = 0.1
+
+
+def get_config_path() -> str:
+    """
+    获得配置文件地址
+
+    :return: 配置文件地址
+    """
+
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    # DEBUG:   '../config/settings.json'
+    # PRODUCT: 'main/../config/settings.json'
+    return os.path.join(base_path, '../config/settings.json')
+
 
 @app.route('/api/SimpleAI/config', methods = ['POST'])
 def config() -> Any:
@@ -36,15 +59,9 @@ def config() -> Any:
     """
 
     try:
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(base_path, '../config/settings.json')
-
-        # DEBUG:   '../config/settings.json'
-        # PRODUCT: 'main/../config/settings.json'
+        config_path = get_config_path()
         run.configure(config_path)
+        task_manager.configure(config_path)
 
     except Exception:
         return jsonify({'error': 'Errors occurred during configuring', 'message': str(traceback.format_exc())}), 500
@@ -79,7 +96,16 @@ def train() -> Any:
 
     try:
         incremental = request.args.get('incremental', type = str_to_bool)
-        task_id = task_manager.submit(train_task, incremental)
+        # 训练数据及配置未变化时默认跳过训练, force=true时强制重新训练
+        force = request.args.get('force', default = False, type = str_to_bool) or False
+        # 增量更新耗时短, 优先于全量训练执行; 相同参数的训练请求会被合并为同一任务
+        priority = 1 if incremental else 0
+        if task_manager.isolated:
+            # 子进程训练完成后, 服务进程通过 load_model加载新模型
+            task_id = task_manager.submit(GeneralDispatch.train_in_process, get_config_path(), incremental, force, priority = priority)
+            task_manager.on_success(task_id, reload_model)
+        else:
+            task_id = task_manager.submit(train_task, incremental, force, priority = priority)
 
     except Exception:
         return jsonify({'error': 'Errors occurred during training', 'message': str(traceback.format_exc())}), 500
@@ -112,19 +138,149 @@ def train_status(task_id: str):
         return jsonify(response), task.state.value[0]
 
 
+def wait_task(task_id: str, last_state: TaskState | None, timeout: float) -> Task:
+    """
+    在事件循环中等待任务状态变化
+
+    :param task_id: 任务 id
+    :param last_state: 调用方已知的任务状态, 为 None时立即返回
+    :param timeout: 最长等待时间(s)
+    :return: 任务
+
+    注意
+    ------
+    - 以 eventlet.sleep轮询而不占用 tpool线程, 长时间等待不会使预测及渲染请求排队等待 tpool
+    """
+
+    deadline = time.monotonic() + timeout
+    while True:
+        task = task_manager.wait(task_id, last_state, 0)
+        remaining = deadline - time.monotonic()
+        if task.state is not last_state or task.is_finished() or remaining <= 0:
+            return task
+        eventlet.sleep(min(remaining, TASK_POLL_INTERVAL))
+
+
+@app.route('/api/SimpleAI/train/status/<task_id>/wait', methods = ['GET'])
+def train_status_wait(task_id: str):
+    """
+    长轮询训练任务状态, 状态与 state参数不同、任务结束或超过 timeout(s)时返回
+
+    :param task_id: 任务 id
+    :return: 返回任务的当前状态和结果
+    """
+
+    try:
+        last_state = request.args.get('state', default = None, type = lambda name: TaskState[name])
+        timeout = min(request.args.get('timeout', default = 30.0, type = float), 300.0)
+
+        # 在事件循环中让出等待以免阻塞其他请求, 之后再经 result()完成对最终状态的 ACK
+        wait_task(task_id, last_state, timeout)
+        task = task_manager.result(task_id)
+
+    except Exception:
+        return jsonify({'error': f"Error occurred while waiting for task '{task_id}' status", 'message': str(traceback.format_exc())}), 500
+
+    else:
+        response = {
+            'task_id': task.task_id,
+            'state': task.state.name,
+            'info': task.info
+        }
+        return jsonify(response), task.state.value[0]
+
+
+@app.route('/api/SimpleAI/train/status/<task_id>/stream', methods = ['GET'])
+def train_status_stream(task_id: str):
+    """
+    以 server-sent events推送训练任务状态和进度变化, 任务结束后关闭连接
+
+    :param task_id: 任务 id
+    :return: 事件流
+    """
+
+    def events():
+        """
+        生成状态变化事件
+
+        :return: 事件流
+        """
+
+        last_state, last_info = None, None
+        while True:
+            task = wait_task(task_id, last_state, 2.0)
+            if task.state is last_state and task.info == last_info:
+                # 无变化时发送注释行保活
+                yield ': keep-alive\n\n'
+                continue
+
+            # 状态未变时 info的变化即为训练进度的更新
+            last_state, last_info = task.state, task.info
+            if task.is_finished():
+                task_manager.result(task_id)
+            yield f"event: {task.state.name}\ndata: {json.dumps({'task_id': task.task_id, 'state': task.state.name, 'info': task.info}, default = str)}\n\n"
+            if task.is_finished():
+                return
+
+    try:
+        # 建立事件流前先校验任务存在
+        task_manager.wait(task_id, None, 0)
+
+    except Exception:
+        return jsonify({'error': f"Error occurred while streaming task '{task_id}' status", 'message': str(traceback.format_exc())}), 500
+
+    else:
+        return Response(stream_with_context(events()), mimetype = 'text/event-stream')
+
+
+@app.route('/api/SimpleAI/train/cancel/<task_id>', methods = ['POST'])
+def train_cancel(task_id: str):
+    """
+    取消训练任务, 排队中的任务直接撤销, 执行中的任务在下一个 batch前退出
+
+    :param task_id: 任务 id
+    :return: 返回任务的当前状态
+    """
+
+    try:
+        task = task_manager.cancel(task_id)
+
+    except Exception:
+        return jsonify({'error': f"Error occurred while cancelling task '{task_id}'", 'message': str(traceback.format_exc())}), 500
+
+    else:
+        return jsonify({'task_id': task.task_id, 'state': task.state.name}), 202
+
+
+def reload_model(_: Any) -> None:
+    """
+    子进程训练任务成功后在服务进程中重新加载模型
+
+    :param _: 训练任务返回值
+    :return: 无
+    """
+
+    run.load_model()
+
+
 @task_manager.long_task
-def train_task(incremental: bool) -> Any:
+def train_task(incremental: bool,
+               force: bool = False,
+               cancel_token: CancellationToken = None,
+               progress_reporter: ProgressReporter = None) -> Any:
     """
     训练模型
 
     :param incremental: 是否增量训练
-    :return: 状态体
-    :return: 状态码
+    :param force: 是否在训练输入未变化时仍强制训练
+    :param cancel_token: 取消令牌, 由 TaskManager注入
+    :param progress_reporter: 进度报告器, 由 TaskManager注入
+    :return: 各数据集加载及各模型训练的耗时统计
     """
 
+    # 训练完成后各模型控制类会自行发布新模型, 无需再次从磁盘加载
     with run:
-        run.train(incremental)
-        run.load_model()
+        return run.train(incremental, cancel_token, progress_reporter, force)
 
 
 @app.route('/api/SimpleAI/load', methods = ['POST'])
@@ -156,8 +312,10 @@ def predict(X: int) -> Any:
     """
 
     try:
-        with run:
-            result = run.use([X]).tolist()
+        # 推理不访问数据库, 无需进入数据库使用区间
+        # 并发的单样本请求由微批处理器合并为一次前向传播, 在原生线程中等待以免阻塞事件循环
+        future = run.micro_batcher.submit([X])
+        result = [tpool.execute(future.result).tolist()]
 
     except Exception:
         return jsonify({'error': 'Errors occurred during recommending to personal', 'message': str(traceback.format_exc())}), 500
@@ -166,6 +324,100 @@ def predict(X: int) -> Any:
         return jsonify(result), 200
 
 
+@app.route('/api/SimpleAI/predict/stats', methods = ['GET'])
+def predict_stats() -> Any:
+    """
+    获得单样本预测的微批处理统计
+
+    :return: 批次数、请求数、平均批大小及各批大小出现次数
+    :return: 状态码
+    """
+
+    return jsonify(run.micro_batcher.statistics()), 200
+
+
+@app.route('/api/SimpleAI/predict/batch', methods = ['POST'])
+def predict_batch() -> Any:
+    """
+    批量获得预测值, 请求体格式为 {"X": [x1, x2, ...]} 或多特征的 {"X": [[x11, x12], [x21, x22], ...]}
+
+    :return: 所有输入值对应的预测值列表
+    :return: 状态码
+    """
+
+    body = request.get_json(silent = True)
+    if not isinstance(body, dict) or not isinstance(body.get('X'), list) or not body['X']:
+        return jsonify({'error': "Request body must be a JSON object with a non-empty list 'X'"}), 400
+
+    # 先校验形状和类型, 格式错误的输入返回 400而不是在推理时出错
+    X = body['X']
+    if all(isinstance(row, list) for row in X):
+        if len({len(row) for row in X}) != 1 or not X[0]:
+            return jsonify({'error': "Rows of 'X' must be non-empty lists of the same length"}), 400
+        values = [value for row in X for value in row]
+    else:
+        values = X
+    if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return jsonify({'error': "'X' must be a list of numbers or a list of equal-length lists of numbers"}), 400
+
+    try:
+        result = run.use_batch(X).squeeze(1).tolist()
+
+    except ValueError as e:
+        # 特征数与模型不一致
+        return jsonify({'error': str(e)}), 400
+
+    except Exception:
+        return jsonify({'error': 'Errors occurred during batch predicting', 'message': str(traceback.format_exc())}), 500
+
+    else:
+        return jsonify(result), 200
+
+
+@app.route('/api/SimpleAI/metrics/<model_name>', methods = ['GET'])
+def metrics(model_name: str) -> Any:
+    """
+    获得指定模型最近一次训练的逐次迭代指标
+
+    :param model_name: 模型名称
+    :return: 指标记录列表
+    :return: 状态码
+    """
+
+    try:
+        records = run.get_metrics(model_name)
+
+    except Exception:
+        return jsonify({'error': f"Error occurred while reading metrics of '{model_name}'", 'message': str(traceback.format_exc())}), 500
+
+    else:
+        return jsonify(records), 200
+
+
+@app.route('/api/SimpleAI/metrics/<model_name>/plot', methods = ['GET'])
+def metrics_plot(model_name: str) -> Any:
+    """
+    按需渲染指定模型最近一次训练的损失曲线, format参数为 svg(默认)或 png
+
+    :param model_name: 模型名称
+    :return: 图像文件
+    """
+
+    image_format = request.args.get('format', default = 'svg')
+    if image_format not in ('svg', 'png'):
+        return jsonify({'error': f"Unsupported image format '{image_format}'"}), 400
+
+    try:
+        # 渲染为 CPU密集操作, 在原生线程中执行以免阻塞事件循环
+        image_path = tpool.execute(run.render_metrics, model_name, image_format)
+
+    except Exception:
+        return jsonify({'error': f"Error occurred while rendering metrics of '{model_name}'", 'message': str(traceback.format_exc())}), 500
+
+    else:
+        return send_file(image_path, mimetype = 'image/svg+xml' if image_format == 'svg' else 'image/png')
+
+
 def opening_show() -> None:
     """
     启动动画
@@ -198,8 +450,28 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description = "Run Flask app with custom host and port")
     parser.add_argument('--host', type = str, default = '127.0.0.1', help = "Set the host (default: 127.0.0.1)")
     parser.add_argument('--port', type = int, default = 5000, help = "Set the port (default: 5000)")
+    parser.add_argument('--train', action = 'store_true', help = "Train all models once with the current settings and exit")
+    parser.add_argument('--incremental', action = 'store_true', help = "Train incrementally, used with --train")
+    parser.add_argument('--force', action = 'store_true', help = "Train even if the inputs are unchanged, used with --train")
+    parser.add_argument('--node-rank', type = int, default = None,
+                        help = "Rank of this host in distributed training, used with --train (default: settings.json)")
+
+    args = parser.parse_args()
+
+    # 数据并行训练时其余主机以此方式与 0号主机同时启动训练, 训练结束即退出
+    if args.train:
+        if args.node_rank is not None:
+            os.environ['NODE_RANK'] = str(args.node_rank)
+        run.configure(get_config_path())
+        with run:
+            run.train(args.incremental, force = args.force)
+        run.close()
+        sys.exit(0)
 
     opening_show()
 
-    args = parser.parse_args()
-    eventlet.wsgi.server(eventlet.listen((args.host, args.port)), app)
+    try:
+        eventlet.wsgi.server(eventlet.listen((args.host, args.port)), app)
+    finally:
+        # 服务停止时关闭全部数据库连接
+        run.close()
@@ -2,13 +2,19 @@ from . import decorator
 
 from .enum import (ConnectionMode,
                    Addition,
+                   SplitMode,
                    ModelSaveMode,
                    Checkpoint,
+                   Solver,
+                   ExecutorBackend,
                    TaskState)
 
 __all__ = ['decorator',
            'ConnectionMode',
            'Addition',
+           'SplitMode',
            'ModelSaveMode',
            'Checkpoint',
+           'Solver',
+           'ExecutorBackend',
            'TaskState']
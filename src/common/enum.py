@@ -42,6 +42,19 @@ class SamplingFormat(Enum):
     LISTWISE = 'ListWise'
 
 
+class SplitMode(Enum):
+    """
+    数据集训练测试划分方式
+    """
+
+    # 随机划分
+    RANDOM = 'RANDOM'
+    # 按标签分层划分, 连续标签按分位数分箱后分层
+    STRATIFIED = 'STRATIFIED'
+    # 按样本原有顺序划分, 前段为训练集, 后段为测试集
+    TEMPORAL = 'TEMPORAL'
+
+
 class ModelSaveMode(Enum):
     """
     模型保存方式
@@ -51,6 +64,8 @@ class ModelSaveMode(Enum):
     FRAME = 'FRAME'
     # 保存模型参数
     STATE = 'STATE'
+    # 训练被取消时保存的可续训检查点
+    RESUME = 'RESUME'
 
 
 class Checkpoint(Enum):
@@ -62,6 +77,38 @@ class Checkpoint(Enum):
     MODEL = 'MODEL'
     # 优化器的状态字典
     OPTIMIZER = 'OPTIMIZER'
+    # 已完成的迭代次数
+    EPOCH = 'EPOCH'
+    # 训练数据源的水位线, 增量训练时只读取其后追加的数据
+    WATERMARK = 'WATERMARK'
+    # 训练输入指纹, 续训前据此确认检查点属于同一训练
+    FINGERPRINT = 'FINGERPRINT'
+    # 是否为增量学习
+    INCREMENTAL = 'INCREMENTAL'
+
+
+class Solver(Enum):
+    """
+    线性模型求解方式
+    """
+
+    # 梯度下降迭代训练
+    GRADIENT = 'GRADIENT'
+    # 对整个训练集做 QR分解求闭式解
+    QR = 'QR'
+    # 逐批累积正规方程求闭式解, 适用于大数据集
+    STREAMING = 'STREAMING'
+
+
+class ExecutorBackend(Enum):
+    """
+    异步任务执行后端
+    """
+
+    # 在服务进程内的线程池中执行
+    THREAD = 'THREAD'
+    # 在独立的子进程池中执行
+    PROCESS = 'PROCESS'
 
 
 class TaskState(Enum):
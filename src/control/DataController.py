@@ -1,9 +1,13 @@
+import functools
+import logging
 from typing import Any
 
-from database import MySQL, Redis, Faiss, LocalData
-from dataset import LinearDataset
+import pandas as pd
+
+from database import MySQL, Redis, Faiss, LocalData, ConnectionManager
+from dataset import LinearDataset, StreamingDataset
 from control.dataset_controller import LinearDatasetController
-from utils import Configurer
+from utils import Configurer, DatasetCache
 
 
 class DataController(Configurer):
@@ -16,9 +20,22 @@ class DataController(Configurer):
         初始化参数
         """
 
+        self.controller_name = self.__class__.__name__
+
         # 请求轮询时间(s)
         self.poll_time = 1.0
 
+        # 是否以流式数据集逐块读取数据源, 适用于超出内存的数据
+        self.streaming = False
+        # 流式读取时每块行数
+        self.chunk_size = 10000
+        # 流式读取时乱序缓冲区样本数
+        self.shuffle_buffer_size = 10000
+        # 是否在内存中缓存数据集, 数据源未变化时直接复用
+        self.cache_datasets = True
+        # 数据集缓存总大小上限(MB)
+        self.dataset_cache_mb = 512
+
         # self.sql = MySQL()
         # self.redis = Redis()
         # self.faiss = Faiss()
@@ -29,8 +46,10 @@ class DataController(Configurer):
             # self.faiss,
             self.local_data
         ]
+        self.connection_manager = ConnectionManager(self.databases)
 
         self.linear_dataset_controller = LinearDatasetController()
+        self.dataset_cache = DatasetCache(self.dataset_cache_mb * 1024 ** 2)
 
     def configure(self, settings: dict[str, Any]) -> None:
         """
@@ -40,18 +59,28 @@ class DataController(Configurer):
         :return: 无
         """
 
+        self.load_configuration(settings.get('control', {}).get(self.controller_name, {}))
+
         for database in self.databases:
             database.configure(settings)
+        self.connection_manager.configure(settings)
+
+        # 配置变化可能改变数据源位置, 已缓存的数据集全部作废
+        self.dataset_cache.max_bytes = self.dataset_cache_mb * 1024 ** 2
+        self.dataset_cache.invalidate()
 
     def connect(self) -> None:
         """
-        连接所有数据库
+        确保所有数据库连接可用
 
         :return: 无
+
+        注意
+        ------
+        - 已建立且健康的连接会被复用, 仅对未连接或失效的连接重连
         """
 
-        for database in self.databases:
-            database.connect()
+        self.connection_manager.acquire()
 
     def close(self) -> None:
         """
@@ -60,17 +89,60 @@ class DataController(Configurer):
         :return: 无
         """
 
-        for database in self.databases:
-            database.close()
+        self.connection_manager.close()
 
-    def get_LinearDataset(self) -> LinearDataset:
+    def get_LinearDataset(self, watermark: dict[str, int] = None, replay_ratio: float = 0.0) -> LinearDataset | StreamingDataset:
         """
         获取 LinearDataset
 
-        :return: LinearDataset 数据集
+        :param watermark: 上次训练时数据源的水位线, 指定时只读取其后追加的数据
+        :param replay_ratio: 增量读取时按新增样本数的比例从旧数据中随机抽取的回放样本比例
+        :return: LinearDataset 数据集, 开启流式读取时为对应的 StreamingDataset; 数据集的 watermark为本次读取后的水位线
+
+        注意
+        ------
+        - 流式数据集在此处不读取任何数据, 迭代时才逐块读取数据源, 不支持增量读取, 其 watermark为 None
+        - 开启 cache_datasets时, 数据文件未变化则直接返回缓存的数据集, 返回的数据集由所有调用方共享, 请勿修改
+        - 增量读取的数据集不缓存; 数据文件并非只追加时退回读取全部数据
         """
 
-        original_data = self.local_data.get_linear_data()
-        self.linear_dataset_controller.data = original_data
+        if watermark is not None and not self.streaming:
+            increment = self.local_data.get_linear_data_since(watermark)
+            if increment is not None:
+                data, new_watermark = increment
+                replay = min(int(len(data) * replay_ratio), watermark['rows'])
+                if replay > 0:
+                    data = pd.concat([self.local_data.sample_linear_data(watermark['rows'], replay), data], ignore_index = True)
+
+                self.linear_dataset_controller.data = data
+                dataset = self.linear_dataset_controller.get_dataset()
+                self.linear_dataset_controller.data = None
+                dataset.watermark = new_watermark
+
+                return dataset
+
+            logging.getLogger(self.controller_name).warning('Data file was rewritten since the last training, reading all of it')
+
+        if self.streaming:
+            chunk_reader = functools.partial(self.local_data.iter_linear_data, self.chunk_size)
+            return self.linear_dataset_controller.get_streaming_dataset(chunk_reader, self.shuffle_buffer_size)
+
+        def build() -> LinearDataset:
+            """
+            读取数据源并构建数据集
+
+            :return: LinearDataset 数据集
+            """
+
+            self.linear_dataset_controller.data, data_watermark = self.local_data.get_linear_data_since()
+            dataset = self.linear_dataset_controller.get_dataset()
+            # 数据集已持有全部数据, 释放原始 DataFrame以免其占用缓存预算之外的内存
+            self.linear_dataset_controller.data = None
+            dataset.watermark = data_watermark
+
+            return dataset
+
+        if not self.cache_datasets:
+            return build()
 
-        return self.linear_dataset_controller.get_dataset()
+        return self.dataset_cache.get_or_build(LinearDataset.__name__, self.local_data.version('linear_data'), build)
@@ -1,12 +1,20 @@
 import gc
+import os
+import sys
 import json
 import time
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any
 
 import torch
 
 from control import DataController
-from control.model_controller import LinearController
-from utils import Configurer
+from control.model_controller import ModelController, LinearController
+from utils import Configurer, MicroBatcher, MetricsRecorder, Trainer, Distributed
+from utils.task import TaskManager, CancellationToken, ProgressReporter, TaskCancelledError
 
 
 class GeneralDispatch(Configurer):
@@ -19,10 +27,26 @@ class GeneralDispatch(Configurer):
         初始化参数
         """
 
-        # 数据库重连时间(秒)
-        self.db_expire_time = 600
-        # 数据库最后连接时间
-        self.last_connected_timestamp = 0
+        self.dispatch_name = self.__class__.__name__
+
+        # 同时训练的最大模型数, 大于 1时各模型在线程池中并行训练
+        self.max_parallel_training = 1
+        # 数据并行训练: nproc_per_node(每台主机的训练进程数) / nnodes(主机数) / node_rank(本机序号, 可由环境变量 NODE_RANK覆盖) /
+        # master_addr、master_port(0号主机的汇合地址) / backend(通信后端) / timeout(通信超时(s)), 总进程数大于 1时启用
+        self.distributed_training = {
+            'nproc_per_node': 1,
+            'nnodes': 1,
+            'node_rank': 0,
+            'master_addr': '127.0.0.1',
+            'master_port': 29500,
+            'backend': 'gloo',
+            'timeout': 1800
+        }
+
+        # 最近一次加载的配置文件地址, 数据并行训练的各进程由此重新配置
+        self.config_path = None
+        # 本进程的数据并行训练上下文, 仅在数据并行训练的进程中设置
+        self.distributed: Distributed | None = None
 
         self.model1_controller = LinearController()
         # self.model2_controller = Model2()
@@ -35,25 +59,38 @@ class GeneralDispatch(Configurer):
             # self.model3_controller
         ]
 
+        # 单样本预测请求的微批处理器
+        self.micro_batcher = MicroBatcher(self.use_batch)
+
     def __enter__(self) -> None:
         """
-        非 连接各个数据库
+        确保各个数据库连接可用
 
         :return: 无
         """
 
-        now_timestamp = int(time.time())
-        if now_timestamp - self.last_connected_timestamp >= self.db_expire_time:
-            self.data_controller.connect()
-            self.last_connected_timestamp = now_timestamp
+        self.data_controller.connect()
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
         """
-        非 下断开各个数据库连接
+        退出数据库使用区间, 连接保持打开以供后续请求复用
 
         :param exc_type: with块中发生异常时异常的类型
         :param exc_val: with块中发生异常时异常的值
         :param exc_tb: with块中发生异常时异常的堆栈信息
+        :return: 无
+
+        注意
+        ------
+        - 连接由 ConnectionManager统一维护, 如需释放全部连接请调用 close()
+        """
+
+        pass
+
+    def close(self) -> None:
+        """
+        断开各个数据库连接
+
         :return: 无
         """
 
@@ -73,8 +110,11 @@ class GeneralDispatch(Configurer):
 
         with open(config_path, 'r', encoding = 'UTF-8') as file:
             settings = json.load(file)
+        self.config_path = config_path
 
+        self.load_configuration(settings.get('control', {}).get(self.dispatch_name, {}))
         self.data_controller.configure(settings)
+        self.micro_batcher.configure(settings)
         for model_controller in self.model_controllers:
             model_controller.configure(settings)
 
@@ -88,38 +128,417 @@ class GeneralDispatch(Configurer):
         for model_controller in self.model_controllers:
             model_controller.load_model_into_memory()
 
-    def train(self, incremental: bool) -> None:
+    def train(self,
+              incremental: bool,
+              cancel_token: CancellationToken = None,
+              progress_reporter: ProgressReporter = None,
+              force: bool = False) -> dict[str, Any]:
         """
         批量更新所有模型
 
         :param incremental: 是否增量学习
+        :param cancel_token: 取消令牌, 被取消时尚未开始训练的模型不再训练
+        :param progress_reporter: 进度报告器, 除各模型的训练进度外还报告当前模型名称及序号
+        :param force: 是否在训练输入未变化时仍强制训练
+        :return: 耗时统计, 包括各数据集的加载耗时和各模型的数据包装、训练耗时(s)及是否实际训练
+
+        注意
+        ------
+        - 每个模型控制类通过 dataset_name声明所需数据集, 通过 dataset_arguments()声明加载参数(如增量学习时的水位线),
+          名称和参数相同的数据集只加载一次, 由所有模型只读共享
+        - max_parallel_training大于 1时各模型在线程池中并行训练, 共享本进程已加载的数据集且训练后的模型直接在本进程发布;
+          并行训练时逐 batch进度不会上报, 仅报告已完成的模型数
+        - distributed_training的总进程数大于 1时改为数据并行训练, 见 train_distributed()
+        """
+
+        if self.distributed is None and self.world_size > 1:
+            return self.train_distributed(incremental, force, cancel_token, progress_reporter)
+
+        summary = {'datasets': {}, 'models': {}}
+        train_start = time.perf_counter()
+
+        # 名称和加载参数相同的数据集只加载一次
+        loaded = {}
+        datasets = []
+        for model_controller in self.model_controllers:
+            arguments = model_controller.dataset_arguments(incremental, force)
+            if self.distributed is not None:
+                # 水位线只保存在 0号进程所在主机, 所有进程按 0号进程的参数加载相同的数据
+                arguments = self.distributed.broadcast_object(arguments)
+            key = (model_controller.dataset_name, json.dumps(arguments, sort_keys = True, default = str))
+            if key not in loaded:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                load_start = time.perf_counter()
+                loaded[key] = getattr(self.data_controller, f'get_{model_controller.dataset_name}')(**arguments)
+                summary['datasets'][model_controller.dataset_name] = (summary['datasets'].get(model_controller.dataset_name, 0.0)
+                                                                      + time.perf_counter() - load_start)
+            datasets.append(loaded[key])
+
+        parallel = min(self.max_parallel_training, len(self.model_controllers))
+        if parallel > 1 and self.distributed is None:
+            summary['models'] = self.__train_parallel(datasets, parallel, incremental, force, cancel_token, progress_reporter)
+        else:
+            for idx, model_controller in enumerate(self.model_controllers):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                if progress_reporter is not None:
+                    progress_reporter.report(model = model_controller.model_name, model_index = idx + 1, models = len(self.model_controllers))
+
+                summary['models'][model_controller.model_name] = self.train_controller(
+                    model_controller, datasets[idx], incremental, force, cancel_token, progress_reporter
+                )
+
+        summary['total'] = time.perf_counter() - train_start
+        logging.getLogger(self.dispatch_name).info(f'Training finished: {json.dumps(summary)}')
+        if progress_reporter is not None:
+            progress_reporter.report(timings = summary)
+
+        return summary
+
+    @staticmethod
+    def train_controller(model_controller: ModelController,
+                         dataset: Any,
+                         incremental: bool,
+                         force: bool = False,
+                         cancel_token: CancellationToken = None,
+                         progress_reporter: ProgressReporter = None) -> dict[str, Any]:
+        """
+        以已加载的数据集训练单个模型
+
+        :param model_controller: 模型控制类
+        :param dataset: 数据集
+        :param incremental: 是否增量学习
+        :param force: 是否在训练输入未变化时仍强制训练
+        :param cancel_token: 取消令牌
+        :param progress_reporter: 进度报告器
+        :return: 数据包装及训练耗时(s), 以及是否实际训练
+        """
+
+        # 包装数据集
+        load_start = time.perf_counter()
+        model_controller.load_data(dataset)
+        train_start = time.perf_counter()
+
+        # 训练模型
+        trained = model_controller.train(incremental = incremental, cancel_token = cancel_token,
+                                         progress_reporter = progress_reporter, force = force)
+        train_end = time.perf_counter()
+
+        # 清理内存
+        gc.collect()
+
+        return {'load_data': train_start - load_start, 'train': train_end - train_start, 'trained': trained}
+
+    def __train_parallel(self,
+                         datasets: list[Any],
+                         parallel: int,
+                         incremental: bool,
+                         force: bool,
+                         cancel_token: CancellationToken | None,
+                         progress_reporter: ProgressReporter | None) -> dict[str, dict[str, Any]]:
+        """
+        在线程池中并行训练所有模型
+
+        :param datasets: 各模型控制类对应的已加载数据集
+        :param parallel: 并行线程数
+        :param incremental: 是否增量学习
+        :param force: 是否在训练输入未变化时仍强制训练
+        :param cancel_token: 取消令牌
+        :param progress_reporter: 进度报告器
+        :return: 各模型的耗时统计
+
+        注意
+        ------
+        - 各模型共用一个内部取消令牌, 外部取消或任一模型训练出错时通知其余模型在下一个 batch前退出
+        - 张量运算期间释放 GIL, 各模型的训练可以在多个线程中同时进行
+        """
+
+        internal_token = CancellationToken()
+        timings = {}
+
+        with ThreadPoolExecutor(max_workers = parallel, thread_name_prefix = self.dispatch_name) as pool:
+            futures = {
+                pool.submit(self.train_controller, model_controller, datasets[idx], incremental, force, internal_token): model_controller
+                for idx, model_controller in enumerate(self.model_controllers)
+            }
+
+            try:
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout = 0.5, return_when = FIRST_COMPLETED)
+                    if cancel_token is not None and cancel_token.cancelled:
+                        internal_token.cancel()
+
+                    for future in done:
+                        timings[futures[future].model_name] = future.result()
+                        if progress_reporter is not None:
+                            progress_reporter.report(models_finished = len(timings), models = len(self.model_controllers))
+
+            except BaseException:
+                # 出错或被取消时通知其余模型尽快退出, 线程池退出前等待其结束
+                internal_token.cancel()
+                raise
+
+        return timings
+
+    @property
+    def world_size(self) -> int:
+        """
+        获得数据并行训练的总进程数
+
+        :return: 所有主机的训练进程数之和
+        """
+
+        return self.distributed_training['nproc_per_node'] * self.distributed_training['nnodes']
+
+    def train_distributed(self,
+                          incremental: bool,
+                          force: bool = False,
+                          cancel_token: CancellationToken = None,
+                          progress_reporter: ProgressReporter = None) -> dict[str, Any]:
+        """
+        在本机启动 nproc_per_node个训练进程, 与其余主机上的训练进程一同以数据并行方式训练所有模型
+
+        :param incremental: 是否增量学习
+        :param force: 是否在训练输入未变化时仍强制训练
+        :param cancel_token: 取消令牌, 被取消时通知所有训练进程
+        :param progress_reporter: 进度报告器, 仅报告训练结束后的耗时统计
+        :return: 本机 0号训练进程的耗时统计
+
+        注意
+        ------
+        - 训练进程以 python -m control.train_rank启动, 按 config_path重新配置, 数据集由各进程各自加载后按进程分片,
+          不会重新导入启动训练的脚本
+        - 多主机训练时每台主机以相同的 settings.json和各自的 node_rank同时启动训练, 如 NODE_RANK=1 python app.py --train,
+          所有进程在 master_addr:master_port汇合, 任一主机缺席时在 timeout后失败
+        - 模型文件、检查点及水位线只保存在全局 0号进程所在主机, 由 0号进程读取后广播, 其余主机无需共享 model_dir
+        - 0号主机上本进程在训练结束后从模型文件重新加载重新训练过的模型, 训练数据只在训练进程中加载
+        - 任一训练进程失败时终止其余训练进程
+        - 单机多进程时每个训练进程的计算线程数为 CPU数除以 nproc_per_node
+        """
+
+        if self.config_path is None:
+            raise RuntimeError('Distributed training requires configure() to be called first')
+        for model_controller in self.model_controllers:
+            if not hasattr(model_controller, 'distributed'):
+                raise TypeError(f'{type(model_controller).__name__} does not support distributed training')
+
+        node_rank = int(os.environ.get('NODE_RANK', self.distributed_training['node_rank']))
+        # 训练进程以 src为导入根目录
+        source_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH = os.pathsep.join(filter(None, (source_dir, os.environ.get('PYTHONPATH')))))
+        summary_file = tempfile.NamedTemporaryFile(prefix = 'train_summary_', suffix = '.json', delete = False)
+        summary_file.close()
+
+        command = [sys.executable, '-m', 'control.train_rank', '--config', os.path.abspath(self.config_path),
+                   '--node-rank', str(node_rank), '--summary', summary_file.name]
+        command += ['--incremental'] if incremental else []
+        command += ['--force'] if force else []
+
+        train_start = time.perf_counter()
+        processes = []
+        try:
+            for local_rank in range(self.distributed_training['nproc_per_node']):
+                processes.append(subprocess.Popen(command + ['--local-rank', str(local_rank)], stdin = subprocess.PIPE, env = env))
+
+            while any(process.poll() is None for process in processes):
+                if any(process.poll() not in (None, 0) for process in processes):
+                    break
+                if cancel_token is not None and cancel_token.cancelled:
+                    # 关闭标准输入即通知训练进程取消
+                    for process in processes:
+                        if not process.stdin.closed:
+                            process.stdin.close()
+                time.sleep(0.5)
+
+            failed = [process.returncode for process in processes if process.poll() not in (None, 0)]
+            if failed:
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise TaskCancelledError('Distributed training has been cancelled')
+                raise RuntimeError(f'Distributed training process exited with code {failed[0]}')
+
+            with open(summary_file.name, 'r', encoding = 'UTF-8') as file:
+                content = file.read()
+            summary = json.loads(content) if content else {'datasets': {}, 'models': {}}
+
+        finally:
+            # 出错、被取消或本进程被中断时终止其余训练进程
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+                    process.wait()
+                if not process.stdin.closed:
+                    process.stdin.close()
+            os.remove(summary_file.name)
+
+        summary['total'] = time.perf_counter() - train_start
+        summary['distributed'] = {'world_size': self.world_size, 'node_rank': node_rank}
+
+        # 训练进程中发布的模型不会回到本进程, 重新训练过的模型从 0号进程保存的模型文件重新加载
+        if node_rank == 0:
+            for model_controller in self.model_controllers:
+                if summary['models'].get(model_controller.model_name, {}).get('trained', False):
+                    model_controller.load_model_into_memory()
+
+        logging.getLogger(self.dispatch_name).info(f'Distributed training finished: {json.dumps(summary)}')
+        if progress_reporter is not None:
+            progress_reporter.report(timings = summary)
+
+        return summary
+
+    @staticmethod
+    def rank_dispatch(config_path: str, node_rank: int, local_rank: int) -> 'GeneralDispatch':
+        """
+        创建数据并行训练中单个训练进程的总控实例
+
+        :param config_path: 配置文件地址
+        :param node_rank: 本机序号
+        :param local_rank: 本机内的进程序号
+        :return: 已配置的总控实例, 其与所有模型控制类共享同一数据并行训练上下文, 进程组尚未建立
+
+        注意
+        ------
+        - 调用方须在训练前调用 dispatch.distributed.init(), 结束后调用 dispatch.distributed.destroy()
+        """
+
+        dispatch = GeneralDispatch()
+        dispatch.configure(config_path)
+
+        settings = dispatch.distributed_training
+        distributed = Distributed(
+            world_size = dispatch.world_size,
+            rank = node_rank * settings['nproc_per_node'] + local_rank,
+            master_addr = settings['master_addr'],
+            master_port = settings['master_port'],
+            backend = settings['backend'],
+            timeout = settings['timeout']
+        )
+
+        dispatch.distributed = distributed
+        for model_controller in dispatch.model_controllers:
+            model_controller.distributed = distributed
+
+        return dispatch
+
+    @staticmethod
+    def train_rank(local_rank: int,
+                   config_path: str,
+                   incremental: bool,
+                   force: bool,
+                   node_rank: int,
+                   cancel_token: CancellationToken,
+                   summary_path: str = None) -> None:
+        """
+        数据并行训练的单个训练进程
+
+        :param local_rank: 本机内的进程序号
+        :param config_path: 配置文件地址
+        :param incremental: 是否增量学习
+        :param force: 是否在训练输入未变化时仍强制训练
+        :param node_rank: 本机序号
+        :param cancel_token: 取消令牌
+        :param summary_path: 本机 0号训练进程写入耗时统计的文件地址, 为 None时不写入
         :return: 无
         """
 
-        for idx, model_controller in enumerate(self.model_controllers):
-            # 加载数据集
-            linear_dataset = self.data_controller.get_LinearDataset()
-            model_controller.load_data(linear_dataset)
+        dispatch = GeneralDispatch.rank_dispatch(config_path, node_rank, local_rank)
+        # 同一主机上的训练进程平分 CPU, 避免计算线程争抢
+        torch.set_num_threads(max((os.cpu_count() or 1) // dispatch.distributed_training['nproc_per_node'], 1))
+
+        dispatch.distributed.init()
+        try:
+            with dispatch:
+                summary = dispatch.train(incremental, cancel_token, None, force)
+            if local_rank == 0 and summary_path is not None:
+                with open(summary_path, 'w', encoding = 'UTF-8') as file:
+                    json.dump(summary, file)
+        finally:
+            dispatch.distributed.destroy()
+            dispatch.close()
+
+    @staticmethod
+    @TaskManager.long_task
+    def train_in_process(config_path: str,
+                         incremental: bool,
+                         force: bool = False,
+                         cancel_token: CancellationToken = None,
+                         progress_reporter: ProgressReporter = None) -> dict[str, Any]:
+        """
+        在独立进程中按配置文件训练所有模型
+
+        :param config_path: 配置文件地址
+        :param incremental: 是否增量学习
+        :param force: 是否在训练输入未变化时仍强制训练
+        :param cancel_token: 取消令牌
+        :param progress_reporter: 进度报告器
+        :return: 耗时统计
 
-            # 训练模型
-            model_controller.train(incremental = incremental)
+        注意
+        ------
+        - 供 TaskManager的 PROCESS后端使用, 子进程内新建并配置总控实例, 训练结果仅以模型文件的形式留存
+        - 服务进程需在任务成功后调用 load_model()加载新模型
+        """
 
-            # 清理内存
-            gc.collect()
+        dispatch = GeneralDispatch()
+        dispatch.configure(config_path)
+        try:
+            with dispatch:
+                return dispatch.train(incremental, cancel_token, progress_reporter, force)
+        finally:
+            dispatch.close()
 
-    def eval(self) -> None:
+    def eval(self) -> list[str]:
         """
         评估所有模型
 
-        :return: 无
+        :return: 所有评估图像的地址
         """
 
         eval_funcs = []
         for model_controller in self.model_controllers:
+            # 数据并行训练时数据只在训练进程中加载, 增量学习没有新增数据时也没有测试集, 此时加载全部数据用于评估
+            if getattr(model_controller, 'test_dataloader', None) is None:
+                model_controller.load_data(getattr(self.data_controller, f'get_{model_controller.dataset_name}')())
             eval_funcs.extend(model_controller.eval())
 
-        for eval_func in eval_funcs:
-            eval_func()
+        return [eval_func() for eval_func in eval_funcs]
+
+    def get_model_controller(self, model_name: str) -> ModelController:
+        """
+        按模型名称查找模型控制类
+
+        :param model_name: 模型名称
+        :return: 模型控制类
+        """
+
+        for model_controller in self.model_controllers:
+            if model_controller.model_name == model_name:
+                return model_controller
+
+        raise ValueError(f"No such model called '{model_name}'")
+
+    def get_metrics(self, model_name: str) -> list[dict[str, Any]]:
+        """
+        获得指定模型最近一次训练的逐次迭代指标
+
+        :param model_name: 模型名称
+        :return: 指标记录
+        """
+
+        model_controller = self.get_model_controller(model_name)
+        return MetricsRecorder.load(Trainer.metrics_path(model_controller.model_dir, model_name))
+
+    def render_metrics(self, model_name: str, image_format: str) -> str:
+        """
+        将指定模型最近一次训练的指标渲染为损失曲线图
+
+        :param model_name: 模型名称
+        :param image_format: 图像格式, 如 svg / png
+        :return: 图像地址
+        """
+
+        return self.get_model_controller(model_name).render_metrics(image_format)
 
     def use(self, X: list[float]) -> torch.Tensor:
         """
@@ -130,3 +549,19 @@ class GeneralDispatch(Configurer):
         """
 
         return self.model1_controller.use(torch.tensor([X]))
+
+    def use_batch(self, X: list[float] | list[list[float]]) -> torch.Tensor:
+        """
+        批量预测多个X对应的y, 所有样本在一次前向传播中完成计算
+
+        :param X: 要预测的值. 一维列表视为多个单特征样本, 二维列表的每一行视为一个多特征样本
+        :return: 每个样本对应的预测值, 形状为 (样本数, 1)
+        """
+
+        batch = torch.as_tensor(X, dtype = torch.float32)
+        if batch.dim() == 1:
+            batch = batch.unsqueeze(1)
+        if batch.dim() != 2:
+            raise ValueError(f"Expected a 1-D or 2-D input, but got a {batch.dim()}-D input")
+
+        return self.model1_controller.use(batch)
@@ -1,7 +1,9 @@
+from typing import Callable, Iterable
+
 import pandas as pd
 
 from control.dataset_controller import DatasetController
-from dataset import LinearDataset
+from dataset import LinearDataset, StreamingDataset
 
 
 class LinearDatasetController(DatasetController):
@@ -41,3 +43,15 @@ class LinearDatasetController(DatasetController):
         """
 
         return LinearDataset(self.data)
+
+    @staticmethod
+    def get_streaming_dataset(chunk_reader: Callable[[], Iterable[pd.DataFrame]], buffer_size: int) -> StreamingDataset:
+        """
+        获得流式的线性数据集
+
+        :param chunk_reader: 每次调用返回一个新的 DataFrame块迭代器
+        :param buffer_size: 乱序缓冲区样本数
+        :return: 流式数据集
+        """
+
+        return StreamingDataset(chunk_reader, buffer_size = buffer_size)
@@ -1,7 +1,11 @@
 import os
+import json
+import uuid
+import time
+import hashlib
 from typing import Callable, Any
 
-from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 from sklearn.metrics import r2_score
 import torch
@@ -9,10 +13,11 @@ from torch.optim import Adam
 from torch.nn import MSELoss
 
 from control.model_controller import ModelController
-from dataset import LinearDataset
+from dataset import LinearDataset, StreamingDataset
 from module import LinearRegression
-from utils import Loader, Trainer
-from common import ModelSaveMode, Checkpoint
+from utils import Loader, Trainer, ModelSlot, LeastSquares, MetricsRecorder, PhaseProfiler, Distributed
+from utils.task import CancellationToken, ProgressReporter
+from common import ModelSaveMode, Checkpoint, Solver, SplitMode
 
 
 class LinearController(ModelController):
@@ -20,29 +25,71 @@ class LinearController(ModelController):
     线性回归模型控制类
     """
 
+    # 影响训练结果的超参数, 参与训练输入指纹的计算
+    FINGERPRINT_FIELDS = ('train_ratio', 'split_mode', 'seed', 'batch_size', 'epoch', 'incremental_epoch', 'replay_ratio',
+                          'trials', 'lr', 'weight_decay', 'solver', 'eval_interval', 'eval_batches')
+
     def __init__(self):
         """
         初始化参数
         """
 
         self.model_name = LinearRegression.__name__
+        # 所需数据集, 由 DataController的 get_{dataset_name}()加载
+        self.dataset_name = 'LinearDataset'
 
         # 设置参数
-        self.DEBUG = True
         self.model_dir = '../../../resource/dynamic/saved_models'
         self.model_path = {
-            ModelSaveMode.STATE: os.path.join(self.model_dir, f'{self.model_name}_{ModelSaveMode.STATE.value}.pth'),
-            ModelSaveMode.FRAME: os.path.join(self.model_dir, f'{self.model_name}_{ModelSaveMode.FRAME.value}.pth')
+            mode: os.path.join(self.model_dir, f'{self.model_name}_{mode.value}.pth') for mode in ModelSaveMode
         }
+        self.fingerprint_path = os.path.join(self.model_dir, f'{self.model_name}_FINGERPRINT.json')
 
         # 模型参数
         self.train_ratio = 0.8
+        # 训练测试划分方式: RANDOM(随机) / STRATIFIED(按标签分层) / TEMPORAL(按时间顺序)
+        self.split_mode = SplitMode.RANDOM.value
+        # 划分随机种子, 为 None时每次随机
+        self.seed = None
         self.batch_size = 100
         self.epoch = 200
         self.incremental_epoch = 1
+        # 增量学习时混入的旧数据回放样本数占新增样本数的比例, 缓解只学习新数据造成的遗忘
+        self.replay_ratio = 0.0
         self.trials = 5
         self.lr = 1e-2
         self.weight_decay = 0.01
+        # 求解方式: GRADIENT(梯度下降) / QR(QR分解闭式解) / STREAMING(逐批累积正规方程闭式解)
+        self.solver = Solver.GRADIENT.value
+        # 训练被取消时是否保存可续训检查点
+        self.checkpoint_on_cancel = True
+        # 非增量训练时是否从上次被取消时的检查点继续训练
+        self.resume_cancelled = True
+        # 快速训练模式: 损失以张量累积, 每次迭代只与设备同步一次
+        self.fast_mode = False
+        # 是否以 torch.compile编译前向及损失计算
+        self.compile_model = False
+        # 每隔多少次迭代验证一次, 早停的 trials按验证次数计
+        self.eval_interval = 1
+        # 每次验证使用的固定 batch数, 为 None时使用全部测试数据
+        self.eval_batches = None
+        # 训练性能剖析: enabled(分阶段统计) / torch_profiler(以 torch.profiler记录 wait、warmup后的 active步并导出 Chrome trace)
+        self.profile = {
+            'enabled': False,
+            'torch_profiler': False,
+            'wait': 1,
+            'warmup': 1,
+            'active': 5
+        }
+
+        # 数据加载: num_workers(加载进程数) / prefetch_factor(每个加载进程预取的批数) /
+        # persistent_workers(迭代之间是否保留加载进程) / pin_memory(是否使用锁页内存), 为 None时自动选择
+        self.dataloader = {
+            'num_workers': None,
+            'prefetch_factor': None,
+            'persistent_workers': None,
+            'pin_memory': None
+        }
 
         # 数据集
         self.dataset = None
@@ -50,7 +97,19 @@ class LinearController(ModelController):
         self.test_dataloader = None
 
         # 工具对象
-        self.pretrained_model = None
+        self.model_slot = ModelSlot()
+        # 数据并行训练上下文, 由 GeneralDispatch在多进程训练时设置, 为 None时单进程训练
+        self.distributed: Distributed | None = None
+
+    @property
+    def pretrained_model(self) -> LinearRegression | None:
+        """
+        获得当前正在服务的模型
+
+        :return: 当前模型, 尚未加载时为 None
+        """
+
+        return self.model_slot.model
 
     def configure(self, settings: Any) -> None:
         """
@@ -69,22 +128,62 @@ class LinearController(ModelController):
         self.model_dir = self.path_revise(self.model_dir)
         # 在保存路径后补上模型后缀, 作为真正的模型路径
         self.model_path = {
-            ModelSaveMode.STATE: os.path.join(self.model_dir, f'{self.model_name}_{ModelSaveMode.STATE.value}.pth'),
-            ModelSaveMode.FRAME: os.path.join(self.model_dir, f'{self.model_name}_{ModelSaveMode.FRAME.value}.pth')
+            mode: os.path.join(self.model_dir, f'{self.model_name}_{mode.value}.pth') for mode in ModelSaveMode
         }
+        self.fingerprint_path = os.path.join(self.model_dir, f'{self.model_name}_FINGERPRINT.json')
 
-    def load_data(self, dataset: LinearDataset) -> None:
+    def load_data(self, dataset: LinearDataset | StreamingDataset) -> None:
         """
         加载原始数据集和包装训练测试集
 
         :param dataset: 原始数据集
         :return: 无
+
+        注意
+        ------
+        - 增量读取没有新增数据时数据集为空, 不包装训练测试集, 由 train()决定是否训练
         """
 
         self.dataset = dataset
+        if isinstance(dataset, LinearDataset) and len(dataset) == 0:
+            self.train_dataloader, self.test_dataloader = None, None
+            return
 
-        loader = Loader(dataset)
-        self.train_dataloader, self.test_dataloader = loader.get_dataloader(self.train_ratio, self.batch_size)
+        # 闭式解需要全部训练数据, 各进程各自求解相同的结果, 只有梯度下降按进程分片
+        distributed = self.distributed if Solver(self.solver) is Solver.GRADIENT else None
+
+        # 多进程训练时各进程须得到相同的训练测试划分, 未指定种子时使用 0号进程生成的种子
+        seed = self.seed
+        if seed is None and self.distributed is not None and self.distributed.enabled:
+            seed = self.distributed.shared_seed()
+
+        loader = Loader(dataset, SplitMode(self.split_mode), seed)
+        self.train_dataloader, self.test_dataloader = loader.get_dataloader(self.train_ratio, self.batch_size,
+                                                                            distributed, **self.dataloader)
+
+    def dataset_arguments(self, incremental: bool, force: bool = False) -> dict[str, Any]:
+        """
+        获得加载数据集的参数
+
+        :param incremental: 是否增量学习
+        :param force: 是否强制训练
+        :return: 增量学习时为上次保存的 STATE检查点中的水位线及回放比例, 否则为空
+
+        注意
+        ------
+        - 闭式解需要全部训练数据, 非梯度下降求解时总是加载全部数据
+        - 强制训练时加载全部数据, 强制的增量学习在已保存模型的基础上以全部数据继续训练, 不会因没有新增数据而跳过
+        """
+
+        state_path = self.model_path[ModelSaveMode.STATE]
+        if not incremental or force or Solver(self.solver) is not Solver.GRADIENT or not os.path.exists(state_path):
+            return {}
+
+        watermark = torch.load(state_path).get(Checkpoint.WATERMARK, None)
+        if watermark is None:
+            return {}
+
+        return {'watermark': watermark, 'replay_ratio': self.replay_ratio}
 
     def load_model_into_memory(self) -> None:
         """
@@ -93,73 +192,344 @@ class LinearController(ModelController):
         :return: 无
         """
 
-        model = torch.load(self.model_path[ModelSaveMode.FRAME])
+        # 在槽外完整加载模型后再整体发布, 推理请求不会读到加载了一半的模型
+        # FRAME为整个模型对象的 pickle, 只加载本服务自己保存的模型文件
+        model = torch.load(self.model_path[ModelSaveMode.FRAME], weights_only = False)
         model.eval()
 
-        self.pretrained_model = model
+        self.model_slot.publish(model)
 
-    def train(self, incremental: bool) -> None:
+    def fingerprint(self, incremental: bool = False) -> str:
         """
-        训练 NCF模型
+        计算训练输入的指纹
 
         :param incremental: 是否增量学习
+        :return: 模型类、数据集内容哈希、FINGERPRINT_FIELDS中超参数及训练方式的 sha256
+        """
+
+        return self.__hash(self.__fingerprint_inputs(incremental, self.__saved_fingerprint()))
+
+    def __fingerprint_inputs(self, incremental: bool, saved_fingerprint: str | None) -> dict[str, Any]:
+        """
+        获得参与指纹计算的训练输入
+
+        :param incremental: 是否增量学习
+        :param saved_fingerprint: 已保存模型的指纹
+        :return: 训练输入, 增量学习时包括所基于的已保存模型的指纹
+
+        注意
+        ------
+        - 增量学习读取全部数据(如无水位线或流式读取)时数据集与全量训练相同, 以训练方式区分两者,
+          避免增量学习的结果被之后的全量训练误认为一致而跳过, 或全量训练的结果使增量学习被跳过
+        """
+
+        inputs = {
+            'model': f'{LinearRegression.__module__}.{LinearRegression.__qualname__}',
+            'dataset': self.dataset.content_hash,
+            'hyperparameters': {field: getattr(self, field) for field in self.FINGERPRINT_FIELDS},
+            'incremental': incremental
+        }
+        if incremental:
+            inputs['base'] = saved_fingerprint
+
+        return inputs
+
+    @staticmethod
+    def __hash(inputs: dict[str, Any]) -> str:
+        """
+        计算训练输入的 sha256
+
+        :param inputs: 训练输入
+        :return: 指纹
+        """
+
+        return hashlib.sha256(json.dumps(inputs, sort_keys = True, default = str).encode()).hexdigest()
+
+    def __saved_fingerprint(self) -> str | None:
+        """
+        读取已保存模型的训练输入指纹
+
+        :return: 指纹, 指纹文件或模型文件缺失时为 None
+        """
+
+        if not all(os.path.exists(self.model_path[mode]) for mode in (ModelSaveMode.FRAME, ModelSaveMode.STATE)):
+            return None
+
+        try:
+            with open(self.fingerprint_path, 'r', encoding = 'UTF-8') as file:
+                return json.load(file)['fingerprint']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def __save_fingerprint(self, inputs: dict[str, Any]) -> None:
+        """
+        原子地保存训练输入指纹
+
+        :param inputs: 训练输入
         :return: 无
         """
 
+        temp_path = f'{self.fingerprint_path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w', encoding = 'UTF-8') as file:
+            json.dump({'fingerprint': self.__hash(inputs), 'inputs': inputs}, file, indent = 2, default = str)
+        os.replace(temp_path, self.fingerprint_path)
+
+    def train(self,
+              incremental: bool,
+              cancel_token: CancellationToken = None,
+              progress_reporter: ProgressReporter = None,
+              force: bool = False) -> bool:
+        """
+        训练 NCF模型
+
+        :param incremental: 是否增量学习
+        :param cancel_token: 取消令牌
+        :param progress_reporter: 进度报告器
+        :param force: 是否在训练输入未变化时仍强制训练
+        :return: 是否实际进行了训练
+
+        注意
+        ------
+        - 训练输入的指纹与已保存模型一致时直接使用已保存的模型, 尚未加载时将其载入内存
+        - 增量学习时数据源没有新增数据则不训练(强制训练除外), 否则总是在当前模型的基础上继续训练
+        - 训练开始前删除旧指纹, 训练中途失败或被取消时被部分覆盖的模型文件不会被误认为与指纹一致
+        - 多进程训练时所有进程一致地决定是否训练, 只有 0号进程写入模型文件及指纹
+        - 模型文件只保存在 0号进程所在主机, 其余进程使用 0号进程读取的指纹, 各主机无需共享 model_dir
+        """
+
+        distributed = self.distributed or Distributed()
+        # 增量学习的指纹包括当前模型的指纹, 须在删除旧指纹前计算
+        saved_fingerprint = distributed.broadcast_object(self.__saved_fingerprint() if distributed.is_main else None)
+        inputs = self.__fingerprint_inputs(incremental, saved_fingerprint)
+        fingerprint = self.__hash(inputs)
+        no_new_data = incremental and isinstance(self.dataset, LinearDataset) and len(self.dataset) == 0
+        if distributed.all(not force and (no_new_data or saved_fingerprint == fingerprint)):
+            if self.pretrained_model is None and distributed.is_main:
+                self.load_model_into_memory()
+            return False
+
+        if distributed.is_main and os.path.exists(self.fingerprint_path):
+            os.remove(self.fingerprint_path)
+
         model = LinearRegression(1)
         optimizer = Adam(model.parameters(), lr = self.lr, weight_decay = self.weight_decay)
         loss = MSELoss()
-        if incremental:
-            checkpoint = torch.load(self.model_path[ModelSaveMode.STATE])
+        trainer = Trainer(model, optimizer, loss)
+        # 本次所用数据的水位线随检查点保存, 下次增量学习从此处继续读取
+        trainer.watermark = self.dataset.watermark
+        # 可续训检查点只能被相同训练输入的同类训练(全量或增量)续训
+        trainer.fingerprint = fingerprint
+        trainer.incremental = incremental
+        trainer.distributed = self.distributed
+
+        solver = Solver(self.solver)
+        if solver is not Solver.GRADIENT:
+            # 闭式解直接由全部训练数据确定, 增量学习时同样重新求解
+            self.solve(model, solver, cancel_token, progress_reporter)
+            trainer.save(self.model_dir, self.model_name)
+            trainer.flush()
+        else:
+            self.fit(trainer, incremental, cancel_token, progress_reporter)
+
+        # 模型文件已全部落盘, 此时才记录指纹
+        if distributed.is_main:
+            self.__save_fingerprint(inputs)
+        # 其余进程等待 0号进程写完模型文件及指纹后再返回
+        distributed.barrier()
+
+        # 训练好的模型即为刚保存的模型, 直接发布而无需再从磁盘加载
+        model.eval()
+        self.model_slot.publish(model)
+
+        return True
+
+    def fit(self,
+            trainer: Trainer,
+            incremental: bool,
+            cancel_token: CancellationToken = None,
+            progress_reporter: ProgressReporter = None) -> None:
+        """
+        以梯度下降训练模型
+
+        :param trainer: 训练器
+        :param incremental: 是否增量学习
+        :param cancel_token: 取消令牌
+        :param progress_reporter: 进度报告器
+        :return: 无
+
+        注意
+        ------
+        - 若存在上次被取消时保存的检查点, 且其训练输入指纹及是否增量学习均与本次训练一致, 则从该检查点继续训练剩余的迭代次数;
+          不一致的检查点属于另一次训练, 直接删除
+        - 增量学习时模型结构未变化则同时恢复优化器状态, 学习率和权重衰减仍取当前配置
+        - 多进程训练时检查点由 0号进程读取后广播, 所有进程从相同的迭代次数及状态继续训练
+        """
+
+        model, optimizer = trainer.model, trainer.optimizer
+        distributed = self.distributed or Distributed()
+        start_epoch = 1
+        resume_path = self.model_path[ModelSaveMode.RESUME]
+        state_path = self.model_path[ModelSaveMode.STATE]
+
+        resume, state = None, None
+        if distributed.is_main:
+            resume = self.__load_resume(trainer.fingerprint, incremental)
+            if resume is None and incremental and os.path.exists(state_path):
+                state = torch.load(state_path)
+        resume, state = distributed.broadcast_object((resume, state))
+
+        if resume is not None:
+            model.load_state_dict(resume[Checkpoint.MODEL])
+            optimizer.load_state_dict(resume[Checkpoint.OPTIMIZER])
+            start_epoch = resume[Checkpoint.EPOCH] + 1
+        elif state is not None:
+            # 优化器状态与参数一一对应, 仅在所有参数均可原样加载时恢复
+            state_dict = model.state_dict()
+            compatible = state_dict.keys() == state[Checkpoint.MODEL].keys() and all(
+                state_dict[layer].shape == state[Checkpoint.MODEL][layer].shape for layer in state_dict
+            )
             # 排除某些层。如在增量训练下, Embedding层会因为输入特征数不匹配而不能加载, 所以要排除
             model.load_state_dict(
                 self.checkpoint_filter(
-                    model.state_dict(), checkpoint[Checkpoint.MODEL],
+                    state_dict, state[Checkpoint.MODEL],
                     'embedding'
                 )
             )
-            # optimizer.load_state_dict(checkpoint[Checkpoint.OPTIMIZER])
+            if compatible:
+                optimizer.load_state_dict(state[Checkpoint.OPTIMIZER])
+                for group in optimizer.param_groups:
+                    group['lr'] = self.lr
+                    group['weight_decay'] = self.weight_decay
 
-        trainer = Trainer(model, optimizer, loss)
         trainer.train(
             supervise = True,
             train_data = self.train_dataloader,
             epoch = self.incremental_epoch if incremental else self.epoch,
             trials = self.trials,
             test_data = self.test_dataloader,
-            plot = self.DEBUG,
-            model_dir = self.model_dir
+            model_dir = self.model_dir,
+            cancel_token = cancel_token,
+            checkpoint_on_cancel = self.checkpoint_on_cancel,
+            start_epoch = start_epoch,
+            progress_reporter = progress_reporter,
+            profiler = PhaseProfiler(**{'trace_path': os.path.join(self.model_dir, f'{self.model_name}_trace.json'), **self.profile}),
+            fast = self.fast_mode,
+            compile_model = self.compile_model,
+            eval_interval = self.eval_interval,
+            eval_batches = self.eval_batches
         )
-        self.load_model_into_memory()
+
+        # 训练完整结束, 续训检查点已无用
+        if distributed.is_main and os.path.exists(resume_path):
+            os.remove(resume_path)
+
+    def __load_resume(self, fingerprint: str, incremental: bool) -> dict | None:
+        """
+        读取属于本次训练的可续训检查点
+
+        :param fingerprint: 本次训练的训练输入指纹
+        :param incremental: 本次训练是否为增量学习
+        :return: 可续训检查点, 不存在、未开启 resume_cancelled或不属于本次训练时为 None
+
+        注意
+        ------
+        - 不属于本次训练的检查点会被删除
+        - 只由 0号进程调用
+        """
+
+        resume_path = self.model_path[ModelSaveMode.RESUME]
+        if not os.path.exists(resume_path):
+            return None
+
+        checkpoint = torch.load(resume_path)
+        if (self.resume_cancelled and checkpoint.get(Checkpoint.FINGERPRINT, None) == fingerprint
+                and checkpoint.get(Checkpoint.INCREMENTAL, None) == incremental):
+            return checkpoint
+
+        os.remove(resume_path)
+        return None
+
+    def solve(self,
+              model: LinearRegression,
+              solver: Solver,
+              cancel_token: CancellationToken = None,
+              progress_reporter: ProgressReporter = None) -> None:
+        """
+        以最小二乘闭式解求得模型参数并直接写入模型
+
+        :param model: 线性回归模型
+        :param solver: 求解方式
+        :param cancel_token: 取消令牌, 在读取每批数据前检查
+        :param progress_reporter: 进度报告器, 仅报告已读取的 batch数和样本数
+        :return: 无
+
+        注意
+        ------
+        - 岭回归系数与 weight_decay对应, 求解目标与梯度下降训练一致
+        - STREAMING方式逐批累积 X^T X和 X^T y, 内存占用与数据集大小无关
+        - 求解结果在训练数据上的损失作为一次迭代记入训练指标, 损失曲线始终对应最近一次训练
+        """
+
+        start = time.monotonic()
+        least_squares = LeastSquares(weight_decay = self.weight_decay)
+
+        batches = []
+        samples = 0
+        for batch, (X_batch, y_batch) in enumerate(self.train_dataloader, 1):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if solver is Solver.QR:
+                batches.append((X_batch, y_batch))
+            else:
+                least_squares.accumulate(X_batch, y_batch)
+
+            samples += len(y_batch)
+            if progress_reporter is not None:
+                progress_reporter.report(batch = batch, samples = samples)
+
+        if solver is Solver.QR:
+            weight, bias = least_squares.fit(torch.cat([X for X, _ in batches]), torch.cat([y for _, y in batches]))
+        else:
+            weight, bias = least_squares.solve()
+
+        with torch.no_grad():
+            model.output_layer.weight.copy_(weight)
+            model.output_layer.bias.copy_(bias)
+
+        if self.distributed is None or self.distributed.is_main:
+            recorder = MetricsRecorder(Trainer.metrics_path(self.model_dir, self.model_name), self.model_name)
+            recorder.record_epoch(1, least_squares.loss, None, time.monotonic() - start, [], samples = samples)
 
     def eval(self) -> tuple[Callable, ...]:
         """
         评估 NCF模型
 
-        :return: 准确率柱状图绘制函数
+        :return: 图像绘制函数, 调用后返回保存的图像地址
 
         注意
         ------
         - 该评测方法会重新分割数据集, 可检测模型的泛化能力
+        - 尚无训练指标记录(如模型由其他位置复制而来)时不绘制损失曲线
         """
 
-        def plot_regression_fit() -> None:
+        def plot_regression_fit() -> str:
             """
             绘制线性回归拟合效果图：真实值 vs 预测值
             适用于单特征线性回归（如 y = w*x + b）
 
-            :return: 无
+            :return: 图像地址
             """
             # 收集所有测试数据和预测结果
             all_x = []
             all_y_true = []
             all_y_pred = []
 
-            self.pretrained_model.eval()  # 切换到评估模式
+            # 取得当前版本的模型, 评估期间即使发生热替换也使用同一模型
+            model = self.pretrained_model
             with torch.no_grad():
                 for X_batch, y_batch in self.test_dataloader:
                     # X_batch: (batch_size, 1), y_batch: (batch_size,)
-                    pred = self.pretrained_model(X_batch).squeeze(1)  # (batch_size,)
+                    pred = model(X_batch).squeeze(1)  # (batch_size,)
 
                     all_x.append(X_batch.cpu().numpy())
                     all_y_true.append(y_batch.cpu().numpy())
@@ -178,33 +548,71 @@ class LinearController(ModelController):
             x_sorted = x_all[sorted_idx]
             y_pred_sorted = y_pred_all[sorted_idx]
 
-            # 绘图
-            plt.figure(figsize = (8, 6))
+            # 绘图, 不经过 pyplot, 无需图形界面
+            figure = Figure(figsize = (8, 6))
+            axes = figure.subplots()
 
             # 散点：真实数据
-            plt.scatter(x_all, y_true_all, alpha = 0.6, label = 'True values', color = 'skyblue', edgecolor = 'black')
+            axes.scatter(x_all, y_true_all, alpha = 0.6, label = 'True values', color = 'skyblue', edgecolor = 'black')
 
             # 拟合线：模型预测（按 x 排序后连线）
-            plt.plot(x_sorted, y_pred_sorted, color = 'red', linewidth = 2, label = f'Predicted (R² = {r2:.3f})')
+            axes.plot(x_sorted, y_pred_sorted, color = 'red', linewidth = 2, label = f'Predicted (R² = {r2:.3f})')
 
-            plt.title(f"{self.model_name} Fit")
-            plt.xlabel('Input feature (x)')
-            plt.ylabel('Target (y)')
-            plt.legend()
-            plt.grid(True, linestyle = '--', alpha = 0.5)
-            plt.gca().spines['top'].set_visible(False)
-            plt.gca().spines['right'].set_visible(False)
+            axes.set_title(f"{self.model_name} Fit")
+            axes.set_xlabel('Input feature (x)')
+            axes.set_ylabel('Target (y)')
+            axes.legend()
+            axes.grid(True, linestyle = '--', alpha = 0.5)
+            axes.spines['top'].set_visible(False)
+            axes.spines['right'].set_visible(False)
 
-            plt.show()
+            fit_path = os.path.join(self.model_dir, f'{self.model_name}_fit.svg')
+            figure.savefig(fit_path, bbox_inches = 'tight')
 
-        return (plot_regression_fit,)
+            return fit_path
+
+        def plot_loss() -> str:
+            """
+            由训练指标记录绘制最近一次训练的损失曲线
+
+            :return: 图像地址
+            """
+
+            return self.render_metrics('svg')
+
+        if not MetricsRecorder.load(Trainer.metrics_path(self.model_dir, self.model_name)):
+            return (plot_regression_fit,)
+
+        return plot_regression_fit, plot_loss
+
+    def render_metrics(self, image_format: str = 'svg') -> str:
+        """
+        将最近一次训练的指标记录渲染为损失曲线图
+
+        :param image_format: 图像格式, 如 svg / png
+        :return: 图像地址
+        """
+
+        return MetricsRecorder.render(Trainer.metrics_path(self.model_dir, self.model_name),
+                                      os.path.join(self.model_dir, f'{self.model_name}_loss.{image_format}'))
 
     def use(self, X: torch.Tensor) -> torch.Tensor:
         """
         预测指定X对应的y
 
-        :param X: 要预测的值
+        :param X: 要预测的值, 形状为 (样本数, 特征数)
         :return: X对应的值
+
+        注意
+        ------
+        - 推理在 inference_mode下进行, 不记录计算图
+        - 读取模型无需加锁
+        - 特征数与模型输入维度不一致时抛出 ValueError
         """
 
-        return self.pretrained_model(X)
+        # 只读取一次模型引用, 推理期间发生的热替换不影响本次请求
+        model = self.model_slot.model
+        if X.shape[-1] != model.output_layer.in_features:
+            raise ValueError(f"Expected {model.output_layer.in_features} features per sample, but got {X.shape[-1]}")
+        with torch.inference_mode():
+            return model(X)
@@ -7,6 +7,11 @@ from utils import Configurer
 class ModelController(ABC, Configurer):
     """
     模型控制类基类
+
+    注意
+    ------
+    - 实现类须定义 model_name(模型名称)和 dataset_name(所需数据集, 由 DataController的 get_{dataset_name}()加载)两个属性
+    - 支持数据并行训练的实现类须定义 distributed属性, 由 GeneralDispatch在训练进程中设置为 Distributed上下文
     """
 
     @abstractmethod
@@ -24,6 +29,22 @@ class ModelController(ABC, Configurer):
 
         pass
 
+    def dataset_arguments(self, incremental: bool, force: bool = False) -> dict[str, Any]:
+        """
+        获得加载所需数据集时传给 DataController的 get_{dataset_name}()的参数
+
+        :param incremental: 是否增量学习
+        :param force: 是否强制训练
+        :return: 关键字参数, 参数相同的模型共享同一数据集
+
+        注意
+        ------
+        - 默认不传参数, 即加载全部数据; 支持只以新增数据增量学习的子类可重写此方法传入上次训练时的水位线
+        - 强制训练时即使没有新增数据也须训练, 此时应加载全部数据
+        """
+
+        return {}
+
     @abstractmethod
     def load_model_into_memory(self) -> None:
         """
@@ -35,11 +56,32 @@ class ModelController(ABC, Configurer):
         pass
 
     @abstractmethod
-    def train(self, *args, **kwargs) -> None:
+    def fingerprint(self, incremental: bool = False) -> str:
+        """
+        计算训练输入的指纹, 包括数据集内容、超参数、模型类及训练方式
+
+        :param incremental: 是否增量学习
+        :return: 指纹
+
+        注意
+        ------
+        - 须在 load_data之后调用
+        - 增量学习的结果取决于所基于的模型, 其指纹须包括该模型的指纹, 不能与任何全量训练的指纹相同
+        """
+
+        pass
+
+    @abstractmethod
+    def train(self, *args, force: bool = False, **kwargs) -> bool:
         """
         获得完整模型的流程, 包括数据集定义, 数据集包装, 模型定义, 模型训练保存
 
-        :return: 无
+        :param force: 是否强制训练
+        :return: 是否实际进行了训练
+
+        注意
+        ------
+        - 训练输入的指纹与已保存模型的指纹一致且未指定 force时, 直接使用已保存的模型而不再训练
         """
 
         pass
@@ -49,7 +91,7 @@ class ModelController(ABC, Configurer):
         """
         评估模型的性能, 包括但不限于计算指标、绘制图表
 
-        :return: 绘制函数
+        :return: 绘制函数, 调用后将图表保存为文件并返回其地址
         """
 
         pass
@@ -0,0 +1,42 @@
+"""
+数据并行训练的单个训练进程入口, 由 GeneralDispatch.train_distributed()以 python -m control.train_rank启动
+
+训练进程只导入训练所需的模块, 不会重新执行启动训练的脚本(如 app.py中的服务初始化)
+"""
+
+import sys
+import argparse
+import threading
+
+from control import GeneralDispatch
+from utils.task import CancellationToken
+
+
+def watch_cancel(event: threading.Event) -> None:
+    """
+    标准输入关闭时设置取消事件, 父进程以关闭管道请求取消, 父进程退出时管道同样关闭
+
+    :param event: 取消事件
+    :return: 无
+    """
+
+    sys.stdin.read()
+    event.set()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Run one process of distributed training")
+    parser.add_argument('--config', type = str, required = True, help = "Path of settings.json")
+    parser.add_argument('--node-rank', type = int, required = True, help = "Rank of this host")
+    parser.add_argument('--local-rank', type = int, required = True, help = "Rank of this process on this host")
+    parser.add_argument('--incremental', action = 'store_true', help = "Train incrementally")
+    parser.add_argument('--force', action = 'store_true', help = "Train even if the inputs are unchanged")
+    parser.add_argument('--summary', type = str, default = None, help = "File the timing summary is written to by local rank 0")
+
+    args = parser.parse_args()
+
+    cancel_event = threading.Event()
+    threading.Thread(target = watch_cancel, args = (cancel_event,), daemon = True).start()
+
+    GeneralDispatch.train_rank(args.local_rank, args.config, args.incremental, args.force, args.node_rank,
+                               CancellationToken(cancel_event), args.summary)
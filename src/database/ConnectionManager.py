@@ -0,0 +1,124 @@
+import threading
+import time
+import traceback
+import logging
+from typing import Any
+
+from database import Database
+from utils import Configurer
+
+
+class ConnectionManager(Configurer):
+    """
+    数据库连接生命周期管理器
+
+    使用
+    ------
+    - 托管一组数据库, 在使用前确保其连接可用
+    >>> manager = ConnectionManager([MySQL(), Redis()])
+    >>> manager.acquire()
+
+    - 服务停止时关闭全部连接
+    >>> manager.close()
+
+    注意
+    ------
+    - 连接在请求之间保持打开, 仅在首次使用或健康检查失败后才会重连
+    - 健康检查在 acquire时进行, 距上次检查超过 health_check_interval(s)才 ping, 失效时就地关闭并重连
+    - 不使用后台线程, 连接只在调用 acquire的线程中被检查, 不会与正在使用连接的线程并发访问同一连接对象
+    """
+
+    def __init__(self, databases: list[Database]):
+        """
+        初始化参数
+
+        :param databases: 受托管的数据库
+        """
+
+        self.manager_name = self.__class__.__name__
+
+        # 健康检查间隔(s)
+        self.health_check_interval = 30.0
+
+        self.__databases = databases
+        self.__healthy = {id(database): False for database in databases}
+        # 各连接上次确认可用的时间
+        self.__checked_at = {id(database): 0.0 for database in databases}
+        self.__lock = threading.Lock()
+
+    def configure(self, settings: dict[str, Any]) -> None:
+        """
+        配置连接管理参数
+
+        :param settings: 设置内容
+        :return: 无
+        """
+
+        self.load_configuration(settings.get('database', {}).get(self.manager_name, {}))
+
+    def acquire(self) -> None:
+        """
+        确保所有数据库连接可用, 对未连接或失效的连接进行重连
+
+        :return: 无
+
+        注意
+        ------
+        - 距上次确认超过 health_check_interval的连接会先 ping一次, ping失败时关闭后重连
+        """
+
+        # 快速路径: 全部连接健康且无需检查时无需加锁
+        now = time.monotonic()
+        if all(self.__healthy.values()) and all(now - checked_at < self.health_check_interval
+                                                for checked_at in self.__checked_at.values()):
+            return
+
+        with self.__lock:
+            for database in self.__databases:
+                key = id(database)
+                if self.__healthy[key] and time.monotonic() - self.__checked_at[key] >= self.health_check_interval:
+                    self.__healthy[key] = self.__ping(database)
+
+                if not self.__healthy[key]:
+                    database.connect()
+                    self.__healthy[key] = True
+                self.__checked_at[key] = time.monotonic()
+
+    def close(self) -> None:
+        """
+        关闭所有数据库连接
+
+        :return: 无
+        """
+
+        with self.__lock:
+            for database in self.__databases:
+                if self.__healthy[id(database)]:
+                    database.close()
+                    self.__healthy[id(database)] = False
+
+    def __ping(self, database: Database) -> bool:
+        """
+        检查单个连接是否可用, 不可用时关闭该连接
+
+        :param database: 数据库
+        :return: 连接是否可用
+
+        注意
+        ------
+        - 须在持有 __lock时调用
+        """
+
+        try:
+            alive = database.ping()
+        except Exception:
+            alive = False
+            logging.getLogger(self.manager_name).warning(traceback.format_exc())
+
+        if not alive:
+            try:
+                database.close()
+            except Exception:
+                pass
+
+        return alive
@@ -27,3 +27,30 @@ class Database(ABC, Configurer):
         """
 
         pass
+
+    def ping(self) -> bool:
+        """
+        检查连接是否可用
+
+        :return: 连接是否可用
+
+        注意
+        ------
+        - 默认视为始终可用, 持有真实网络连接的子类请重写此方法
+        """
+
+        return True
+
+    def version(self, name: str) -> str | None:
+        """
+        获得指定数据源的内容版本, 内容变化时版本随之变化
+
+        :param name: 数据源名称, 如数据文件名或数据表名
+        :return: 内容版本, 无法判断时为 None
+
+        注意
+        ------
+        - 默认无法判断, 支持变化检测的子类请重写此方法
+        """
+
+        return None
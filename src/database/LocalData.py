@@ -1,5 +1,19 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import uuid
+import numpy as np
 import pandas as pd
-from typing import Any
+from typing import Any, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # 不支持 fcntl的平台上不对缓存构建加锁
+    fcntl = None
 
 from database import Database
 
@@ -7,6 +21,14 @@ from database import Database
 class LocalData(Database):
     """
     本地数据文件查取
+
+    注意
+    ------
+    - 开启缓存时, 每个数据文件首次读取后会被转换为按列存储的二进制缓存, 之后的读取直接内存映射缓存而不再解析文本
+    - 数据文件的大小或修改时间变化时缓存自动失效, 开启 cache_verify_hash后还会校验文件内容哈希
+    - 数据文件只在末尾追加时缓存只解析追加的部分并接在原有各列之后, 其他变化时整体重建
+    - 缓存以内存映射方式只读打开, 多个进程读取同一缓存时共享操作系统页缓存
+    - 多个进程(如数据并行训练的各训练进程)同时发现缓存失效时, 由文件锁保证只有一个进程重建, 其余进程等待后直接使用
     """
 
     def __init__(self):
@@ -22,6 +44,15 @@ class LocalData(Database):
             "linear_data": "../resource/static/linear_data.csv"
         }
 
+        # 是否启用列式二进制缓存
+        self.use_cache = True
+        # 缓存目录
+        self.cache_dir = "../../resource/dynamic/cache"
+        # 是否在校验缓存时比对数据文件内容哈希
+        self.cache_verify_hash = False
+        # 构建缓存时每次解析的行数
+        self.cache_chunk_size = 100000
+
     def configure(self, settings: dict[str, Any]) -> None:
         """
         配置本地数据文件路径
@@ -35,6 +66,7 @@ class LocalData(Database):
         # 将相对路径变为绝对路径, 以免运行时出错
         for file in self.local_data_file_path:
             self.local_data_file_path[file] = self.path_revise(self.local_data_file_path[file])
+        self.cache_dir = self.path_revise(self.cache_dir)
 
     def connect(self) -> None:
         pass
@@ -49,5 +81,475 @@ class LocalData(Database):
         :return: 数据的 DataFrame
         """
 
-        dataframe = pd.read_csv(self.local_data_file_path['linear_data'])
-        return dataframe
+        return self.read('linear_data')
+
+    def iter_linear_data(self, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        分块读取数据文件
+
+        :param chunk_size: 每块行数
+        :return: 数据块的 DataFrame迭代器
+
+        注意
+        ------
+        - 任一时刻仅有一块数据驻留内存, 适用于超出内存的数据文件
+        """
+
+        return self.iter_chunks('linear_data', chunk_size)
+
+    def get_linear_data_since(self, watermark: dict[str, int] = None) -> tuple[pd.DataFrame, dict[str, int] | None] | None:
+        """
+        读取数据文件在水位线之后追加的数据
+
+        :param watermark: 上次读取后返回的水位线, 为 None时读取全部数据
+        :return: 新增数据的 DataFrame及新的水位线, 数据文件并非只追加时为 None
+        """
+
+        return self.read_since('linear_data', watermark)
+
+    def sample_linear_data(self, rows: int, count: int) -> pd.DataFrame:
+        """
+        从数据文件的前若干行中随机抽取样本
+
+        :param rows: 抽样范围的行数
+        :param count: 样本数
+        :return: 样本的 DataFrame
+        """
+
+        return self.sample('linear_data', rows, count)
+
+    def version(self, name: str) -> str | None:
+        """
+        获得数据文件的内容版本
+
+        :param name: local_data_file_path中的数据文件名
+        :return: 由文件大小、修改时间及开启 cache_verify_hash时的内容哈希组成的版本, 文件不存在时为 None
+        """
+
+        try:
+            return json.dumps(self.__source_signature(name), sort_keys = True)
+        except OSError:
+            return None
+
+    def read(self, name: str) -> pd.DataFrame:
+        """
+        读取指定数据文件
+
+        :param name: local_data_file_path中的数据文件名
+        :return: 数据的 DataFrame
+
+        注意
+        ------
+        - 命中缓存时返回的 DataFrame各列为只读的内存映射数组
+        """
+
+        columns = self.__open_cache(name)
+        if columns is None:
+            return pd.read_csv(self.local_data_file_path[name])
+
+        return pd.DataFrame(columns, copy = False)
+
+    def read_since(self, name: str, watermark: dict[str, int] = None) -> tuple[pd.DataFrame, dict[str, int] | None] | None:
+        """
+        读取指定数据文件在水位线之后追加的数据
+
+        :param name: local_data_file_path中的数据文件名
+        :param watermark: 上次读取后返回的水位线, 为 None时读取全部数据
+        :return: 新增数据的 DataFrame及新的水位线, 数据文件被截断或改写时为 None;
+                 未命中缓存的全部读取期间数据文件被修改时无法确定水位线, 水位线为 None
+
+        注意
+        ------
+        - 水位线由已读取的行数 rows及对应的文件字节数 offset组成, 仅适用于只在末尾追加的数据文件
+        - 开启缓存时数据文件追加后缓存只解析追加的部分, 之后按行数切片内存映射的缓存;
+          未开启缓存或数据无法缓存时从字节偏移处继续解析, 均不重新解析已读取的数据
+        - 末尾没有换行符的最后一行同样被读取, 之后追加的数据须先补上换行符
+        """
+
+        path = self.local_data_file_path[name]
+        size = os.stat(path).st_size
+        if watermark is not None and not self.__appended(path, size, watermark['offset']):
+            return None
+
+        # 行数与字节数取自同一份缓存元数据, 两者对应同一版本的数据文件
+        cache = self.__open_cache_meta(name)
+        if cache is not None:
+            columns, meta = cache
+            start = 0 if watermark is None else watermark['rows']
+            if meta['rows'] < start:
+                return None
+            data = pd.DataFrame({column: array[start:] for column, array in columns.items()}, copy = False)
+            return data, {'rows': meta['rows'], 'offset': meta['source']['size']}
+
+        if watermark is None:
+            data = pd.read_csv(path)
+            if os.stat(path).st_size != size:
+                return data, None
+            return data, {'rows': len(data), 'offset': size}
+
+        start = watermark['offset']
+        with open(path, 'rb') as file:
+            file.seek(start)
+            content = file.read(size - start)
+
+        header = pd.read_csv(path, nrows = 0).columns
+        if content.strip():
+            # 补在上次最后一行末尾的换行符解析为空行, 被自动跳过
+            data = pd.read_csv(io.BytesIO(content), header = None, names = header)
+        else:
+            data = pd.DataFrame(columns = header)
+        return data, {'rows': watermark['rows'] + len(data), 'offset': size}
+
+    def sample(self, name: str, rows: int, count: int, seed: int = None) -> pd.DataFrame:
+        """
+        从指定数据文件的前若干行中无放回地随机抽取样本
+
+        :param name: local_data_file_path中的数据文件名
+        :param rows: 抽样范围的行数
+        :param count: 样本数, 超过 rows时取 rows
+        :param seed: 随机种子
+        :return: 按行号排列的样本 DataFrame
+
+        注意
+        ------
+        - 命中缓存时只读取被抽中的行, 否则需解析抽样范围内的全部行
+        """
+
+        index = np.sort(np.random.default_rng(seed).choice(rows, size = min(count, rows), replace = False))
+
+        columns = self.__open_cache(name)
+        if columns is not None:
+            return pd.DataFrame({column: array[index] for column, array in columns.items()})
+
+        return pd.read_csv(self.local_data_file_path[name], nrows = rows).iloc[index].reset_index(drop = True)
+
+    def iter_chunks(self, name: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        分块读取指定数据文件
+
+        :param name: local_data_file_path中的数据文件名
+        :param chunk_size: 每块行数
+        :return: 数据块的 DataFrame迭代器
+        """
+
+        columns = self.__open_cache(name)
+        if columns is None:
+            with pd.read_csv(self.local_data_file_path[name], chunksize = chunk_size) as reader:
+                yield from reader
+            return
+
+        rows = len(next(iter(columns.values()))) if columns else 0
+        for start in range(0, rows, chunk_size):
+            yield pd.DataFrame({column: array[start:start + chunk_size] for column, array in columns.items()}, copy = False)
+
+    def __open_cache(self, name: str) -> dict[str, np.ndarray] | None:
+        """
+        打开指定数据文件的缓存, 缓存缺失或失效时重建
+
+        :param name: 数据文件名
+        :return: 列名到内存映射数组的有序映射, 未启用缓存或无法缓存时为 None
+        """
+
+        cache = self.__open_cache_meta(name)
+        if cache is None:
+            return None
+
+        return cache[0]
+
+    def __open_cache_meta(self, name: str) -> tuple[dict[str, np.ndarray], dict[str, Any]] | None:
+        """
+        打开指定数据文件的缓存及其元数据, 缓存缺失或失效时重建
+
+        :param name: 数据文件名
+        :return: 列名到内存映射数组的有序映射及对应的缓存元数据, 未启用缓存或无法缓存时为 None
+
+        注意
+        ------
+        - 读取元数据后、映射之前该版本可能因数据文件变化被其他进程重建并清理, 此时重新读取元数据
+        """
+
+        for _ in range(3):
+            meta = self.__cache_meta(name)
+            if meta is None:
+                return None
+            try:
+                return self.__map_cache(name, meta), meta
+            except FileNotFoundError:
+                continue
+
+        return None
+
+    def __cache_meta(self, name: str) -> dict[str, Any] | None:
+        """
+        获得指定数据文件的有效缓存元数据, 缓存缺失或失效时重建
+
+        :param name: 数据文件名
+        :return: 缓存元数据, 未启用缓存或无法缓存时为 None
+
+        注意
+        ------
+        - 数据文件当前版本已被记录为无法缓存时直接返回 None, 不再尝试构建
+        """
+
+        if not self.use_cache:
+            return None
+
+        meta = self.__load_meta(name)
+        if not self.__cache_valid(name, meta):
+            with self.__build_lock(name):
+                # 等待锁期间其他进程可能已重建好缓存
+                meta = self.__load_meta(name)
+                if not self.__cache_valid(name, meta):
+                    meta = self.__extend_cache(name, meta) or self.__build_cache(name)
+
+        # 早于 cacheable字段的元数据均为可缓存
+        return meta if meta is not None and meta.get('cacheable', True) else None
+
+    def __cache_valid(self, name: str, meta: dict[str, Any] | None) -> bool:
+        """
+        判断缓存元数据是否与数据文件的当前版本一致
+
+        :param name: 数据文件名
+        :param meta: 缓存元数据
+        :return: 缓存是否有效
+        """
+
+        return meta is not None and all(meta['source'].get(key) == value for key, value in self.__source_signature(name).items())
+
+    @contextlib.contextmanager
+    def __build_lock(self, name: str) -> Iterator[None]:
+        """
+        以文件锁互斥同一数据文件的缓存构建, 跨进程及线程有效
+
+        :param name: 数据文件名
+        :return: 持有锁期间的上下文
+        """
+
+        name_dir = os.path.join(self.cache_dir, name)
+        os.makedirs(name_dir, exist_ok = True)
+        if fcntl is None:
+            yield
+            return
+
+        with open(os.path.join(name_dir, '.lock'), 'w') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def __map_cache(self, name: str, meta: dict[str, Any]) -> dict[str, np.ndarray]:
+        """
+        内存映射缓存元数据对应版本的各列
+
+        :param name: 数据文件名
+        :param meta: 缓存元数据
+        :return: 列名到内存映射数组的有序映射
+        """
+
+        version_dir = os.path.join(self.cache_dir, name, meta['version'])
+        return {
+            column: np.memmap(os.path.join(version_dir, f'{idx}.bin'), dtype = np.dtype(dtype), mode = 'r', shape = (meta['rows'],))
+            if meta['rows'] else np.empty(0, dtype = np.dtype(dtype))
+            for idx, (column, dtype) in enumerate(zip(meta['columns'], meta['dtypes']))
+        }
+
+    def __load_meta(self, name: str) -> dict[str, Any] | None:
+        """
+        读取缓存元数据
+
+        :param name: 数据文件名
+        :return: 缓存元数据, 不存在时为 None
+        """
+
+        try:
+            with open(os.path.join(self.cache_dir, name, 'meta.json'), 'r', encoding = 'UTF-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def __appended(path: str, size: int, offset: int) -> bool:
+        """
+        判断数据文件是否只在水位线之后追加了内容
+
+        :param path: 数据文件地址
+        :param size: 数据文件当前大小
+        :param offset: 水位线的字节偏移
+        :return: 水位线之前的内容是否可能未被改动
+
+        注意
+        ------
+        - 仅检查文件未变短且水位线位于行尾(其前或其后为换行符), 无法发现水位线之前等长的改写
+        - 水位线之后紧接换行符说明追加时先为没有换行符的最后一行补上了换行符, 已读取的最后一行未被改动
+        """
+
+        if size < offset:
+            return False
+        if offset == 0 or offset == size:
+            return True
+
+        with open(path, 'rb') as file:
+            file.seek(offset - 1)
+            return b'\n' in file.read(2)
+
+    def __source_signature(self, name: str) -> dict[str, Any]:
+        """
+        获得数据文件的版本签名
+
+        :param name: 数据文件名
+        :return: 数据文件大小、修改时间, 开启 cache_verify_hash时还包括内容哈希
+        """
+
+        path = self.local_data_file_path[name]
+        stat = os.stat(path)
+        signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+        if self.cache_verify_hash:
+            digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(block)
+            signature['sha256'] = digest.hexdigest()
+
+        return signature
+
+    def __save_meta(self, name: str, meta: dict[str, Any]) -> None:
+        """
+        原子替换缓存元数据
+
+        :param name: 数据文件名
+        :param meta: 缓存元数据
+        :return: 无
+        """
+
+        meta_path = os.path.join(self.cache_dir, name, 'meta.json')
+        temp_path = f'{meta_path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w', encoding = 'UTF-8') as file:
+            json.dump(meta, file)
+        os.replace(temp_path, meta_path)
+
+    def __extend_cache(self, name: str, meta: dict[str, Any] | None) -> dict[str, Any] | None:
+        """
+        解析数据文件在缓存之后追加的内容, 并接在缓存各列之后
+
+        :param name: 数据文件名
+        :param meta: 已失效的缓存元数据
+        :return: 扩展后缓存的元数据, 数据文件并非只在末尾追加、追加内容类型不兼容或解析期间文件发生变化时为 None
+
+        注意
+        ------
+        - 原地追加写入当前版本的各列文件, 元数据替换前其他进程仍按旧行数映射, 读取不受影响
+        - 各列文件先截断至元数据记录的长度, 丢弃此前失败的扩展留下的残余数据
+        - 开启 cache_verify_hash时无法只校验已缓存部分的内容, 总是整体重建
+        - 须在持有 __build_lock时调用
+        """
+
+        if meta is None or not meta.get('cacheable', True) or not meta['columns'] or self.cache_verify_hash:
+            return None
+
+        path = self.local_data_file_path[name]
+        signature = self.__source_signature(name)
+        offset = meta['source']['size']
+        if signature['size'] <= offset or not self.__appended(path, signature['size'], offset):
+            return None
+
+        version_dir = os.path.join(self.cache_dir, name, meta['version'])
+        dtypes = [np.dtype(dtype) for dtype in meta['dtypes']]
+        rows = meta['rows']
+        try:
+            for idx, dtype in enumerate(dtypes):
+                os.truncate(os.path.join(version_dir, f'{idx}.bin'), rows * dtype.itemsize)
+
+            with open(path, 'rb') as source:
+                source.seek(offset)
+                # 补在上次最后一行末尾的换行符解析为空行, 被自动跳过
+                with pd.read_csv(source, header = None, names = meta['columns'], chunksize = self.cache_chunk_size) as reader:
+                    for chunk in reader:
+                        for idx, column in enumerate(chunk.columns):
+                            array = chunk[column].to_numpy()
+                            if not np.can_cast(array.dtype, dtypes[idx], 'safe'):
+                                raise TypeError(f"Column '{column}' of data file '{name}' changes type from {dtypes[idx]} to {array.dtype}")
+                            with open(os.path.join(version_dir, f'{idx}.bin'), 'ab') as file:
+                                array.astype(dtypes[idx], copy = False).tofile(file)
+                        rows += len(chunk)
+
+            if signature != self.__source_signature(name):
+                raise ValueError(f"Data file '{name}' changed while extending cache")
+
+        except (TypeError, ValueError, OSError):
+            return None
+
+        meta = {**meta, 'source': signature, 'rows': rows}
+        self.__save_meta(name, meta)
+
+        return meta
+
+    def __build_cache(self, name: str) -> dict[str, Any] | None:
+        """
+        逐块解析数据文件并写入列式二进制缓存
+
+        :param name: 数据文件名
+        :return: 新缓存的元数据, 数据含非数值列时为标记了 cacheable为 False的元数据, 解析期间文件发生变化或写入失败时为 None
+
+        注意
+        ------
+        - 每列写入独立的二进制文件, 新版本写入独立目录后再原子替换元数据, 正在读取旧版本的进程不受影响
+        - 无法缓存的结论随数据文件签名一同记录, 数据文件变化前不再重复尝试构建
+        - 须在持有 __build_lock时调用, 清理旧版本时不会删除其他进程正在构建的版本
+        """
+
+        signature = self.__source_signature(name)
+        version = uuid.uuid4().hex
+        name_dir = os.path.join(self.cache_dir, name)
+        version_dir = os.path.join(name_dir, version)
+        os.makedirs(version_dir, exist_ok = True)
+
+        columns, dtypes, rows = None, None, 0
+        try:
+            with pd.read_csv(self.local_data_file_path[name], chunksize = self.cache_chunk_size) as reader:
+                for chunk in reader:
+                    if columns is None:
+                        columns = [str(column) for column in chunk.columns]
+                        dtypes = [chunk[column].dtype for column in chunk.columns]
+                        if any(dtype.kind not in 'biuf' for dtype in dtypes):
+                            raise TypeError(f"Data file '{name}' contains non-numeric columns")
+
+                    for idx, column in enumerate(chunk.columns):
+                        array = chunk[column].to_numpy()
+                        if not np.can_cast(array.dtype, dtypes[idx], 'safe'):
+                            raise TypeError(f"Column '{column}' of data file '{name}' changes type from {dtypes[idx]} to {array.dtype}")
+                        with open(os.path.join(version_dir, f'{idx}.bin'), 'ab') as file:
+                            array.astype(dtypes[idx], copy = False).tofile(file)
+                    rows += len(chunk)
+
+            # 解析期间数据文件被修改, 缓存内容与签名可能不一致
+            if signature != self.__source_signature(name):
+                raise ValueError(f"Data file '{name}' changed while building cache")
+
+        except TypeError:
+            shutil.rmtree(version_dir, ignore_errors = True)
+            meta = {'source': signature, 'cacheable': False}
+
+        except (ValueError, OSError):
+            shutil.rmtree(version_dir, ignore_errors = True)
+            return None
+
+        else:
+            meta = {
+                'source': signature,
+                'cacheable': True,
+                'version': version,
+                'rows': rows,
+                'columns': columns or [],
+                'dtypes': [dtype.str for dtype in dtypes or []]
+            }
+        self.__save_meta(name, meta)
+
+        # 清理旧版本, 已映射旧文件的进程在关闭前仍可正常读取
+        for entry in os.listdir(name_dir):
+            entry_path = os.path.join(name_dir, entry)
+            if entry != version and os.path.isdir(entry_path):
+                shutil.rmtree(entry_path, ignore_errors = True)
+
+        return meta
@@ -90,3 +90,29 @@ class MySQL(Database):
 
         self.cursor.close()
         self.conn.close()
+
+    def ping(self) -> bool:
+        """
+        检查数据库连接是否可用
+
+        :return: 连接是否可用
+        """
+
+        return self.conn is not None and self.conn.is_connected()
+
+    def version(self, name: str) -> str | None:
+        """
+        获得数据表的内容版本
+
+        :param name: table中的逻辑表名
+        :return: 数据表的 CHECKSUM, 表不存在时为 None
+
+        注意
+        ------
+        - CHECKSUM TABLE在未开启 live checksum的表上需要扫描全表, 大表请改用自增主键或更新时间等水位线
+        """
+
+        self.cursor.execute(f"CHECKSUM TABLE `{self.table[name]['table_name']}`")
+        row = self.cursor.fetchone()
+
+        return None if row is None or row[1] is None else str(row[1])
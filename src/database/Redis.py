@@ -72,6 +72,21 @@ class Redis(Database):
             self.process.wait()
             self.process = None
 
+    def ping(self) -> bool:
+        """
+        检查 Redis客户端连接是否可用
+
+        :return: 连接是否可用
+        """
+
+        if self.client is None:
+            return False
+
+        try:
+            return bool(self.client.ping())
+        except redis.RedisError:
+            return False
+
     def is_redis_server_running(self) -> bool:
         """
         检查 Redis服务端是否正在运行
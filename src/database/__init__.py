@@ -3,9 +3,11 @@ from .MySQL import MySQL
 from .Redis import Redis
 from .Faiss import Faiss
 from .LocalData import LocalData
+from .ConnectionManager import ConnectionManager
 
 __all__ = ['Database',
            'MySQL',
            'Redis',
            'Faiss',
-           'LocalData']
+           'LocalData',
+           'ConnectionManager']
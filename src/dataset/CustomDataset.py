@@ -1,27 +1,41 @@
-from abc import ABC, abstractmethod
+import hashlib
+from abc import ABC
+from functools import cached_property
+from typing import Sequence
 import numpy as np
+import torch
 from torch.utils.data import Dataset
-import copy
+
+from common import SplitMode
 
 
 class CustomDataset(ABC, Dataset):
     """
     自定义数据集类, 在 Dataset的基础上扩展更多操作
+
+    注意
+    ------
+    - 特征和标签以连续的 float32张量存储, 仅在构造时创建一次
+    - __getitem__既可接收单个下标, 也可接收下标序列一次取出整批样本, 后者可让 Loader跳过逐样本的取数和拼接
     """
 
+    # __getitem__是否支持以下标序列一次取出整批样本, 子类若改为逐样本实现请置为 False
+    batch_indexable = True
+
     def __init__(self, *args, **kwargs):
         """
         预设数据
 
         :param args: 位置参数
         :param kwargs: 关键字参数
-
-        注意
-        ------
-        - 采用列表更方便后期根据需求扩展成 ndarray或 tensor
         """
 
-        self.data = np.array(None)
+        # 特征张量, 形状为 (样本数, 特征数)
+        self.features = torch.empty(0, 0)
+        # 标签张量, 形状为 (样本数, 标签数)
+        self.labels = torch.empty(0, 1)
+        # 构建数据集时数据源的水位线, 由数据控制类设置, 无法增量读取的数据源为 None
+        self.watermark = None
 
     def __len__(self) -> int:
         """
@@ -31,45 +45,130 @@ class CustomDataset(ABC, Dataset):
 
         注意
         ------
-        - 此基类方法返回的是最外层列表的元素个数
+        - 此基类方法返回的是特征张量的样本数
         - 如有特殊长度处理需求请在子类中重写 __len__方法
         """
 
-        return len(self.data)
+        return len(self.features)
 
-    @abstractmethod
-    def __getitem__(self, item: int) -> None:
+    def __getitem__(self, item: int | Sequence[int] | torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
         """
         获得数据集指定下标样本
 
-        :param item: 下标
-        :return: 对应下标的数据样本
+        :param item: 单个下标或下标序列
+        :return: 对应下标的特征张量, 标签张量
+
+        注意
+        ------
+        - 传入下标序列时返回整批样本, 第一维为批大小
+        - 如有特殊取数需求请在子类中重写, 并视情况修改 batch_indexable
+        """
+
+        return self.features[item], self.labels[item]
+
+    @cached_property
+    def content_hash(self) -> str:
+        """
+        获得数据集内容的哈希, 计算一次后缓存
+
+        :return: 特征和标签的形状及内容的 sha256
+
+        注意
+        ------
+        - 数据集内容在构造后不应再被修改, 否则缓存的哈希会失效
+        """
+
+        digest = hashlib.sha256()
+        for tensor in (self.features, self.labels):
+            array = np.ascontiguousarray(tensor.numpy())
+            digest.update(str(array.shape).encode())
+            digest.update(array)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def to_tensor(array: np.ndarray) -> torch.Tensor:
+        """
+        将数组转换为连续的 float32张量
+
+        :param array: 原始数组
+        :return: 连续的 float32张量
 
         注意
         ------
-        - 基类中作抽象方法, 请在每个子类中具体实现
+        - 数组已为连续的 float32时不发生复制
         """
 
-        pass
+        return torch.from_numpy(np.ascontiguousarray(array, dtype = np.float32))
 
     @staticmethod
-    def train_test_split(dataset: 'CustomDataset', train_ratio: float) -> tuple['CustomDataset', 'CustomDataset']:
+    def train_test_split(dataset: 'CustomDataset',
+                         train_ratio: float,
+                         mode: SplitMode = SplitMode.RANDOM,
+                         seed: int = None,
+                         bins: int = 10) -> tuple['CustomDataset', 'CustomDataset']:
         """
         将数据集分为训练和测试两部分
 
         :param dataset: 继承了 CustomDataset的子类数据集
         :param train_ratio: 训练样本比例
+        :param mode: 划分方式
+        :param seed: 随机种子, 指定后划分结果可复现
+        :param bins: 分层划分时连续标签的分位数分箱数
         :return: 训练数据集, 测试数据集
+
+        注意
+        ------
+        - 仅对下标做划分, 返回的两个子集与原数据集共享存储, 不复制数据
+        - 分层划分使用第一列标签, 离散标签的每个取值自成一层
         """
 
-        train_dataset = copy.deepcopy(dataset)
-        test_dataset = copy.deepcopy(dataset)
+        from .SubsetDataset import SubsetDataset
+
+        generator = torch.Generator()
+        if seed is None:
+            generator.seed()
+        else:
+            generator.manual_seed(seed)
+
+        if mode is SplitMode.STRATIFIED:
+            train_index, test_index = CustomDataset.stratified_index(dataset.labels[:, 0], train_ratio, bins, generator)
+        else:
+            if mode is SplitMode.TEMPORAL:
+                index = torch.arange(len(dataset))
+            else:
+                index = torch.randperm(len(dataset), generator = generator)
+            split_index = int(train_ratio * len(dataset))
+            train_index, test_index = index[:split_index], index[split_index:]
+
+        return SubsetDataset(dataset, train_index), SubsetDataset(dataset, test_index)
+
+    @staticmethod
+    def stratified_index(labels: torch.Tensor,
+                         train_ratio: float,
+                         bins: int,
+                         generator: torch.Generator) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        按标签分层划分下标
+
+        :param labels: 一维标签张量
+        :param train_ratio: 训练样本比例
+        :param bins: 连续标签的分位数分箱数
+        :param generator: 随机数生成器
+        :return: 训练集下标, 测试集下标
+        """
 
-        original_data = dataset.data.copy()
-        np.random.shuffle(original_data)
+        # 以分位点作为分层边界, 离散标签的重复分位点去重后即按取值分层
+        values = labels.numpy()
+        boundaries = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        strata = torch.from_numpy(np.searchsorted(boundaries, values, side = 'right'))
 
-        split_index = int(train_ratio * len(original_data))
-        train_dataset.data = original_data[:split_index]
-        test_dataset.data = original_data[split_index:]
+        train_index, test_index = [], []
+        for stratum in torch.unique(strata):
+            index = torch.nonzero(strata == stratum).flatten()
+            index = index[torch.randperm(len(index), generator = generator)]
+            split_index = int(train_ratio * len(index))
+            train_index.append(index[:split_index])
+            test_index.append(index[split_index:])
 
-        return train_dataset, test_dataset
+        return torch.cat(train_index), torch.cat(test_index)
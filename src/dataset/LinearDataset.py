@@ -1,4 +1,3 @@
-import torch
 import pandas as pd
 
 from dataset import CustomDataset
@@ -13,19 +12,11 @@ class LinearDataset(CustomDataset):
         """
         读入原始数据
 
-        :param dataframe: 数据DataFrame
+        :param dataframe: 数据DataFrame, 最后一列为标签, 其余列为特征
         """
 
         super().__init__()
 
-        self.data = dataframe.to_numpy()
-
-    def __getitem__(self, item: int) -> tuple[torch.Tensor, torch.Tensor]:
-        """
-        获得单个样本
-
-        :param item: 样本标号
-        :return: 一维特征张量, 一维标签张量
-        """
-
-        return torch.tensor(self.data[item][:-1], dtype = torch.float32), torch.tensor(self.data[item][-1:], dtype = torch.float32)
+        data = dataframe.to_numpy()
+        self.features = self.to_tensor(data[:, :-1])
+        self.labels = self.to_tensor(data[:, -1:])
@@ -0,0 +1,193 @@
+import copy
+import hashlib
+from functools import cached_property
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from common import SplitMode
+
+
+class StreamingDataset(IterableDataset):
+    """
+    CustomDataset的流式变体, 逐块读取数据源, 内存占用与数据集大小无关
+
+    使用
+    ------
+    - 以返回 DataFrame块迭代器的函数创建数据集
+    >>> dataset = StreamingDataset(lambda: pd.read_csv('data.csv', chunksize = 10000))
+    >>> train_dataset, test_dataset = dataset.train_test_split(dataset, 0.8)
+
+    注意
+    ------
+    - 每块 DataFrame的最后一列为标签, 其余列为特征
+    - 迭代直接产出整批的 (特征张量, 标签张量), 请以 batch_size = None交给 DataLoader, Loader会自动处理
+    - 训练测试划分按全局行号哈希决定, 与读取顺序、块大小及 DataLoader工作进程数无关
+    - 多个 DataLoader工作进程按块轮流分配, 每个进程仍需顺序读过全部块以计算行号, 但只转换属于自己的块
+    """
+
+    # 迭代产出整批样本
+    batch_indexable = False
+
+    # 划分标记
+    TRAIN = 'train'
+    TEST = 'test'
+
+    def __init__(self,
+                 chunk_reader: Callable[[], Iterable[pd.DataFrame]],
+                 batch_size: int = 100,
+                 buffer_size: int = 10000,
+                 shuffle: bool = True):
+        """
+        初始化参数
+
+        :param chunk_reader: 每次调用返回一个新的 DataFrame块迭代器
+        :param batch_size: 批大小
+        :param buffer_size: 乱序缓冲区样本数, 缓冲区内的样本会被打乱
+        :param shuffle: 是否在缓冲区内打乱
+        """
+
+        self.chunk_reader = chunk_reader
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.shuffle = shuffle
+        # 流式读取不支持增量读取, 水位线恒为 None
+        self.watermark = None
+
+        # 划分参数, 未划分时产出全部样本
+        self.partition = None
+        self.train_ratio = 1.0
+        self.seed = 0
+
+    def __iter__(self) -> Iterator[tuple[torch.Tensor, torch.Tensor]]:
+        """
+        逐批产出样本
+
+        :return: (特征张量, 标签张量) 批迭代器
+        """
+
+        worker_info = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        rng = np.random.default_rng()
+
+        buffer, buffered, row_offset = [], 0, 0
+        for chunk_idx, chunk in enumerate(self.chunk_reader()):
+            row_ids = np.arange(row_offset, row_offset + len(chunk), dtype = np.uint64)
+            row_offset += len(chunk)
+
+            if chunk_idx % num_workers != worker_id:
+                continue
+
+            values = chunk.to_numpy(dtype = np.float32)
+            if self.partition is not None:
+                in_train = self.hash_unit(row_ids, self.seed) < self.train_ratio
+                values = values[in_train if self.partition == self.TRAIN else ~in_train]
+
+            buffer.append(values)
+            buffered += len(values)
+            if buffered >= self.buffer_size:
+                yield from self.__drain(buffer, rng, final = False)
+                buffered = sum(len(rest) for rest in buffer)
+
+        yield from self.__drain(buffer, rng, final = True)
+
+    def __drain(self, buffer: list[np.ndarray], rng: np.random.Generator, final: bool) -> Iterator[tuple[torch.Tensor, torch.Tensor]]:
+        """
+        打乱缓冲区并产出整批样本
+
+        :param buffer: 缓冲区
+        :param rng: 随机数生成器
+        :param final: 是否为最后一次清空, 否则不足一批的剩余样本留在缓冲区
+        :return: (特征张量, 标签张量) 批迭代器
+        """
+
+        if not buffer:
+            return
+
+        data = np.concatenate(buffer)
+        buffer.clear()
+        if self.shuffle:
+            data = data[rng.permutation(len(data))]
+
+        full = len(data) if final else len(data) - len(data) % self.batch_size
+        for start in range(0, full, self.batch_size):
+            batch = data[start:start + self.batch_size]
+            yield (torch.from_numpy(np.ascontiguousarray(batch[:, :-1])),
+                   torch.from_numpy(np.ascontiguousarray(batch[:, -1:])))
+
+        if full < len(data):
+            buffer.append(data[full:])
+
+    @cached_property
+    def content_hash(self) -> str:
+        """
+        获得数据源内容的哈希, 计算一次后缓存
+
+        :return: 全部数据块的 sha256
+
+        注意
+        ------
+        - 需要完整读过一遍数据源, 与划分无关
+        """
+
+        digest = hashlib.sha256()
+        for chunk in self.chunk_reader():
+            values = np.ascontiguousarray(chunk.to_numpy(dtype = np.float32))
+            digest.update(str(values.shape[1:]).encode())
+            digest.update(values)
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_unit(row_ids: np.ndarray, seed: int) -> np.ndarray:
+        """
+        将行号确定性地散列到 [0, 1)
+
+        :param row_ids: uint64行号
+        :param seed: 随机种子
+        :return: 与行号一一对应的 [0, 1)浮点数
+        """
+
+        # splitmix64
+        z = row_ids + np.uint64((seed * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+
+        return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+    @staticmethod
+    def train_test_split(dataset: 'StreamingDataset',
+                         train_ratio: float,
+                         mode: SplitMode = SplitMode.RANDOM,
+                         seed: int = None,
+                         **kwargs) -> tuple['StreamingDataset', 'StreamingDataset']:
+        """
+        将数据集分为训练和测试两部分
+
+        :param dataset: 流式数据集
+        :param train_ratio: 训练样本比例
+        :param mode: 划分方式, 仅支持 RANDOM
+        :param seed: 散列种子, 为 None时使用 0
+        :param kwargs: 兼容 CustomDataset.train_test_split的其余参数
+        :return: 训练数据集, 测试数据集
+
+        注意
+        ------
+        - 划分只改变读取时的行过滤条件, 不读取任何数据
+        """
+
+        if mode is not SplitMode.RANDOM:
+            raise ValueError(f"{StreamingDataset.__name__} only supports '{SplitMode.RANDOM.value}' split, got '{mode.value}'")
+
+        train_dataset = copy.copy(dataset)
+        test_dataset = copy.copy(dataset)
+        for partition_dataset, partition in ((train_dataset, StreamingDataset.TRAIN), (test_dataset, StreamingDataset.TEST)):
+            partition_dataset.partition = partition
+            partition_dataset.train_ratio = train_ratio
+            partition_dataset.seed = 0 if seed is None else seed
+
+        return train_dataset, test_dataset
@@ -0,0 +1,80 @@
+import torch
+
+from dataset import CustomDataset
+
+
+class SubsetDataset(CustomDataset):
+    """
+    数据集子集视图, 与原数据集共享同一份存储
+
+    注意
+    ------
+    - 仅保存下标张量, 取数时经下标映射到原数据集, 不复制任何样本
+    - 对子集再取子集时直接组合下标, 始终只有一层映射
+    """
+
+    def __init__(self, dataset: CustomDataset, indices: torch.Tensor):
+        """
+        初始化参数
+
+        :param dataset: 原数据集
+        :param indices: 子集样本在原数据集中的下标
+        """
+
+        if isinstance(dataset, SubsetDataset):
+            indices = dataset.indices[indices]
+            dataset = dataset.dataset
+
+        self.dataset = dataset
+        self.indices = indices.to(torch.long)
+        self.batch_indexable = dataset.batch_indexable
+
+    @property
+    def features(self) -> torch.Tensor:
+        """
+        获得子集的特征张量
+
+        :return: 特征张量
+
+        注意
+        ------
+        - 会按下标复制出一份新张量, 训练时请通过 DataLoader取数
+        """
+
+        return self.dataset.features[self.indices]
+
+    @property
+    def labels(self) -> torch.Tensor:
+        """
+        获得子集的标签张量
+
+        :return: 标签张量
+
+        注意
+        ------
+        - 会按下标复制出一份新张量, 训练时请通过 DataLoader取数
+        """
+
+        return self.dataset.labels[self.indices]
+
+    def __len__(self) -> int:
+        """
+        获得子集长度
+
+        :return: 子集长度
+        """
+
+        return len(self.indices)
+
+    def __getitem__(self, item):
+        """
+        获得子集指定下标样本
+
+        :param item: 单个下标或下标序列
+        :return: 对应下标的数据样本
+        """
+
+        if isinstance(item, int):
+            return self.dataset[int(self.indices[item])]
+
+        return self.dataset[self.indices[item]]
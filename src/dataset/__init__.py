@@ -1,5 +1,9 @@
 from .CustomDataset import CustomDataset
+from .SubsetDataset import SubsetDataset
 from .LinearDataset import LinearDataset
+from .StreamingDataset import StreamingDataset
 
 __all__ = ['CustomDataset',
-           'LinearDataset']
+           'SubsetDataset',
+           'LinearDataset',
+           'StreamingDataset']
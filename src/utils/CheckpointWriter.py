@@ -0,0 +1,154 @@
+import copy
+import os
+import threading
+import uuid
+from typing import Any
+
+import torch
+
+
+class CheckpointWriter:
+    """
+    后台检查点写入器, 训练线程只负责在内存中拍下快照, 序列化和写盘在独立线程中完成
+
+    使用
+    ------
+    - 提交一组需要一起写入的文件, 立即返回
+    >>> writer = CheckpointWriter()
+    >>> writer.submit('LinearRegression', {'LinearRegression_STATE.pth': model.state_dict()})
+
+    - 训练结束后等待全部写入完成
+    >>> writer.flush()
+
+    注意
+    ------
+    - 提交时即对内容做深拷贝, 之后训练继续修改参数不会影响快照
+    - 每个文件先写入同目录下的临时文件, fsync后原子地替换目标文件, 读取方不会读到写了一半的文件
+    - 同一键只保留最新一份待写快照, 磁盘跟不上时中间的快照被直接丢弃
+    - 写入失败的异常会在下一次 flush时抛出
+    - 写入线程在没有待写快照时即退出, 下一次提交时重新启动, 闲置的写入器不占用线程
+    """
+
+    def __init__(self):
+        """
+        初始化参数
+        """
+
+        # 待写快照, 键为提交时指定的键, 值为 {文件地址: 内容}
+        self.__pending: dict[str, dict[str, Any]] = {}
+        # 是否有快照正在写入
+        self.__writing = False
+        self.__error: BaseException | None = None
+        # 被丢弃的中间快照数
+        self.__dropped = 0
+
+        self.__changed = threading.Condition()
+        self.__worker = None
+
+    @property
+    def dropped(self) -> int:
+        """
+        获得被丢弃的中间快照数
+
+        :return: 被丢弃的中间快照数
+        """
+
+        return self.__dropped
+
+    def submit(self, key: str, files: dict[str, Any]) -> None:
+        """
+        提交一组需要写入的文件
+
+        :param key: 快照键, 同键的未写入快照会被新快照替换
+        :param files: 文件地址到待保存对象的映射
+        :return: 无
+        """
+
+        snapshot = {path: copy.deepcopy(obj) for path, obj in files.items()}
+
+        with self.__changed:
+            if key in self.__pending:
+                self.__dropped += 1
+            self.__pending[key] = snapshot
+
+            if self.__worker is None:
+                self.__worker = threading.Thread(target = self.__run, daemon = True)
+                self.__worker.start()
+            self.__changed.notify_all()
+
+    def flush(self) -> None:
+        """
+        等待所有已提交的快照写入完成
+
+        :return: 无
+        """
+
+        with self.__changed:
+            self.__changed.wait_for(lambda: not self.__pending and not self.__writing)
+            error, self.__error = self.__error, None
+
+        if error is not None:
+            raise error
+
+    def __run(self) -> None:
+        """
+        循环取出快照并写入, 全部写完后退出
+
+        :return: 无
+        """
+
+        while True:
+            with self.__changed:
+                if not self.__pending:
+                    self.__worker = None
+                    self.__changed.notify_all()
+                    return
+                key = next(iter(self.__pending))
+                snapshot = self.__pending.pop(key)
+                self.__writing = True
+
+            try:
+                for path, obj in snapshot.items():
+                    self.write(path, obj)
+            except BaseException as e:
+                with self.__changed:
+                    self.__error = e
+            finally:
+                with self.__changed:
+                    self.__writing = False
+                    self.__changed.notify_all()
+
+    @staticmethod
+    def write(path: str, obj: Any) -> None:
+        """
+        原子地写入单个文件
+
+        :param path: 文件地址
+        :param obj: 待保存对象
+        :return: 无
+        """
+
+        directory = os.path.dirname(os.path.abspath(path))
+        temp_path = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        try:
+            with open(temp_path, 'wb') as file:
+                torch.save(obj, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # 持久化目录项, 确保断电后替换结果仍然有效; 部分平台不支持对目录 fsync
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
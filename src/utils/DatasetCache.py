@@ -0,0 +1,159 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+import torch
+
+
+class DatasetCache:
+    """
+    带版本的数据集内存缓存, 按总字节数上限做 LRU淘汰
+
+    使用
+    ------
+    - 以数据源标识和内容版本取出数据集, 版本不符或未缓存时构建并缓存
+    >>> cache = DatasetCache(max_bytes = 512 * 1024 ** 2)
+    >>> dataset = cache.get_or_build('LinearDataset', version, build_dataset)
+
+    注意
+    ------
+    - 同一数据源只保留最新版本, 版本变化时旧版本立即被替换
+    - 版本为 None表示无法判断数据是否变化, 此时总是重新构建且不缓存
+    - 缓存的数据集被所有使用方共享, 使用方不得修改其内容
+    - 单个数据集超过上限时不缓存
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        初始化参数
+
+        :param max_bytes: 缓存总字节数上限
+        """
+
+        self.max_bytes = max_bytes
+
+        # 数据源标识到 (版本, 数据集, 字节数)的映射, 按最近使用顺序排列
+        self.__entries: OrderedDict[str, tuple[str, Any, int]] = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+
+    def get_or_build(self, key: str, version: str | None, build: Callable[[], Any]) -> Any:
+        """
+        获得缓存的数据集, 版本不符或未缓存时构建
+
+        :param key: 数据源标识
+        :param version: 数据源内容版本
+        :param build: 构建数据集的函数
+        :return: 数据集
+
+        注意
+        ------
+        - 构建在锁外进行, 并发构建同一数据集时以后完成者为准
+        """
+
+        if version is not None:
+            with self.__lock:
+                entry = self.__entries.get(key, None)
+                if entry is not None and entry[0] == version:
+                    self.__entries.move_to_end(key)
+                    self.__hits += 1
+                    return entry[1]
+                self.__misses += 1
+
+        dataset = build()
+        if version is not None:
+            self.put(key, version, dataset)
+
+        return dataset
+
+    def put(self, key: str, version: str, dataset: Any) -> None:
+        """
+        缓存数据集, 并淘汰最久未使用的数据集直至不超过上限
+
+        :param key: 数据源标识
+        :param version: 数据源内容版本
+        :param dataset: 数据集
+        :return: 无
+        """
+
+        size = self.estimate_size(dataset)
+        with self.__lock:
+            self.__discard(key)
+            if size > self.max_bytes:
+                return
+
+            self.__entries[key] = (version, dataset, size)
+            self.__bytes += size
+            while self.__bytes > self.max_bytes:
+                self.__discard(next(iter(self.__entries)))
+
+    def invalidate(self, key: str = None) -> None:
+        """
+        移除缓存
+
+        :param key: 数据源标识, 为 None时清空全部缓存
+        :return: 无
+        """
+
+        with self.__lock:
+            for entry_key in list(self.__entries) if key is None else [key]:
+                self.__discard(entry_key)
+
+    def statistics(self) -> dict[str, Any]:
+        """
+        获得缓存统计
+
+        :return: 命中数、未命中数、已用字节数及各数据源的版本和字节数
+        """
+
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'bytes': self.__bytes,
+                'max_bytes': self.max_bytes,
+                'entries': {key: {'version': version, 'bytes': size} for key, (version, _, size) in self.__entries.items()}
+            }
+
+    def __discard(self, key: str) -> None:
+        """
+        移除单个缓存
+
+        :param key: 数据源标识
+        :return: 无
+
+        注意
+        ------
+        - 须在持有 __lock时调用
+        """
+
+        entry = self.__entries.pop(key, None)
+        if entry is not None:
+            self.__bytes -= entry[2]
+
+    @staticmethod
+    def estimate_size(dataset: Any) -> int:
+        """
+        估计数据集占用的字节数
+
+        :param dataset: 数据集
+        :return: 字节数
+
+        注意
+        ------
+        - 统计数据集直接持有的张量和数组, 其余属性按 sys.getsizeof估计
+        """
+
+        size = sys.getsizeof(dataset)
+        for value in vars(dataset).values():
+            if isinstance(value, torch.Tensor):
+                size += value.element_size() * value.nelement()
+            elif hasattr(value, 'nbytes'):
+                size += int(value.nbytes)
+            else:
+                size += sys.getsizeof(value)
+
+        return size
@@ -0,0 +1,244 @@
+import random
+import datetime
+from typing import Any
+
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, DistributedSampler
+
+
+class Distributed:
+    """
+    CPU数据并行训练的进程组上下文, 以 gloo后端在多个进程(可跨主机)间同步梯度和统计量
+
+    使用
+    ------
+    - 每个进程以各自的全局序号建立进程组, 之后将上下文交给 Loader和 Trainer
+    >>> distributed = Distributed(world_size = 4, rank = 0, master_addr = '10.0.0.1', master_port = 29500)
+    >>> distributed.init()
+    >>> train_dataloader = Loader.build_dataloader(dataset, 100, shuffle = True, distributed = distributed)
+    >>> trainer.distributed = distributed
+    >>> ...
+    >>> distributed.destroy()
+
+    注意
+    ------
+    - world_size为 1时不建立进程组, 所有方法退化为单进程行为
+    - 除 is_main外的同步方法均为集合通信, 所有进程必须以相同的顺序调用, 否则会互相等待直至超时
+    """
+
+    def __init__(self,
+                 world_size: int = 1,
+                 rank: int = 0,
+                 master_addr: str = '127.0.0.1',
+                 master_port: int = 29500,
+                 backend: str = 'gloo',
+                 timeout: float = 1800):
+        """
+        初始化参数
+
+        :param world_size: 总进程数
+        :param rank: 本进程的全局序号, 0号进程负责保存模型及记录指标
+        :param master_addr: 0号进程所在主机地址, 所有进程在此汇合
+        :param master_port: 汇合端口
+        :param backend: 通信后端
+        :param timeout: 集合通信及汇合的超时时间(s)
+        """
+
+        self.world_size = world_size
+        self.rank = rank
+        self.master_addr = master_addr
+        self.master_port = master_port
+        self.backend = backend
+        self.timeout = timeout
+
+    @property
+    def enabled(self) -> bool:
+        """
+        是否为多进程训练
+
+        :return: 是否为多进程训练
+        """
+
+        return self.world_size > 1
+
+    @property
+    def is_main(self) -> bool:
+        """
+        是否为负责保存模型及记录指标的 0号进程
+
+        :return: 是否为 0号进程
+        """
+
+        return self.rank == 0
+
+    def init(self) -> None:
+        """
+        建立进程组, 阻塞直至所有进程汇合
+
+        :return: 无
+        """
+
+        if not self.enabled or dist.is_initialized():
+            return
+
+        dist.init_process_group(
+            backend = self.backend,
+            init_method = f'tcp://{self.master_addr}:{self.master_port}',
+            world_size = self.world_size,
+            rank = self.rank,
+            timeout = datetime.timedelta(seconds = self.timeout)
+        )
+
+    def destroy(self) -> None:
+        """
+        销毁进程组
+
+        :return: 无
+        """
+
+        if self.enabled and dist.is_initialized():
+            dist.destroy_process_group()
+
+    def wrap(self, model: nn.Module) -> nn.Module:
+        """
+        包装模型, 反向传播时自动对各进程的梯度求平均
+
+        :param model: 模型
+        :return: 多进程训练时为 DistributedDataParallel包装的模型, 否则为原模型
+
+        注意
+        ------
+        - 包装时以 0号进程的参数覆盖其余进程, 保证各进程从相同的参数开始训练
+        - 保存模型时请使用原模型, 其状态字典不带 module.前缀
+        """
+
+        if not self.enabled:
+            return model
+
+        return DistributedDataParallel(model)
+
+    def sampler(self, dataset: Any, shuffle: bool, seed: int = 0) -> DistributedSampler | None:
+        """
+        获得将数据集按进程分片的采样器
+
+        :param dataset: 支持按下标取数的数据集
+        :param shuffle: 是否打乱
+        :param seed: 打乱种子, 所有进程须一致
+        :return: 分片采样器, 单进程训练时为 None
+
+        注意
+        ------
+        - 样本数不能被进程数整除时补齐少量重复样本, 使各进程的 batch数相同
+        """
+
+        if not self.enabled:
+            return None
+
+        return DistributedSampler(dataset, num_replicas = self.world_size, rank = self.rank, shuffle = shuffle, seed = seed)
+
+    def all_reduce_sum(self, *values: float) -> list[float]:
+        """
+        对各进程的数值求和
+
+        :param values: 本进程的数值
+        :return: 所有进程对应数值之和
+        """
+
+        if not self.enabled:
+            return [float(value) for value in values]
+
+        tensor = torch.tensor([float(value) for value in values], dtype = torch.float64)
+        dist.all_reduce(tensor, op = dist.ReduceOp.SUM)
+
+        return tensor.tolist()
+
+    def any(self, flag: bool) -> bool:
+        """
+        判断是否有任一进程的标志为真
+
+        :param flag: 本进程的标志
+        :return: 任一进程的标志是否为真
+        """
+
+        if not self.enabled:
+            return flag
+
+        tensor = torch.tensor([int(flag)], dtype = torch.int32)
+        dist.all_reduce(tensor, op = dist.ReduceOp.MAX)
+
+        return bool(tensor.item())
+
+    def all(self, flag: bool) -> bool:
+        """
+        判断是否所有进程的标志均为真
+
+        :param flag: 本进程的标志
+        :return: 所有进程的标志是否均为真
+        """
+
+        return not self.any(not flag)
+
+    def shared_seed(self) -> int:
+        """
+        获得所有进程一致的随机种子
+
+        :return: 由 0号进程生成的随机种子
+        """
+
+        seed = random.getrandbits(31)
+        if not self.enabled:
+            return seed
+
+        tensor = torch.tensor([seed if self.is_main else 0], dtype = torch.int64)
+        dist.broadcast(tensor, src = 0)
+
+        return int(tensor.item())
+
+    def broadcast_object(self, obj: Any) -> Any:
+        """
+        将 0号进程的对象广播给所有进程
+
+        :param obj: 本进程的对象, 只有 0号进程的有效
+        :return: 0号进程的对象
+
+        注意
+        ------
+        - 对象须可被 pickle, 适用于检查点、水位线等只在 0号进程所在主机保存的少量数据
+        """
+
+        if not self.enabled:
+            return obj
+
+        objects = [obj if self.is_main else None]
+        dist.broadcast_object_list(objects, src = 0)
+
+        return objects[0]
+
+    def barrier(self) -> None:
+        """
+        等待所有进程到达此处
+
+        :return: 无
+        """
+
+        if self.enabled:
+            dist.barrier()
+
+    @staticmethod
+    def set_epoch(dataloader: DataLoader | None, epoch: int) -> None:
+        """
+        为 DataLoader中的分片采样器设置迭代次数, 使每次迭代的打乱顺序不同且各进程一致
+
+        :param dataloader: DataLoader
+        :param epoch: 迭代次数
+        :return: 无
+        """
+
+        sampler = getattr(dataloader, 'sampler', None)
+        # 整批取数时分片采样器被包装在批采样器中
+        sampler = getattr(sampler, 'sampler', sampler)
+        if isinstance(sampler, DistributedSampler):
+            sampler.set_epoch(epoch)
@@ -0,0 +1,152 @@
+import torch
+
+
+class LeastSquares:
+    """
+    线性回归最小二乘闭式求解器
+
+    使用
+    ------
+    - QR分解一次性求解
+    >>> least_squares = LeastSquares(weight_decay = 0.01)
+    >>> weight, bias = least_squares.fit(X, y)
+
+    - 逐块累积正规方程后求解, 适用于无法一次载入内存的数据
+    >>> least_squares = LeastSquares(weight_decay = 0.01)
+    >>> for X_chunk, y_chunk in chunks:
+    >>>     least_squares.accumulate(X_chunk, y_chunk)
+    >>> weight, bias = least_squares.solve()
+
+    - 求解后可取得训练数据上的均方误差
+    >>> least_squares.loss
+
+    注意
+    ------
+    - 求解目标与 MSELoss + 带 weight_decay的优化器一致: mean((Xw + b - y)^2) + weight_decay / 2 * (|w|^2 + b^2)
+      即岭回归系数 alpha = n * weight_decay / 2, 与优化器一样对偏置同样施加衰减
+    - 计算统一使用 float64以保证数值稳定, 结果为 float32
+    """
+
+    def __init__(self, weight_decay: float = 0.0):
+        """
+        初始化参数
+
+        :param weight_decay: 权重衰减系数, 与优化器的 weight_decay含义相同
+        """
+
+        self.weight_decay = weight_decay
+
+        # 正规方程累积量
+        self.__XtX = None
+        self.__Xty = None
+        self.__yty = 0.0
+        self.__samples = 0
+        self.__loss = None
+
+    @property
+    def loss(self) -> float | None:
+        """
+        最近一次求解在所用数据上的均方误差, 不含权重衰减项
+
+        :return: 均方误差, 尚未求解时为 None
+        """
+
+        return self.__loss
+
+    def fit(self, X: torch.Tensor, y: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        通过 QR分解求解整个数据集的最小二乘解
+
+        :param X: 特征, 形状为 (样本数, 特征数)
+        :param y: 标签, 形状为 (样本数, 1)
+        :return: 权重 (1, 特征数), 偏置 (1,)
+        """
+
+        A = self.__augment(X)
+        b = y.to(torch.float64).reshape(-1, 1)
+        samples = len(A)
+
+        # 岭回归: 在设计矩阵下方拼接 sqrt(alpha) * I, 等价于求解 (A^T A + alpha I) w = A^T b
+        alpha = self.__alpha(len(A))
+        if alpha > 0:
+            A = torch.cat((A, alpha ** 0.5 * torch.eye(A.shape[1], dtype = torch.float64)))
+            b = torch.cat((b, torch.zeros(A.shape[1], 1, dtype = torch.float64)))
+
+        solution = torch.linalg.lstsq(A, b, driver = 'gels').solution
+        self.__loss = float(((A[:samples] @ solution - b[:samples]) ** 2).mean())
+
+        return self.__split(solution)
+
+    def accumulate(self, X: torch.Tensor, y: torch.Tensor) -> None:
+        """
+        累积一块数据的 X^T X和 X^T y
+
+        :param X: 特征, 形状为 (样本数, 特征数)
+        :param y: 标签, 形状为 (样本数, 1)
+        :return: 无
+        """
+
+        A = self.__augment(X)
+        b = y.to(torch.float64).reshape(-1, 1)
+
+        if self.__XtX is None:
+            self.__XtX = torch.zeros(A.shape[1], A.shape[1], dtype = torch.float64)
+            self.__Xty = torch.zeros(A.shape[1], 1, dtype = torch.float64)
+
+        self.__XtX += A.T @ A
+        self.__Xty += A.T @ b
+        self.__yty += float(b.T @ b)
+        self.__samples += len(A)
+
+    def solve(self) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        根据累积的正规方程求解
+
+        :return: 权重 (1, 特征数), 偏置 (1,)
+        """
+
+        if self.__XtX is None:
+            raise ValueError('No data has been accumulated, please call accumulate() first')
+
+        alpha = self.__alpha(self.__samples)
+        XtX = self.__XtX + alpha * torch.eye(self.__XtX.shape[0], dtype = torch.float64)
+        solution = torch.linalg.solve(XtX, self.__Xty)
+        # 残差平方和 = y^T y - 2 w^T X^T y + w^T X^T X w, 无需再次遍历数据
+        residual = self.__yty - 2 * float(solution.T @ self.__Xty) + float(solution.T @ self.__XtX @ solution)
+        self.__loss = max(residual, 0.0) / self.__samples
+
+        return self.__split(solution)
+
+    def __alpha(self, samples: int) -> float:
+        """
+        计算岭回归系数
+
+        :param samples: 样本数
+        :return: 岭回归系数
+        """
+
+        return samples * self.weight_decay / 2
+
+    @staticmethod
+    def __augment(X: torch.Tensor) -> torch.Tensor:
+        """
+        在特征后拼接常数列以求解偏置
+
+        :param X: 特征
+        :return: 增广设计矩阵
+        """
+
+        X = X.to(torch.float64).reshape(len(X), -1)
+        return torch.cat((X, torch.ones(len(X), 1, dtype = torch.float64)), dim = 1)
+
+    @staticmethod
+    def __split(solution: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        将解向量拆分为权重和偏置
+
+        :param solution: 解向量, 形状为 (特征数 + 1, 1)
+        :return: 权重 (1, 特征数), 偏置 (1,)
+        """
+
+        solution = solution.to(torch.float32).flatten()
+        return solution[:-1].unsqueeze(0), solution[-1:]
@@ -1,36 +1,164 @@
-from torch.utils.data import DataLoader
+import os
+import math
+import multiprocessing
+from typing import Any
 
-from dataset import CustomDataset
+import torch
+from torch.utils.data import DataLoader, IterableDataset, BatchSampler, RandomSampler, SequentialSampler
+
+from dataset import CustomDataset, StreamingDataset
+from common import SplitMode
+from .Distributed import Distributed
 
 
 class Loader:
     """
     加载数据集为DataLoader
+
+    注意
+    ------
+    - 加载进程数、预取批数、常驻加载进程及锁页内存均可配置, 未配置(为 None)时按数据集类型、大小及 CPU数自动选择
+    - 测试集 DataLoader不打乱, 每次遍历的顺序固定; 测试集只在评估时遍历, 未配置时不保留加载进程
+    - 多进程数据并行训练时训练集和测试集均按进程分片, 每个进程只遍历属于自己的样本
     """
 
-    def __init__(self, dataset: CustomDataset):
+    # 自动选择时的最大加载进程数
+    MAX_AUTO_WORKERS = 4
+    # 自动选择时, 逐样本取数的数据集至少达到该样本数才启用加载进程
+    AUTO_WORKER_MIN_SAMPLES = 100000
+
+    def __init__(self, dataset: CustomDataset | StreamingDataset, split_mode: SplitMode = SplitMode.RANDOM, seed: int = None):
         """
         初始化参数
 
         :param dataset: 继承了Dataset类的数据集
+        :param split_mode: 训练测试划分方式
+        :param seed: 划分随机种子, 指定后划分结果可复现
         """
 
         self.dataset = dataset
+        self.split_mode = split_mode
+        self.seed = seed
 
-    def get_dataloader(self, train_ratio: float, batch_size: int) -> tuple[DataLoader, DataLoader]:
+    def get_dataloader(self,
+                       train_ratio: float,
+                       batch_size: int,
+                       distributed: Distributed = None,
+                       **options: Any) -> tuple[DataLoader, DataLoader]:
         """
         获得训练dataloader和测试dataloader
 
         :param train_ratio: 训练集占比
-        :param batch_size: 批大小
+        :param batch_size: 批大小, 多进程训练时为每个进程的批大小
+        :param distributed: 数据并行训练上下文, 为 None时单进程训练
+        :param options: 加载选项, 即 build_dataloader的 num_workers / prefetch_factor / persistent_workers / pin_memory
         :return: 训练集dataloader, 测试集dataloader
         """
 
         # 分割原始数据集为train和test
-        train_dataset, test_dataset = self.dataset.train_test_split(self.dataset, train_ratio)
+        train_dataset, test_dataset = self.dataset.train_test_split(self.dataset, train_ratio,
+                                                                    mode = self.split_mode, seed = self.seed)
 
-        # 封装加载为DataLoader
-        train_dataloader = DataLoader(train_dataset, batch_size = batch_size, shuffle = True, drop_last = False)
-        test_dataloader = DataLoader(test_dataset, batch_size = batch_size, shuffle = True, drop_last = False)
+        # 封装加载为DataLoader, 测试集无需打乱
+        train_dataloader = self.build_dataloader(train_dataset, batch_size, shuffle = True, distributed = distributed, **options)
+        test_options = dict(options)
+        if test_options.get('persistent_workers') is None:
+            test_options['persistent_workers'] = False
+        test_dataloader = self.build_dataloader(test_dataset, batch_size, shuffle = False, distributed = distributed, **test_options)
 
         return train_dataloader, test_dataloader
+
+    @staticmethod
+    def build_dataloader(dataset: CustomDataset | StreamingDataset,
+                         batch_size: int,
+                         shuffle: bool,
+                         num_workers: int = None,
+                         prefetch_factor: int = None,
+                         persistent_workers: bool = None,
+                         pin_memory: bool = None,
+                         distributed: Distributed = None,
+                         **kwargs: Any) -> DataLoader:
+        """
+        将数据集封装为 DataLoader
+
+        :param dataset: 数据集
+        :param batch_size: 批大小
+        :param shuffle: 是否打乱
+        :param num_workers: 加载进程数, 为 None时由 auto_workers()决定
+        :param prefetch_factor: 每个加载进程预取的批数, 为 None时使用 DataLoader的默认值, 无加载进程时忽略
+        :param persistent_workers: 迭代之间是否保留加载进程, 为 None时有加载进程即保留, 无加载进程时忽略
+        :param pin_memory: 是否将批数据放入锁页内存, 为 None时仅在 CUDA可用时启用
+        :param distributed: 数据并行训练上下文, 指定且为多进程训练时按进程分片
+        :param kwargs: 忽略的其余配置项
+        :return: DataLoader
+
+        注意
+        ------
+        - 支持整批取数的数据集由批采样器一次取出整批下标, 每批只做一次张量索引, 不再逐样本调用 __getitem__并拼接
+        - 流式数据集自行组批, 批大小和是否打乱直接设置到数据集上, 显式配置的多个加载进程按数据块轮流读取
+        - 流式数据集无法保证各训练进程的 batch数相同, 不支持多进程数据并行训练
+        """
+
+        sampler = None
+        if distributed is not None and distributed.enabled:
+            if isinstance(dataset, IterableDataset):
+                raise ValueError(f'{type(dataset).__name__} does not support distributed training')
+            sampler = distributed.sampler(dataset, shuffle)
+
+        if num_workers is None:
+            num_workers = Loader.auto_workers(dataset, batch_size)
+
+        options = {
+            'num_workers': num_workers,
+            'pin_memory': torch.cuda.is_available() if pin_memory is None else pin_memory
+        }
+        if num_workers > 0:
+            options['persistent_workers'] = True if persistent_workers is None else persistent_workers
+            if prefetch_factor is not None:
+                options['prefetch_factor'] = prefetch_factor
+
+        if isinstance(dataset, IterableDataset):
+            dataset.batch_size = batch_size
+            dataset.shuffle = shuffle
+            return DataLoader(dataset, batch_size = None, **options)
+
+        if getattr(dataset, 'batch_indexable', False):
+            if sampler is None:
+                sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+            batch_sampler = BatchSampler(sampler, batch_size = batch_size, drop_last = False)
+            # batch_size = None关闭自动拼接, 采样器给出的整批下标直接交给数据集
+            return DataLoader(dataset, batch_size = None, sampler = batch_sampler, **options)
+
+        if sampler is not None:
+            return DataLoader(dataset, batch_size = batch_size, sampler = sampler, drop_last = False, **options)
+
+        return DataLoader(dataset, batch_size = batch_size, shuffle = shuffle, drop_last = False, **options)
+
+    @staticmethod
+    def auto_workers(dataset: CustomDataset | StreamingDataset, batch_size: int) -> int:
+        """
+        按数据集类型、大小及可用 CPU数选择加载进程数
+
+        :param dataset: 数据集
+        :param batch_size: 批大小
+        :return: 加载进程数
+
+        注意
+        ------
+        - 守护进程(如 multiprocessing.Pool的工作进程)不能再创建子进程, 此时总是在训练进程内加载
+        - 流式数据集的每个加载进程都须读取全部数据块以计算行号, 多个加载进程不能分摊读取和解析, 总是在训练进程内加载
+        - 整批取数的内存数据集每批只需一次张量索引, 进程间传递整批数据的开销反而更大, 总是在训练进程内加载
+        - 逐样本取数的数据集样本数达到 AUTO_WORKER_MIN_SAMPLES后才启用加载进程, 且不超过批数
+        - 加载进程数不超过 MAX_AUTO_WORKERS, 并为训练进程保留一个 CPU
+        """
+
+        if multiprocessing.current_process().daemon or isinstance(dataset, IterableDataset):
+            return 0
+
+        if getattr(dataset, 'batch_indexable', False) or len(dataset) < Loader.AUTO_WORKER_MIN_SAMPLES:
+            return 0
+
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+        workers = min(cpus - 1, Loader.MAX_AUTO_WORKERS)
+
+        return max(min(workers, math.ceil(len(dataset) / batch_size)), 0)
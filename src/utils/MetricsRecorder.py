@@ -0,0 +1,210 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Callable
+
+from matplotlib.figure import Figure
+
+
+class MetricsRecorder:
+    """
+    训练指标记录器, 将每次迭代的指标以 JSONL格式追加写入文件, 图像仅在需要时由记录文件渲染
+
+    使用
+    ------
+    - 训练时逐次迭代记录
+    >>> recorder = MetricsRecorder('LinearRegression_metrics.jsonl', 'LinearRegression')
+    >>> recorder.record_epoch(1, train_loss = 0.5, valid_loss = 0.6, epoch_time = 1.2, batch_times = [0.01, 0.02])
+
+    - 之后按需渲染损失曲线
+    >>> MetricsRecorder.render('LinearRegression_metrics.jsonl', 'LinearRegression_loss.svg')
+
+    注意
+    ------
+    - 每条记录写入后立即 flush, 训练中途崩溃时已记录的迭代不会丢失
+    - 每次训练拥有独立的 run标识, 同一文件中可保存多次训练的记录, 渲染时默认只取最近一次
+    - 渲染使用 matplotlib.figure.Figure, 不经过 pyplot, 不依赖图形界面
+    """
+
+    def __init__(self, path: str, model_name: str):
+        """
+        初始化参数
+
+        :param path: 记录文件地址
+        :param model_name: 模型名称
+        """
+
+        self.path = path
+        self.model_name = model_name
+        self.run = uuid.uuid4().hex
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+
+    def record_epoch(self,
+                     epoch: int,
+                     train_loss: float,
+                     valid_loss: float | None,
+                     epoch_time: float,
+                     batch_times: list[float],
+                     data_time: float = None,
+                     samples: int = None,
+                     phases: dict[str, Any] = None) -> None:
+        """
+        记录一次迭代的指标
+
+        :param epoch: 迭代次数
+        :param train_loss: 训练损失
+        :param valid_loss: 验证损失, 未验证时为 None
+        :param epoch_time: 迭代总耗时(s), 包括验证
+        :param batch_times: 每个 batch的计算耗时(s)
+        :param data_time: 等待数据加载的总耗时(s)
+        :param samples: 训练样本数
+        :param phases: 各阶段的性能剖析统计, 未剖析时为 None
+        :return: 无
+        """
+
+        ordered = sorted(batch_times)
+        self.write({
+            'run': self.run,
+            'model': self.model_name,
+            'timestamp': time.time(),
+            'epoch': epoch,
+            'train_loss': train_loss,
+            'valid_loss': valid_loss,
+            'epoch_time': epoch_time,
+            'data_time': data_time,
+            'samples': samples,
+            'batches': len(ordered),
+            'batch_time_mean': sum(ordered) / len(ordered) if ordered else None,
+            'batch_time_p50': ordered[len(ordered) // 2] if ordered else None,
+            'batch_time_p95': ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] if ordered else None,
+            'batch_time_max': ordered[-1] if ordered else None,
+            'phases': phases
+        })
+
+    def write(self, record: dict[str, Any]) -> None:
+        """
+        追加写入一条记录
+
+        :param record: 记录内容
+        :return: 无
+        """
+
+        with open(self.path, 'a', encoding = 'UTF-8') as file:
+            file.write(json.dumps(record, default = float) + '\n')
+
+    @staticmethod
+    def load(path: str, run: str = None) -> list[dict[str, Any]]:
+        """
+        读取记录
+
+        :param path: 记录文件地址
+        :param run: 训练的 run标识, 为 None时取最近一次训练
+        :return: 按写入顺序排列的记录
+        """
+
+        if not os.path.exists(path):
+            return []
+
+        records = []
+        with open(path, 'r', encoding = 'UTF-8') as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # 写入中途崩溃留下的不完整行
+                    continue
+
+        if not records:
+            return []
+
+        run = records[-1]['run'] if run is None else run
+        return [record for record in records if record['run'] == run]
+
+    @staticmethod
+    def render(path: str, output_path: str, run: str = None) -> str:
+        """
+        将记录渲染为损失曲线图
+
+        :param path: 记录文件地址
+        :param output_path: 图像地址, 格式由扩展名决定, 如 .svg / .png
+        :param run: 训练的 run标识, 为 None时取最近一次训练
+        :return: 图像地址
+
+        注意
+        ------
+        - 图像旁的 .json文件记录渲染时的 run标识、记录文件大小及修改时间和图像格式, 均一致时直接返回已有图像
+        - 图像及其记录先写入临时文件再原子替换, 并发请求不会读到写了一半的图像
+        """
+
+        image_format = os.path.splitext(output_path)[1].lstrip('.').lower()
+        # 先取记录文件状态再读取记录, 读取期间追加的记录只会使下次渲染时判断为已变化
+        stat = os.stat(path) if os.path.exists(path) else None
+        records = MetricsRecorder.load(path, run)
+        if not records:
+            raise ValueError(f"No metrics recorded in '{path}'")
+
+        key = {'run': records[-1]['run'], 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'format': image_format}
+        key_path = f'{output_path}.json'
+        if os.path.exists(output_path):
+            try:
+                with open(key_path, 'r', encoding = 'UTF-8') as file:
+                    if json.load(file) == key:
+                        return output_path
+            except (OSError, ValueError):
+                pass
+
+        epochs = [record['epoch'] for record in records]
+        figure = Figure(figsize = (8, 8))
+        axes = figure.subplots()
+        # 闭式求解只有一次记录, 以标记显示单个点
+        marker = 'o' if len(records) == 1 else None
+        axes.plot(epochs, [record['train_loss'] for record in records], label = 'Train loss', marker = marker)
+        if any(record['valid_loss'] is not None for record in records):
+            axes.plot(epochs, [record['valid_loss'] for record in records], label = 'Valid loss', marker = marker)
+
+        axes.set_title(f"Loss during the training process of {records[-1]['model']}")
+        axes.set_xlabel('Epoch')
+        axes.set_ylabel('Loss')
+        axes.spines['right'].set_visible(False)
+        axes.spines['top'].set_visible(False)
+        axes.legend()
+
+        # 临时文件的扩展名无法表明格式, 须显式指定
+        MetricsRecorder.__replace(output_path, lambda temp_path: figure.savefig(temp_path, format = image_format, bbox_inches = 'tight'))
+        MetricsRecorder.__replace(key_path, lambda temp_path: MetricsRecorder.__dump(key, temp_path))
+
+        return output_path
+
+    @staticmethod
+    def __replace(path: str, write: Callable[[str], None]) -> None:
+        """
+        写入临时文件后原子替换目标文件
+
+        :param path: 目标文件地址
+        :param write: 写入函数, 接收临时文件地址
+        :return: 无
+        """
+
+        temp_path = os.path.join(os.path.dirname(os.path.abspath(path)), f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def __dump(obj: Any, path: str) -> None:
+        """
+        以 JSON格式写入文件
+
+        :param obj: 待写入对象
+        :param path: 文件地址
+        :return: 无
+        """
+
+        with open(path, 'w', encoding = 'UTF-8') as file:
+            json.dump(obj, file)
@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from .Configurer import Configurer
+
+
+class MicroBatcher(Configurer):
+    """
+    动态微批处理器, 将并发到达的单样本请求合并为一个批次统一计算
+
+    使用
+    ------
+    - 以批处理函数创建实例, 提交单个样本后等待其结果
+    >>> def handler(items: list[list[float]]) -> list[float]:
+    >>>     return [sum(item) for item in items]
+    >>>
+    >>> batcher = MicroBatcher(handler)
+    >>> future = batcher.submit([1.0, 2.0])
+    >>> result = future.result()
+
+    注意
+    ------
+    - 批处理函数接收样本列表, 返回与之等长、顺序一致的可下标结果
+    - 批次在达到 max_batch_size或首个样本等待超过 max_wait(s)时立即执行
+    - 批处理函数抛出异常时, 该批次内的所有请求都会收到该异常
+    """
+
+    def __init__(self, handler: Callable[[list[Any]], Any]):
+        """
+        初始化参数
+
+        :param handler: 批处理函数
+        """
+
+        self.processor_name = self.__class__.__name__
+
+        # 单批次最大样本数
+        self.max_batch_size = 64
+        # 首个样本最长等待时间(s)
+        self.max_wait = 0.005
+
+        self.__handler = handler
+        self.__queue: queue.SimpleQueue[tuple[Any, Future]] = queue.SimpleQueue()
+        self.__worker = None
+        self.__worker_lock = threading.Lock()
+
+        # 实际达到的批大小统计
+        self.__batch_sizes = Counter()
+        self.__stats_lock = threading.Lock()
+
+    def configure(self, settings: dict[str, Any]) -> None:
+        """
+        配置微批处理参数
+
+        :param settings: 设置内容
+        :return: 无
+        """
+
+        self.load_configuration(settings.get('service', {}).get(self.processor_name, {}))
+
+    def submit(self, item: Any) -> Future:
+        """
+        提交单个样本
+
+        :param item: 单个样本
+        :return: 该样本结果的 Future
+        """
+
+        if self.__worker is None:
+            self.__start()
+
+        future = Future()
+        self.__queue.put((item, future))
+
+        return future
+
+    def statistics(self) -> dict[str, Any]:
+        """
+        获得批大小统计
+
+        :return: 批次数、请求数、平均批大小及各批大小出现次数
+        """
+
+        with self.__stats_lock:
+            batch_sizes = dict(sorted(self.__batch_sizes.items()))
+
+        batches = sum(batch_sizes.values())
+        requests = sum(size * count for size, count in batch_sizes.items())
+
+        return {
+            'batches': batches,
+            'requests': requests,
+            'mean_batch_size': requests / batches if batches else 0.0,
+            'batch_sizes': batch_sizes
+        }
+
+    def __start(self) -> None:
+        """
+        启动批处理线程
+
+        :return: 无
+        """
+
+        with self.__worker_lock:
+            if self.__worker is None:
+                self.__worker = threading.Thread(target = self.__run, daemon = True)
+                self.__worker.start()
+
+    def __run(self) -> None:
+        """
+        循环收集并执行批次
+
+        :return: 无
+        """
+
+        while True:
+            # 阻塞等待批次的首个样本
+            batch = [self.__queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            # 在等待窗口内继续收集样本直至批次填满
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.__queue.get(timeout = remaining))
+                except queue.Empty:
+                    break
+
+            self.__execute(batch)
+
+    def __execute(self, batch: list[tuple[Any, Future]]) -> None:
+        """
+        执行单个批次并分发结果
+
+        :param batch: 样本及其 Future组成的批次
+        :return: 无
+        """
+
+        with self.__stats_lock:
+            self.__batch_sizes[len(batch)] += 1
+
+        items = [item for item, _ in batch]
+        try:
+            results = self.__handler(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for idx, (_, future) in enumerate(batch):
+                future.set_result(results[idx])
@@ -0,0 +1,91 @@
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen = True)
+class ModelVersion:
+    """
+    模型版本, 发布后不可修改
+    """
+
+    # 版本号, 从 1开始递增, 0表示尚未发布模型
+    version: int
+    # 模型
+    model: Any
+
+
+class ModelSlot:
+    """
+    带版本的模型槽, 支持训练与服务之间无锁热替换模型
+
+    使用
+    ------
+    - 在别处构建好完整模型后整体发布
+    >>> slot = ModelSlot()
+    >>> slot.publish(model)
+
+    - 读取当前模型
+    >>> current = slot.current()
+    >>> y = current.model(X)
+
+    注意
+    ------
+    - 发布为一次引用赋值, 读取方不加锁; 已取得旧版本的推理请求会继续使用旧模型直至完成
+    - 请勿在发布后修改模型, 新模型应完全构建完毕后再发布
+    """
+
+    def __init__(self):
+        """
+        初始化参数
+        """
+
+        self.__current = ModelVersion(0, None)
+        self.__publish_lock = threading.Lock()
+
+    def current(self) -> ModelVersion:
+        """
+        获得当前模型版本
+
+        :return: 当前模型版本
+        """
+
+        return self.__current
+
+    @property
+    def model(self) -> Any:
+        """
+        获得当前模型
+
+        :return: 当前模型, 尚未发布时为 None
+        """
+
+        return self.__current.model
+
+    @property
+    def version(self) -> int:
+        """
+        获得当前版本号
+
+        :return: 当前版本号
+        """
+
+        return self.__current.version
+
+    def publish(self, model: Any) -> ModelVersion:
+        """
+        发布新模型, 原子地替换当前版本
+
+        :param model: 构建完毕的新模型
+        :return: 新的模型版本
+
+        注意
+        ------
+        - 仅发布方之间互斥, 读取方不受影响
+        """
+
+        with self.__publish_lock:
+            new_version = ModelVersion(self.__current.version + 1, model)
+            self.__current = new_version
+
+        return new_version
@@ -0,0 +1,213 @@
+import contextlib
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Iterator
+
+import torch
+
+
+class PhaseProfiler:
+    """
+    训练分阶段性能剖析器, 统计各阶段的耗时和新分配的 Python对象块数
+
+    使用
+    ------
+    - 以 with语句包裹各阶段
+    >>> profiler = PhaseProfiler(enabled = True)
+    >>> with profiler.phase('forward'):
+    >>>     output = model(X)
+    >>> profiler.step()
+    >>> print(profiler.end_epoch())
+
+    - 额外以 torch.profiler记录若干步, 结束后导出 Chrome trace, 可在 chrome://tracing或 Perfetto中查看
+    >>> profiler = PhaseProfiler(enabled = True, torch_profiler = True, trace_path = 'trace.json')
+    >>> profiler.start()
+    >>> ...
+    >>> profiler.stop()
+
+    注意
+    ------
+    - 未启用时 phase()返回空上下文, 几乎没有额外开销
+    - 对象块数取自 sys.getallocatedblocks的差值, 仅反映 Python对象的净分配, 不包括张量存储
+    - torch.profiler按 wait / warmup / active步的调度只记录一个窗口, 步数以 step()的调用次数计
+    """
+
+    def __init__(self,
+                 enabled: bool = False,
+                 torch_profiler: bool = False,
+                 wait: int = 1,
+                 warmup: int = 1,
+                 active: int = 5,
+                 trace_path: str = None,
+                 **kwargs: Any):
+        """
+        初始化参数
+
+        :param enabled: 是否启用
+        :param torch_profiler: 是否同时使用 torch.profiler
+        :param wait: torch.profiler开始记录前跳过的步数
+        :param warmup: torch.profiler预热步数
+        :param active: torch.profiler记录的步数
+        :param trace_path: Chrome trace文件地址, 为 None时不导出
+        :param kwargs: 忽略的其余配置项
+        """
+
+        self.enabled = enabled
+        self.torch_profiler = enabled and torch_profiler
+        self.wait = wait
+        self.warmup = warmup
+        self.active = active
+        self.trace_path = trace_path
+
+        # 阶段名称到 [调用次数, 耗时(s), 对象块数]的映射
+        self.__epoch_stats = defaultdict(lambda: [0, 0.0, 0])
+        self.__total_stats = defaultdict(lambda: [0, 0.0, 0])
+        self.__torch_profile = None
+
+    def start(self) -> None:
+        """
+        开始剖析, 启用 torch.profiler时开始其调度
+
+        :return: 无
+        """
+
+        if not self.torch_profiler or self.__torch_profile is not None:
+            return
+
+        self.__torch_profile = torch.profiler.profile(
+            activities = [torch.profiler.ProfilerActivity.CPU],
+            schedule = torch.profiler.schedule(wait = self.wait, warmup = self.warmup, active = self.active, repeat = 1),
+            on_trace_ready = self.__export_trace,
+            record_shapes = True,
+            profile_memory = True
+        )
+        self.__torch_profile.start()
+
+    def stop(self) -> None:
+        """
+        结束剖析, 启用 torch.profiler时结束记录并导出 trace
+
+        :return: 无
+        """
+
+        if self.__torch_profile is not None:
+            self.__torch_profile.stop()
+            self.__torch_profile = None
+
+    def step(self) -> None:
+        """
+        标记一个训练步结束
+
+        :return: 无
+        """
+
+        if self.__torch_profile is not None:
+            self.__torch_profile.step()
+
+    def phase(self, name: str) -> contextlib.AbstractContextManager:
+        """
+        获得统计指定阶段的上下文
+
+        :param name: 阶段名称
+        :return: 上下文管理器
+        """
+
+        if not self.enabled:
+            return contextlib.nullcontext()
+
+        return self.__measure(name)
+
+    def add(self, name: str, elapsed: float, blocks: int = 0) -> None:
+        """
+        直接计入一次阶段统计, 适用于无法以 with语句包裹的阶段, 如等待 DataLoader产出下一批数据
+
+        :param name: 阶段名称
+        :param elapsed: 耗时(s)
+        :param blocks: 新分配的对象块数
+        :return: 无
+        """
+
+        if not self.enabled:
+            return
+
+        stats = self.__epoch_stats[name]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += blocks
+
+    def end_epoch(self) -> dict[str, dict[str, Any]]:
+        """
+        结束一次迭代的统计, 并将其计入总体统计
+
+        :return: 本次迭代各阶段的统计
+        """
+
+        epoch_stats = self.__summarize(self.__epoch_stats)
+        for name, (calls, elapsed, blocks) in self.__epoch_stats.items():
+            total = self.__total_stats[name]
+            total[0] += calls
+            total[1] += elapsed
+            total[2] += blocks
+        self.__epoch_stats.clear()
+
+        return epoch_stats
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """
+        获得全部已结束迭代的统计
+
+        :return: 各阶段的调用次数、总耗时、平均耗时、耗时占比及对象块数
+        """
+
+        return self.__summarize(self.__total_stats)
+
+    @contextlib.contextmanager
+    def __measure(self, name: str) -> Iterator[None]:
+        """
+        统计一次阶段执行
+
+        :param name: 阶段名称
+        :return: 上下文
+        """
+
+        record = torch.profiler.record_function(name) if self.__torch_profile is not None else contextlib.nullcontext()
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            with record:
+                yield
+        finally:
+            self.add(name, time.perf_counter() - start, sys.getallocatedblocks() - blocks)
+
+    @staticmethod
+    def __summarize(stats: dict[str, list]) -> dict[str, dict[str, Any]]:
+        """
+        汇总阶段统计
+
+        :param stats: 阶段名称到 [调用次数, 耗时(s), 对象块数]的映射
+        :return: 各阶段的统计
+        """
+
+        total_time = sum(elapsed for _, elapsed, _ in stats.values())
+        return {
+            name: {
+                'calls': calls,
+                'time': elapsed,
+                'mean_time': elapsed / calls if calls else 0.0,
+                'share': elapsed / total_time if total_time else 0.0,
+                'allocated_blocks': blocks
+            }
+            for name, (calls, elapsed, blocks) in stats.items()
+        }
+
+    def __export_trace(self, profile: Any) -> None:
+        """
+        torch.profiler记录窗口结束时导出 Chrome trace
+
+        :param profile: torch.profiler实例
+        :return: 无
+        """
+
+        if self.trace_path:
+            profile.export_chrome_trace(self.trace_path)
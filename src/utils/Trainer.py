@@ -2,14 +2,27 @@ import torch
 import torch.nn as nn
 from torch.optim import Optimizer
 from torch.utils.data import DataLoader
-from matplotlib import pyplot as plt
+from typing import Callable
 import os.path
+import json
+import sys
+import time
+import itertools
+import warnings
 from tqdm import tqdm
-from typing import Any
 
 from .Stopper import Stopper
+from .CheckpointWriter import CheckpointWriter
+from .MetricsRecorder import MetricsRecorder
+from .Profiler import PhaseProfiler
+from .Distributed import Distributed
+from .task import CancellationToken, TaskCancelledError, ProgressReporter
 from common import ModelSaveMode, Checkpoint
 
+# 检查点以 Checkpoint枚举为键, 登记为安全类型后 torch.load可以默认的 weights_only方式加载 STATE及 RESUME检查点
+if hasattr(torch.serialization, 'add_safe_globals'):
+    torch.serialization.add_safe_globals([Checkpoint])
+
 
 class Trainer:
     """
@@ -29,15 +42,45 @@ class Trainer:
         self.optimizer = optimizer
         self.loss = loss
 
+        # 两次进度报告之间的最短间隔(s), 跨进程报告有通信开销, 不宜逐 batch报告
+        self.report_interval = 1.0
+        # 后台检查点写入器, 保存模型不阻塞训练
+        self.checkpoint_writer = CheckpointWriter()
+        # 训练数据源的水位线, 随 STATE检查点保存, 供下次增量训练只读取新增数据
+        self.watermark = None
+        # 训练输入指纹及是否增量学习, 随可续训检查点保存, 供续训前确认检查点属于同一训练
+        self.fingerprint = None
+        self.incremental = False
+        # 数据并行训练上下文, 为 None时单进程训练
+        self.distributed: Distributed | None = None
+
+        # 损失计算方式, 以 (是否监督学习, 模型是否多输出)为键
+        self.__loss_mapping = {
+            (True, True): lambda model_output, label: self.loss(*model_output, label),
+            (True, False): lambda model_output, label: self.loss(model_output, label),
+            (False, True): lambda model_output, label: self.loss(*model_output),
+            (False, False): lambda model_output, label: self.loss(model_output),
+        }
+        # 快速模式下验证用的固定子样本
+        self.__eval_subsample = None
+
     def train(self,
               supervise: bool,
               train_data: DataLoader,
               epoch: int,
               trials: int = None,
               test_data: DataLoader = None,
-              plot: bool = None,
               model_dir: str = None,
-              check_rate: float = None) -> None:
+              check_rate: float = None,
+              cancel_token: CancellationToken = None,
+              checkpoint_on_cancel: bool = False,
+              start_epoch: int = 1,
+              progress_reporter: ProgressReporter = None,
+              profiler: PhaseProfiler = None,
+              fast: bool = False,
+              compile_model: bool = False,
+              eval_interval: int = 1,
+              eval_batches: int = None) -> None:
         """
         训练模型
 
@@ -46,57 +89,232 @@ class Trainer:
         :param epoch: 迭代次数
         :param trials: 允许的最大迭代次数
         :param test_data: 测试数据集
-        :param plot: 是否绘制损失图像
         :param model_dir: 模型保存路径
         :param check_rate: 检查点频率
+        :param cancel_token: 取消令牌
+        :param checkpoint_on_cancel: 被取消时是否保存可续训检查点
+        :param start_epoch: 起始迭代次数, 续训时从检查点记录的下一次迭代开始
+        :param progress_reporter: 进度报告器
+        :param profiler: 分阶段性能剖析器, 为 None时不剖析
+        :param fast: 是否使用快速模式, 损失以张量累积, 每次迭代只读取一次
+        :param compile_model: 是否以 torch.compile编译前向及损失计算
+        :param eval_interval: 每隔多少次迭代验证一次, 最后一次迭代总会验证
+        :param eval_batches: 每次验证使用的 batch数, 为 None时使用全部测试数据
         :return: 无
 
         注意
         ------
-        - 若要使用早停辅助, 请指定 trials和 test_data
-        - 若要保存模型, 请指定 model_dir
+        - 若要使用早停辅助, 请指定 trials和 test_data; 早停的 trials按验证次数计, eval_interval > 1时相应放宽
+        - 若要保存模型, 请指定 model_dir, 每次迭代的指标同时追加记录至 model_dir下的 {模型名}_metrics.jsonl
+        - 每个 batch开始前检查取消令牌, 被取消时抛出 TaskCancelledError, 不会覆盖已保存的模型
+        - 指定 progress_reporter时, 每隔 report_interval(s)及每次迭代结束时报告进度, 字段见 report_progress
+        - 检查点在后台写入, 返回前会等待全部写入完成
+        - 启用 profiler时分 data / forward / backward / optimizer / evaluate / checkpoint阶段统计,
+          每次迭代的统计记入指标记录的 phases字段, 总体统计保存至 model_dir下的 {模型名}_profile.json
+        - 快速模式下每个 batch不再与设备同步读取损失, 进度报告时才读取; eval_batches固定取首次验证时的前若干 batch
+        - 设置 distributed后以数据并行方式训练: train_data和 test_data须已按进程分片, 梯度在反向传播时求平均,
+          训练和验证损失在各进程间汇总, 早停判断在各进程一致; 只有 0号进程保存模型、记录指标和显示进度条
         """
 
+        distributed = self.distributed or Distributed()
         model_name = self.model.__class__.__name__
-        train_loss_history = []
-        test_loss_history = []
+        recorder = MetricsRecorder(self.metrics_path(model_dir, model_name), model_name) if model_dir and distributed.is_main else None
+        profiler = profiler or PhaseProfiler()
         stopper = Stopper(trials) if trials else None
         checking_epoch = None if check_rate is None else int(check_rate * epoch)
 
-        # 迭代训练
-        for e in tqdm(range(1, epoch + 1), desc = f'Training {model_name}'):
-            self.model.train()
-
-            # 一次完整数据集训练
-            total_loss = 0
-            for data in train_data:
-                train_X, train_y = data[:-1], data[-1]
-
-                self.optimizer.zero_grad()
-                model_output = self.model(*train_X)
-                iteration_loss = self.calculate_loss(supervise, model_output, train_y)
-                iteration_loss.backward()
-                self.optimizer.step()
-
-                total_loss += iteration_loss.item()
-
-            # 统计本次迭代平均损失
-            average_loss = total_loss / len(train_data.dataset)  # type: ignore
-            train_loss_history.append(average_loss)
-
-            # 早停
-            if trials:
-                test_loss = self.evaluate(supervise, test_data)
-                test_loss_history.append(test_loss)
-                if stopper.can_stop(test_loss):
+        # 进度统计, 流式数据集无法预知 batch数, 以其第一次迭代的实际 batch数代替
+        try:
+            batches = len(train_data)
+        except TypeError:
+            batches = None
+        train_start = time.monotonic()
+        last_report = train_start
+        test_loss = None
+        forward_loss = self.build_forward_loss(supervise, compile_model, distributed.wrap(self.model))
+        self.__eval_subsample = None
+
+        profiler.start()
+        try:
+            # 迭代训练
+            for e in tqdm(range(start_epoch, epoch + 1), desc = f'Training {model_name}', disable = not distributed.is_main):
+                self.model.train()
+                distributed.set_epoch(train_data, e)
+
+                # 一次完整数据集训练
+                total_loss = 0
+                total_samples = 0
+                epoch_start = time.monotonic()
+                batch = 0
+                batch_times = []
+                data_time = 0.0
+                batch_end = time.perf_counter()
+                batch_end_blocks = sys.getallocatedblocks() if profiler.enabled else 0
+                for batch, data in enumerate(train_data, 1):
+                    batch_start = time.perf_counter()
+                    data_time += batch_start - batch_end
+                    if profiler.enabled:
+                        profiler.add('data', batch_start - batch_end, sys.getallocatedblocks() - batch_end_blocks)
+                    self.check_cancelled(cancel_token, checkpoint_on_cancel, model_dir, model_name, e - 1)
+
+                    train_X, train_y = data[:-1], data[-1]
+
+                    self.optimizer.zero_grad()
+                    with profiler.phase('forward'):
+                        iteration_loss = forward_loss(train_X, train_y)
+                    with profiler.phase('backward'):
+                        iteration_loss.backward()
+                    with profiler.phase('optimizer'):
+                        self.optimizer.step()
+
+                    # 快速模式下累积为设备上的张量, 不触发同步
+                    total_loss += iteration_loss.detach() if fast else iteration_loss.item()
+                    total_samples += len(train_y)
+                    profiler.step()
+                    batch_end = time.perf_counter()
+                    batch_end_blocks = sys.getallocatedblocks() if profiler.enabled else 0
+                    batch_times.append(batch_end - batch_start)
+
+                    if progress_reporter is not None and time.monotonic() - last_report >= self.report_interval:
+                        last_report = time.monotonic()
+                        self.report_progress(progress_reporter, e, epoch, start_epoch, batch, batches, total_samples,
+                                             float(total_loss), test_loss, epoch_start, train_start)
+
+                # 统计本次迭代平均损失, 样本数边训练边统计, 以兼容无法预知长度的流式数据集; 多进程训练时汇总所有进程
+                total_loss, total_samples = distributed.all_reduce_sum(float(total_loss), total_samples)
+                total_samples = int(total_samples)
+                average_loss = total_loss / max(total_samples, 1)
+
+                # 早停
+                stop = False
+                evaluated = trials and ((e - start_epoch + 1) % max(eval_interval, 1) == 0 or e == epoch)
+                if evaluated:
+                    with profiler.phase('evaluate'):
+                        test_loss = float(self.evaluate(supervise, test_data, eval_batches))
+                    stop = stopper.can_stop(test_loss)
+
+                # 检查点
+                if model_dir and checking_epoch and e % checking_epoch == 0 and not stop:
+                    with profiler.phase('checkpoint'):
+                        self.save(model_dir, model_name)
+
+                if recorder is not None:
+                    recorder.record_epoch(e, average_loss, test_loss if evaluated else None, time.monotonic() - epoch_start,
+                                          batch_times, data_time, total_samples,
+                                          profiler.end_epoch() if profiler.enabled else None)
+
+                batches = batches or batch
+                if progress_reporter is not None:
+                    last_report = time.monotonic()
+                    self.report_progress(progress_reporter, e, epoch, start_epoch, batch, batches, total_samples,
+                                         total_loss, test_loss, epoch_start, train_start)
+
+                if stop:
                     break
 
-            # 检查点
-            if checking_epoch and e % checking_epoch == 0:
-                self.save_and_show(plot, train_loss_history, test_loss_history, model_dir, model_name)
+        finally:
+            profiler.stop()
 
         # 总体保存
-        self.save_and_show(plot, train_loss_history, test_loss_history, model_dir, model_name)
+        if model_dir:
+            self.save(model_dir, model_name)
+            if profiler.enabled and distributed.is_main:
+                with open(os.path.join(model_dir, f'{model_name}_profile.json'), 'w', encoding = 'UTF-8') as file:
+                    json.dump(profiler.summary(), file, indent = 2)
+        self.flush()
+
+    @staticmethod
+    def report_progress(progress_reporter: ProgressReporter,
+                        current_epoch: int,
+                        epoch: int,
+                        start_epoch: int,
+                        batch: int,
+                        batches: int | None,
+                        samples: int,
+                        total_loss: float,
+                        valid_loss: float | None,
+                        epoch_start: float,
+                        train_start: float) -> None:
+        """
+        报告训练进度
+
+        :param progress_reporter: 进度报告器
+        :param current_epoch: 当前迭代次数
+        :param epoch: 总迭代次数
+        :param start_epoch: 起始迭代次数
+        :param batch: 当前迭代已完成的 batch数
+        :param batches: 每次迭代的 batch数, 未知时为 None
+        :param samples: 当前迭代已训练的样本数
+        :param total_loss: 当前迭代的累计损失
+        :param valid_loss: 最近一次验证损失, 未验证时为 None
+        :param epoch_start: 当前迭代开始时间
+        :param train_start: 训练开始时间
+        :return: 无
+
+        注意
+        ------
+        - ETA按已完成比例线性外推, 流式数据集在第一次迭代结束前无法估计, 此时为 None
+        - 早停可能使训练提前结束, ETA为上限
+        """
+
+        now = time.monotonic()
+        epoch_elapsed = now - epoch_start
+
+        # 已完成的迭代数, batch数未知时不计入当前迭代
+        finished_epochs = current_epoch - start_epoch + (min(batch / batches, 1.0) if batches else 0.0)
+        remaining_epochs = epoch - start_epoch + 1 - finished_epochs
+        eta = (now - train_start) * remaining_epochs / finished_epochs if finished_epochs > 0 else None
+
+        progress_reporter.report(
+            epoch = current_epoch,
+            epochs = epoch,
+            batch = batch,
+            batches = batches,
+            samples = samples,
+            samples_per_second = samples / epoch_elapsed if epoch_elapsed > 0 else None,
+            train_loss = total_loss / max(samples, 1),
+            valid_loss = valid_loss,
+            eta_seconds = eta
+        )
+
+    def build_forward_loss(self,
+                           supervise: bool,
+                           compile_model: bool = False,
+                           network: nn.Module = None) -> Callable[[tuple, torch.Tensor], torch.Tensor]:
+        """
+        构建前向及损失计算函数, 损失计算方式只在第一次调用时确定一次
+
+        :param supervise: 是否为监督学习
+        :param compile_model: 是否以 torch.compile编译
+        :param network: 执行前向计算的模块, 如 DistributedDataParallel包装的模型, 为 None时使用训练模型
+        :return: 接收 (特征元组, 标签)并返回 batch内损失的函数
+        """
+
+        network = network or self.model
+        loss_function = None
+
+        def forward_loss(train_X: tuple, train_y: torch.Tensor) -> torch.Tensor:
+            """
+            前向计算并求损失
+
+            :param train_X: 特征元组
+            :param train_y: 标签
+            :return: batch内损失
+            """
+
+            nonlocal loss_function
+            model_output = network(*train_X)
+            if loss_function is None:
+                loss_function = self.__loss_mapping[(supervise, isinstance(model_output, tuple))]
+
+            return loss_function(model_output, train_y)
+
+        if compile_model:
+            if hasattr(torch, 'compile'):
+                return torch.compile(forward_loss)
+            warnings.warn('torch.compile is not available in this version of torch, falling back to eager mode')
+
+        return forward_loss
 
     def calculate_loss(self,
                        supervise: bool,
@@ -113,85 +331,117 @@ class Trainer:
 
         multi_output = isinstance(model_output, tuple)
 
-        loss_mapping = {
-            (True, True): lambda: self.loss(*model_output, label),
-            (True, False): lambda: self.loss(model_output, label),
-            (False, True): lambda: self.loss(*model_output),
-            (False, False): lambda: self.loss(model_output),
-        }
-
-        return loss_mapping[(supervise, multi_output)]()
+        return self.__loss_mapping[(supervise, multi_output)](model_output, label)
 
-    def evaluate(self, supervise: bool, test_data: DataLoader) -> float:
+    def evaluate(self, supervise: bool, test_data: DataLoader, eval_batches: int = None) -> float:
         """
         评估训练结果
 
         :param supervise: 是否使用标签监督学习
         :param test_data: 测试数据集
+        :param eval_batches: 使用的 batch数, 为 None时使用全部测试数据
         :return: 平均单例损失
+
+        注意
+        ------
+        - 指定 eval_batches时首次评估取出的 batch会被缓存, 之后每次评估都使用同一子样本, 使验证损失可比
+        - 多进程训练时 test_data为本进程的分片, 返回所有进程汇总后的平均损失
         """
 
         self.model.eval()
 
+        if eval_batches is not None:
+            if self.__eval_subsample is None:
+                self.__eval_subsample = list(itertools.islice(test_data, eval_batches))
+            test_data = self.__eval_subsample
+
         with torch.no_grad():
             total_loss = 0
+            total_samples = 0
             for data in test_data:
                 test_X, test_y = data[:-1], data[-1]
                 model_output = self.model(*test_X)
                 test_loss = self.calculate_loss(supervise, model_output, test_y)
                 total_loss += test_loss
+                total_samples += len(test_y)
 
-        average_loss = total_loss / len(test_data.dataset)  # type: ignore
+        if self.distributed is not None:
+            total_loss, total_samples = self.distributed.all_reduce_sum(float(total_loss), total_samples)
+        average_loss = total_loss / max(total_samples, 1)
 
         return average_loss
 
-    def save_and_show(self,
-                      plot: bool = False,
-                      train_loss_history = None,
-                      test_loss_history = None,
-                      model_dir: str = False,
-                      model_name: str = None) -> None:
+    @staticmethod
+    def metrics_path(model_dir: str, model_name: str) -> str:
         """
-        检查损失并保存状态
+        获得训练指标记录文件地址
 
-        :param plot: 是否绘制损失图像
-        :param train_loss_history: 训练损失
-        :param test_loss_history: 测试损失
         :param model_dir: 模型保存路径
         :param model_name: 模型名称
-        :return: 无
+        :return: 记录文件地址
         """
 
-        if model_dir:
-            self.save(model_dir, model_name)
-
-        if plot:
-            self.show(train_loss_history, test_loss_history)
+        return os.path.join(model_dir, f'{model_name}_metrics.jsonl')
 
-    def show(self, *args: Any) -> None:
+    def check_cancelled(self,
+                        cancel_token: CancellationToken | None,
+                        checkpoint_on_cancel: bool,
+                        model_dir: str | None,
+                        model_name: str,
+                        completed_epoch: int) -> None:
         """
-        绘制损失图
+        检查是否已请求取消训练
 
-        :param args: 损失记录列表
+        :param cancel_token: 取消令牌
+        :param checkpoint_on_cancel: 被取消时是否保存可续训检查点
+        :param model_dir: 模型保存路径
+        :param model_name: 模型名称
+        :param completed_epoch: 已完成的迭代次数
         :return: 无
+
+        注意
+        ------
+        - 多进程训练时任一进程被取消即所有进程一同取消, 各进程须在相同的 batch处调用
         """
 
-        labels = ['Train loss', 'Valid loss']
+        cancelled = cancel_token is not None and cancel_token.cancelled
+        if self.distributed is not None:
+            cancelled = self.distributed.any(cancelled)
+        if not cancelled:
+            return
 
-        plt.figure(figsize = (8, 8))
-        for idx, x in enumerate(args):
-            plt.plot(x, label = labels[idx])
+        if checkpoint_on_cancel and model_dir:
+            self.save_resume(model_dir, model_name, completed_epoch)
+        self.flush()
 
-        plt.title(f'Loss during the training process of {self.model.__class__.__name__}')
-        plt.xlabel('Epoch')
-        plt.ylabel('Loss')
+        raise TaskCancelledError(f'Training of {model_name} has been cancelled after {completed_epoch} epochs')
 
-        plt.gca().spines['right'].set_visible(False)
-        plt.gca().spines['top'].set_visible(False)
+    def save_resume(self, model_dir: str, model_name: str, completed_epoch: int) -> None:
+        """
+        保存可续训检查点
 
-        plt.legend()
-        # plt.savefig(f'{self.model.__class__.__name__}_loss.svg', dpi = 1000, bbox_inches = 'tight')
-        plt.show()
+        :param model_dir: 模型保存路径
+        :param model_name: 模型名称
+        :param completed_epoch: 已完成的迭代次数
+        :return: 无
+
+        注意
+        ------
+        - 多进程训练时只有 0号进程保存
+        """
+
+        if self.distributed is not None and not self.distributed.is_main:
+            return
+
+        checkpoint = {
+            Checkpoint.MODEL: self.model.state_dict(),
+            Checkpoint.OPTIMIZER: self.optimizer.state_dict(),
+            Checkpoint.EPOCH: completed_epoch,
+            Checkpoint.FINGERPRINT: self.fingerprint,
+            Checkpoint.INCREMENTAL: self.incremental
+        }
+        resume_path = os.path.join(model_dir, f'{model_name}_{ModelSaveMode.RESUME.value}.pth')
+        self.checkpoint_writer.submit(resume_path, {resume_path: checkpoint})
 
     def save(self, model_dir: str, model_name: str) -> None:
         """
@@ -200,13 +450,34 @@ class Trainer:
         :param model_dir: 模型保存路径
         :param model_name: 模型名称
         :return: 无
+
+        注意
+        ------
+        - 仅在内存中拍下快照后立即返回, 文件由后台线程写入, 需要确保文件已落盘时请调用 flush()
+        - 多进程训练时只有 0号进程保存
         """
 
-        # 保存整体模型
-        torch.save(self.model, os.path.join(model_dir, f'{model_name}_{ModelSaveMode.FRAME.value}.pth'))
+        if self.distributed is not None and not self.distributed.is_main:
+            return
+
         # 保存模型参数
         checkpoint = {
             Checkpoint.MODEL: self.model.state_dict(),
             Checkpoint.OPTIMIZER: self.optimizer.state_dict()
         }
-        torch.save(checkpoint, os.path.join(model_dir, f'{model_name}_{ModelSaveMode.STATE.value}.pth'))
+        if self.watermark is not None:
+            checkpoint[Checkpoint.WATERMARK] = self.watermark
+        self.checkpoint_writer.submit(os.path.join(model_dir, model_name), {
+            # 整体模型
+            os.path.join(model_dir, f'{model_name}_{ModelSaveMode.FRAME.value}.pth'): self.model,
+            os.path.join(model_dir, f'{model_name}_{ModelSaveMode.STATE.value}.pth'): checkpoint
+        })
+
+    def flush(self) -> None:
+        """
+        等待所有检查点写入完成
+
+        :return: 无
+        """
+
+        self.checkpoint_writer.flush()
@@ -2,9 +2,26 @@ from .Loader import Loader
 from .Trainer import Trainer
 from .Configurer import Configurer
 from .Persistencer import Persistencer
+from .MicroBatcher import MicroBatcher
+from .ModelSlot import ModelSlot, ModelVersion
+from .LeastSquares import LeastSquares
+from .CheckpointWriter import CheckpointWriter
+from .MetricsRecorder import MetricsRecorder
+from .Profiler import PhaseProfiler
+from .DatasetCache import DatasetCache
+from .Distributed import Distributed
 from . import task
 
 __all__ = ['Loader',
            'Trainer',
            'Configurer',
-           'Persistencer']
+           'Persistencer',
+           'MicroBatcher',
+           'ModelSlot',
+           'ModelVersion',
+           'LeastSquares',
+           'CheckpointWriter',
+           'MetricsRecorder',
+           'PhaseProfiler',
+           'DatasetCache',
+           'Distributed']
@@ -1,14 +1,23 @@
+import os
+import json
+import heapq
+import itertools
+import sqlite3
 import time
 import uuid
+import inspect
 import traceback
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import typing
 from typing import Callable, Any, Protocol, ParamSpec, TypeVar
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, Future
+import multiprocessing
+import multiprocessing.managers
 import threading
 
-from common import TaskState
+from common import TaskState, ExecutorBackend
+from .Configurer import Configurer
 
 P = ParamSpec('P')
 R = TypeVar('R')
@@ -34,6 +43,124 @@ class LongTask(Protocol[P, R]):
         ...
 
 
+class TaskCancelledError(Exception):
+    """
+    任务被取消异常, 由长任务在检查到取消请求后抛出
+    """
+
+    def __init__(self, message: str = 'Task has been cancelled'):
+        """
+        初始化参数
+
+        :param message: 异常信息
+        """
+
+        super().__init__(message)
+
+
+class CancellationToken:
+    """
+    任务取消令牌, 由 TaskManager注入长任务, 长任务在安全点检查并自行退出
+
+    使用
+    ------
+    - 长任务声明 cancel_token参数即可获得令牌
+    >>> @TaskManager.long_task
+    >>> def my_task(cancel_token: CancellationToken = None):
+    >>>     for step in range(100):
+    >>>         cancel_token.raise_if_cancelled()
+
+    注意
+    ------
+    - 线程任务使用 threading.Event, 子进程任务使用跨进程的 Manager Event, 令牌本身可以被 pickle
+    """
+
+    def __init__(self, event: Any = None):
+        """
+        初始化参数
+
+        :param event: 事件对象, 为 None时使用 threading.Event
+        """
+
+        self.__event = threading.Event() if event is None else event
+
+    def cancel(self) -> None:
+        """
+        请求取消
+
+        :return: 无
+        """
+
+        self.__event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        是否已请求取消
+
+        :return: 是否已请求取消
+        """
+
+        return self.__event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """
+        已请求取消时抛出 TaskCancelledError
+
+        :return: 无
+        """
+
+        if self.cancelled:
+            raise TaskCancelledError()
+
+
+class ProgressReporter:
+    """
+    任务进度报告器, 由 TaskManager注入长任务, 长任务写入的进度会作为运行中任务的 info返回
+
+    使用
+    ------
+    - 长任务声明 progress_reporter参数即可获得报告器
+    >>> @TaskManager.long_task
+    >>> def my_task(progress_reporter: ProgressReporter = None):
+    >>>     for step in range(100):
+    >>>         progress_reporter.report(step = step, total = 100)
+
+    注意
+    ------
+    - 每次报告与已有进度合并, 同名字段被覆盖
+    - 线程任务使用普通 dict, 子进程任务使用跨进程的 Manager dict, 报告器本身可以被 pickle
+    """
+
+    def __init__(self, store: Any = None):
+        """
+        初始化参数
+
+        :param store: 进度存储, 为 None时使用 dict
+        """
+
+        self.__store = {} if store is None else store
+
+    def report(self, **fields: Any) -> None:
+        """
+        报告进度
+
+        :param fields: 进度字段
+        :return: 无
+        """
+
+        self.__store.update(fields)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        获得当前进度的副本
+
+        :return: 当前进度
+        """
+
+        return dict(self.__store)
+
+
 @dataclass
 class Task:
     """
@@ -47,7 +174,28 @@ class Task:
     # 任务信息
     info: Any
     # 任务函数
-    task_future: Future
+    task_future: Future | None
+    # 任务成功后、标记为成功前在服务进程中执行的回调, 任务结束后置为 None
+    callbacks: list[Callable[[Any], Any]] | None = field(default_factory = list)
+    # 任务结束时间戳
+    finished_at: float | None = None
+    # 取消令牌
+    cancel_token: CancellationToken | None = None
+    # 调度优先级, 数值越大越先执行
+    priority: int = 0
+    # 去重键, 相同键的未结束任务只执行一次
+    key: str | None = None
+    # 进度报告器
+    progress_reporter: ProgressReporter | None = None
+
+    def is_finished(self) -> bool:
+        """
+        任务是否已结束
+
+        :return: 任务是否已处于最终状态
+        """
+
+        return self.state in (TaskState.SUCCESS, TaskState.FAILURE, TaskState.REVOKED)
 
     def pending(self) -> None:
         """
@@ -132,9 +280,69 @@ class Task:
         self.info = info
 
 
-class TaskManager:
+class TaskHistory:
+    """
+    已结束任务的持久化历史记录
+    """
+
+    def __init__(self, history_path: str):
+        """
+        初始化参数
+
+        :param history_path: SQLite数据库文件地址
+        """
+
+        self.history_path = history_path
+        self.__lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(history_path), exist_ok = True)
+        with self.__lock, sqlite3.connect(self.history_path) as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS task_history ('
+                         'task_id TEXT PRIMARY KEY, state TEXT NOT NULL, info TEXT, finished_at REAL)')
+
+    def append(self, tasks: list[Task]) -> None:
+        """
+        写入已结束的任务
+
+        :param tasks: 已结束的任务
+        :return: 无
+        """
+
+        if not tasks:
+            return
+
+        rows = [(task.task_id, task.state.name, json.dumps(task.info, default = str), task.finished_at) for task in tasks]
+        with self.__lock, sqlite3.connect(self.history_path) as conn:
+            conn.executemany('INSERT OR REPLACE INTO task_history VALUES (?, ?, ?, ?)', rows)
+
+    def get(self, task_id: str) -> Task | None:
+        """
+        查询历史任务
+
+        :param task_id: 任务 id
+        :return: 历史任务, 不存在时为 None
+        """
+
+        with self.__lock, sqlite3.connect(self.history_path) as conn:
+            row = conn.execute('SELECT state, info, finished_at FROM task_history WHERE task_id = ?', (task_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        state, info, finished_at = row
+        return Task(task_id, TaskState[state], json.loads(info), None, None, finished_at)
+
+
+class TaskManager(Configurer):
     """
     异步任务管理类
+
+    注意
+    ------
+    - 默认在服务进程内的线程池中执行任务; 配置 backend为 PROCESS后任务在独立子进程池中执行, 不与请求处理争抢 GIL
+    - 子进程中执行的任务函数及其参数、返回值、异常都必须可以被 pickle, 且任务不能依赖服务进程的内存状态
+    - 任务先进入按优先级排序的等待队列, 有空闲 worker时才被发送至执行池, 同优先级按提交顺序执行
+    - 函数与参数均相同的任务在等待或执行期间再次提交时不会重复执行, 直接返回已有任务的 id
     """
 
     def __init__(self, max_workers: int):
@@ -144,11 +352,199 @@ class TaskManager:
         :param max_workers: 异步任务队列最大子进程数
         """
 
+        self.manager_name = self.__class__.__name__
+
+        # 执行后端: THREAD(线程池) / PROCESS(子进程池)
+        self.backend = ExecutorBackend.THREAD.value
+        # 最大并行任务数
+        self.max_workers = max_workers
+        # 子进程绑定的 CPU编号, 为 None时不绑定
+        self.cpu_affinity = None
+        # 子进程 nice值增量, 数值越大优先级越低
+        self.nice = 0
+        # 子进程启动方式
+        self.start_method = 'spawn'
+
+        # 子进程任务无法回调开始事件, 长轮询时按此间隔(s)检查其是否已开始
+        self.refresh_interval = 0.5
+        # 内存中保留的最大任务数, 超出时最早结束的任务被移入历史记录
+        self.max_tasks = 1000
+        # 已结束任务在内存中的保留时间(s)
+        self.task_ttl = 3600.0
+        # 历史记录文件地址
+        self.history_path = '../../resource/dynamic/task_history.sqlite3'
+
+        self.__history: TaskHistory | None = None
+        # 子进程任务的取消令牌和进度报告器需要跨进程共享
+        self.__sync_manager = None
+
         self.__tasks: dict[str, Task] = {}
-        self.__process_pool = ThreadPoolExecutor(max_workers = max_workers)
+        # 已移出内存但尚未写入历史记录的任务, 写入完成前仍可查询
+        self.__archiving: dict[str, Task] = {}
+        # 未结束任务的去重键索引
+        self.__active: dict[str, Task] = {}
+        # 等待队列, 元素为 (-优先级, 提交序号, 任务 id, (函数, 位置参数, 关键字参数))
+        self.__queue: list[tuple[int, int, str, tuple]] = []
+        self.__sequence = itertools.count()
+        # 已发送至执行池且尚未结束的任务数
+        self.__running = 0
+        self.__process_pool: Executor | None = None
         self.__process_lock = threading.Lock()
-        self.__tasks_status_monitor = threading.Thread(target = self.__monitor, daemon = True)
-        self.__tasks_status_monitor.start()
+        # 任务状态变化通知, 与 __process_lock共用同一把锁
+        self.__state_changed = threading.Condition(self.__process_lock)
+
+    def configure(self, config_path: str) -> None:
+        """
+        加载任务执行参数
+
+        :param config_path: 配置文件地址
+        :return: 无
+
+        注意
+        ------
+        - 已创建的执行池会被关闭并在下次提交任务时按新配置重建, 正在执行的任务不受影响
+        """
+
+        with open(config_path, 'r', encoding = 'UTF-8') as file:
+            settings = json.load(file)
+
+        self.load_configuration(settings.get('service', {}).get(self.manager_name, {}))
+        self.history_path = self.path_revise(self.history_path)
+
+        with self.__process_lock:
+            if self.__process_pool is not None:
+                self.__process_pool.shutdown(wait = False)
+                self.__process_pool = None
+            self.__history = None
+
+    @property
+    def isolated(self) -> bool:
+        """
+        任务是否在独立子进程中执行
+
+        :return: 是否在独立子进程中执行
+        """
+
+        return ExecutorBackend(self.backend) is ExecutorBackend.PROCESS
+
+    @staticmethod
+    def initialize_worker(cpu_affinity: list[int] | None, nice: int) -> None:
+        """
+        初始化子进程的 CPU亲和性和调度优先级
+
+        :param cpu_affinity: 绑定的 CPU编号
+        :param nice: nice值增量
+        :return: 无
+        """
+
+        if cpu_affinity:
+            os.sched_setaffinity(0, cpu_affinity)
+        if nice:
+            os.nice(nice)
+
+    def __executor(self) -> Executor:
+        """
+        获得执行池, 不存在时按当前配置创建
+
+        :return: 执行池
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        if self.__process_pool is None:
+            if self.isolated:
+                self.__process_pool = ProcessPoolExecutor(max_workers = self.max_workers,
+                                                          mp_context = multiprocessing.get_context(self.start_method),
+                                                          initializer = self.initialize_worker,
+                                                          initargs = (self.cpu_affinity, self.nice))
+            else:
+                self.__process_pool = ThreadPoolExecutor(max_workers = self.max_workers)
+
+        return self.__process_pool
+
+    def __history_store(self) -> TaskHistory:
+        """
+        获得历史记录, 不存在时创建
+
+        :return: 历史记录
+        """
+
+        if self.__history is None:
+            self.__history = TaskHistory(self.path_revise(self.history_path))
+
+        return self.__history
+
+    def __evict(self) -> list[Task]:
+        """
+        从内存中移出超时或超出容量的已结束任务
+
+        :return: 被移出的任务
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用, 未结束的任务永远不会被移出
+        """
+
+        now = time.time()
+        finished = sorted((task for task in self.__tasks.values() if task.is_finished()), key = lambda task: task.finished_at)
+
+        expired = [task for task in finished if now - task.finished_at >= self.task_ttl]
+        overflow = len(self.__tasks) - len(expired) - self.max_tasks
+        if overflow > 0:
+            expired.extend(finished[len(expired):len(expired) + overflow])
+
+        for task in expired:
+            self.__archiving[task.task_id] = self.__tasks.pop(task.task_id)
+
+        return expired
+
+    def __archive(self, tasks: list[Task]) -> None:
+        """
+        将已移出内存的任务写入历史记录
+
+        :param tasks: 已移入 __archiving的任务
+        :return: 无
+
+        注意
+        ------
+        - 须在未持有 __process_lock时调用; 写入完成后才从 __archiving中移除, 写入期间查询不会找不到任务
+        """
+
+        if not tasks:
+            return
+
+        try:
+            self.__history_store().append(tasks)
+        finally:
+            with self.__process_lock:
+                for task in tasks:
+                    self.__archiving.pop(task.task_id, None)
+
+    def __lookup(self, task_id: str) -> Task:
+        """
+        查找任务, 内存中不存在时查询历史记录
+
+        :param task_id: 任务 id
+        :return: 任务
+
+        注意
+        ------
+        - 须在未持有 __process_lock时调用, 只在查找内存时持锁, 查询历史记录期间不阻塞其他任务操作
+        - 任务写入历史记录后才从 __archiving中移除, 查找期间任务被移出内存时仍可在历史记录中找到
+        """
+
+        with self.__process_lock:
+            task = self.__tasks.get(task_id, None)
+            if task is None:
+                task = self.__archiving.get(task_id, None)
+        if task is None:
+            task = self.__history_store().get(task_id)
+        if task is None:
+            raise ValueError(f"No such task called '{task_id}'")
+
+        return task
 
     def __str__(self):
         """
@@ -176,50 +572,361 @@ class TaskManager:
         func._is_long_task = True
         return typing.cast(LongTask[P, R], func)
 
-    def submit(self, func: LongTask, *args: Any, **kwargs: Any) -> str:
+    @staticmethod
+    def task_key(func: LongTask, args: tuple, kwargs: dict[str, Any]) -> str:
+        """
+        计算任务去重键
+
+        :param func: 任务函数
+        :param args: 位置参数
+        :param kwargs: 关键字参数
+        :return: 由函数全名和参数 repr组成的去重键
+        """
+
+        return f'{func.__module__}.{func.__qualname__}{args!r}{sorted(kwargs.items())!r}'
+
+    def submit(self, func: LongTask, *args: Any, priority: int = 0, **kwargs: Any) -> str:
         """
         注册任务
 
         :param func: 被注册函数
-        :return: 包装函数地址
+        :param priority: 调度优先级, 数值越大越先执行
+        :return: 任务 id
+
+        注意
+        ------
+        - 存在函数与参数均相同的未结束任务时不会新建任务, 直接返回该任务的 id; 若其仍在等待, 优先级提升至两者中的较大值
         """
 
         # 拒绝将未注册LongTask的任务加入异步任务队列
         if not getattr(func, '_is_long_task', False):
             raise TypeError(f"The target task '{func.__name__}' is not a long task, please use '@TaskManager.long_task' to decorate it")
 
-        task_id = str(uuid.uuid4())
-        task_future = self.__process_pool.submit(func, *args, **kwargs)
+        key = self.task_key(func, args, kwargs)
+        with self.__process_lock:
+            task = self.__active.get(key, None)
+            if task is not None:
+                if task.task_future is None and priority > task.priority:
+                    task.priority = priority
+                    heapq.heappush(self.__queue, (-priority, next(self.__sequence), task.task_id, self.__queue_call(task.task_id)))
+                return task.task_id
+
+            task = Task(str(uuid.uuid4()), TaskState.PENDING, None, None, priority = priority, key = key)
+            # 为声明了 cancel_token / progress_reporter参数的长任务注入取消令牌和进度报告器
+            parameters = inspect.signature(func).parameters
+            if 'cancel_token' in parameters:
+                task.cancel_token = self.__new_token()
+                kwargs['cancel_token'] = task.cancel_token
+            if 'progress_reporter' in parameters:
+                task.progress_reporter = self.__new_reporter()
+                kwargs['progress_reporter'] = task.progress_reporter
+
+            self.__tasks.update({task.task_id: task})
+            self.__active.update({key: task})
+            heapq.heappush(self.__queue, (-priority, next(self.__sequence), task.task_id, (func, args, kwargs)))
+            dispatched = self.__dispatch()
+            evicted = self.__evict()
+        self.__archive(evicted)
+        self.__watch(dispatched)
+
+        return task.task_id
+
+    def __queue_call(self, task_id: str) -> tuple:
+        """
+        查找等待队列中任务的调用参数
+
+        :param task_id: 任务 id
+        :return: (函数, 位置参数, 关键字参数)
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        return next(call for _, _, queued_id, call in self.__queue if queued_id == task_id)
+
+    def __dispatch(self) -> list[Task]:
+        """
+        按优先级将等待队列中的任务发送至执行池, 直至 worker全部占满
+
+        :return: 本次发送的任务
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用, 返回后须在释放锁后调用 __watch
+        - 优先级被提升或已被撤销的任务会在队列中留下过期条目, 出队时跳过
+        """
+
+        dispatched = []
+        while self.__queue and self.__running < self.max_workers:
+            neg_priority, _, task_id, (func, args, kwargs) = heapq.heappop(self.__queue)
+            task = self.__tasks.get(task_id, None)
+            if task is None or task.task_future is not None or task.is_finished() or -neg_priority != task.priority:
+                continue
+
+            if self.isolated:
+                # 子进程无法回调开始事件, 开始状态在查询时由 Future推断
+                task.task_future = self.__executor().submit(func, *args, **kwargs)
+            else:
+                task.task_future = self.__executor().submit(self.__run, task, func, *args, **kwargs)
+            task.sent()
+            self.__running += 1
+            dispatched.append(task)
+
+        if dispatched:
+            self.__state_changed.notify_all()
+
+        return dispatched
+
+    def __watch(self, tasks: list[Task]) -> None:
+        """
+        为已发送的任务注册结束回调
+
+        :param tasks: 已发送的任务
+        :return: 无
+
+        注意
+        ------
+        - 已结束的 Future会同步触发回调, 因此不能在持锁时调用
+        """
+
+        for task in tasks:
+            task.task_future.add_done_callback(lambda future, task = task: self.__finish(task, future))
+
+    def on_success(self, task_id: str, callback: Callable[[Any], Any]) -> None:
+        """
+        注册任务成功后在服务进程中执行的回调
+
+        :param task_id: 任务 id
+        :param callback: 回调函数, 接收任务返回值
+        :return: 无
+
+        注意
+        ------
+        - 适用于子进程任务结束后在服务进程内加载其产物, 如重新加载模型
+        - 回调全部执行完毕后任务才会被标记为成功, 回调抛出异常时任务被标记为失败
+        - 任务进入最终状态与回调注册在同一把锁下进行, 执行已注册回调期间新注册的回调同样会在任务结束前执行
+        - 任务已成功结束时回调立即在当前线程执行; 已移入历史记录的任务不再持有返回值, 回调接收 None
+        """
+
+        task = self.__lookup(task_id)
         with self.__process_lock:
-            self.__tasks.update({task_id: Task(task_id, TaskState.PENDING, None, task_future)})
+            if task.callbacks is not None:
+                # 重复提交被合并的任务可能重复注册同一回调
+                if callback not in task.callbacks:
+                    task.callbacks.append(callback)
+                return
 
-        return task_id
+        if task.state is TaskState.SUCCESS:
+            callback(task.task_future.result() if task.task_future is not None else None)
 
-    def __monitor(self) -> None:
+    def __new_token(self) -> CancellationToken:
         """
-        监控任务队列, 自动修改任务状态
+        创建适用于当前执行后端的取消令牌
+
+        :return: 取消令牌
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        if not self.isolated:
+            return CancellationToken()
+
+        return CancellationToken(self.__shared().Event())
+
+    def __new_reporter(self) -> ProgressReporter:
+        """
+        创建适用于当前执行后端的进度报告器
+
+        :return: 进度报告器
 
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        if not self.isolated:
+            return ProgressReporter()
+
+        return ProgressReporter(self.__shared().dict())
+
+    def __shared(self) -> multiprocessing.managers.SyncManager:
+        """
+        获得跨进程共享对象的管理器, 不存在时创建
+
+        :return: 共享对象管理器
+
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        if self.__sync_manager is None:
+            self.__sync_manager = multiprocessing.get_context(self.start_method).Manager()
+
+        return self.__sync_manager
+
+    def cancel(self, task_id: str) -> Task:
+        """
+        取消任务
+
+        :param task_id: 任务 id
+        :return: 任务
+
+        注意
+        ------
+        - 尚未开始的任务直接从队列中撤销
+        - 正在执行的任务仅设置取消令牌, 由任务在下一个安全点自行退出, 之后状态变为 REVOKED
+        - 未声明 cancel_token参数的运行中任务无法被取消
+        """
+
+        task = self.__lookup(task_id)
+        with self.__state_changed:
+            if task.is_finished():
+                return task
+
+            # 仍在等待队列中的任务直接撤销, 队列中的条目出队时跳过
+            task_future = task.task_future
+            if task_future is None:
+                task.callbacks = None
+                self.__close(task, task.revoked, None)
+                evicted = self.__evict()
+
+        if task_future is None:
+            self.__archive(evicted)
+        # Future.cancel会同步触发结束回调, 因此不能在持锁时调用
+        elif not task_future.cancel() and task.cancel_token is not None:
+            task.cancel_token.cancel()
+
+        return task
+
+    def __run(self, task: Task, func: LongTask, *args: Any, **kwargs: Any) -> Any:
+        """
+        在线程池中执行任务, 并在开始时更新任务状态
+
+        :param task: 任务
+        :param func: 任务函数
+        :return: 任务函数返回值
+        """
+
+        with self.__state_changed:
+            task.progress()
+            self.__state_changed.notify_all()
+
+        return func(*args, **kwargs)
+
+    def __finish(self, task: Task, task_future: Future) -> None:
+        """
+        任务结束回调, 执行成功回调并更新最终状态
+
+        :param task: 任务
+        :param task_future: 任务 Future
         :return: 无
         """
 
+        with self.__process_lock:
+            self.__running -= 1
+            dispatched = self.__dispatch()
+        self.__watch(dispatched)
+
+        info = None
+        if task_future.cancelled():
+            finish = task.revoked
+        elif isinstance(task_future.exception(), TaskCancelledError):
+            finish = task.revoked
+            info = str(task_future.exception())
+        elif task_future.exception() is not None:
+            finish = task.failure
+            info = ''.join(traceback.format_exception(task_future.exception()))
+        else:
+            finish = task.success
+
+        executed = []
         while True:
-            time.sleep(0.1)
+            with self.__state_changed:
+                # 没有待执行的回调时, 在同一把锁下关闭回调注册并置为最终状态, 之后注册的回调由 on_success立即执行
+                callbacks = [callback for callback in task.callbacks if callback not in executed] if finish == task.success else []
+                if not callbacks:
+                    task.callbacks = None
+                    self.__close(task, finish, info)
+                    evicted = self.__evict()
+                    break
+
+            try:
+                for callback in callbacks:
+                    executed.append(callback)
+                    callback(task_future.result())
+            except Exception:
+                finish = task.failure
+                info = str(traceback.format_exc())
+        self.__archive(evicted)
+
+    def __close(self, task: Task, finish: Callable[[], None], info: Any) -> None:
+        """
+        将任务置为最终状态并通知等待方
+
+        :param task: 任务
+        :param finish: 最终状态的设置方法
+        :param info: 任务信息, 为 None时不修改
+        :return: 无
 
-            with self.__process_lock:
-                for task_id, task in list(self.__tasks.items()):
-                    task_future = task.task_future
-
-                    # 查看任务状态
-                    if task_future.running():
-                        task.progress()
-                    elif task_future.done():
-                        try:
-                            task_future.result()
-                        except Exception:
-                            task.failure()
-                            task.set_info(str(traceback.format_exc()))
-                        else:
-                            task.success()
+        注意
+        ------
+        - 须在持有 __process_lock时调用
+        """
+
+        finish()
+        # 成功结束的任务保留最终进度
+        if info is None and task.progress_reporter is not None:
+            info = task.progress_reporter.snapshot()
+        if info is not None:
+            task.set_info(info)
+        task.finished_at = time.time()
+        if self.__active.get(task.key, None) is task:
+            self.__active.pop(task.key)
+        self.__state_changed.notify_all()
+
+    @staticmethod
+    def __refresh(task: Task) -> None:
+        """
+        由 Future推断子进程任务是否已开始, 并将运行中任务的最新进度写入 info
+
+        :param task: 任务
+        :return: 无
+        """
+
+        if task.state is TaskState.SENT and task.task_future is not None and task.task_future.running():
+            task.progress()
+
+        if task.state is TaskState.PROGRESS and task.progress_reporter is not None:
+            task.set_info(task.progress_reporter.snapshot())
+
+    def wait(self, task_id: str, last_state: TaskState | None, timeout: float) -> Task:
+        """
+        等待任务状态变化
+
+        :param task_id: 任务 id
+        :param last_state: 调用方已知的任务状态, 为 None时立即返回
+        :param timeout: 最长等待时间(s)
+        :return: 任务
+
+        注意
+        ------
+        - 状态不同于 last_state、任务结束或超时时返回, 返回时不视为对最终状态的 ACK
+        - 线程任务的状态变化由回调即时通知, 空闲时不消耗 CPU
+        """
+
+        deadline = time.monotonic() + timeout
+        task = self.__lookup(task_id)
+        with self.__state_changed:
+            while True:
+                self.__refresh(task)
+                remaining = deadline - time.monotonic()
+                if task.state is not last_state or task.is_finished() or remaining <= 0:
+                    return task
+                self.__state_changed.wait(min(remaining, self.refresh_interval) if self.isolated else remaining)
 
     def result(self, task_id: str) -> Task | None:
         """
@@ -230,13 +937,15 @@ class TaskManager:
         """
 
         # 获取注册任务及其线程
+        task = self.__lookup(task_id)
         with self.__process_lock:
-            task = self.__tasks.get(task_id, None)
-        if task is None:
-            raise ValueError(f"No such task called '{task_id}'")
-
-        # 最终结果一定为成功或失败, 任务执行完毕后, 若外部获取任务状态则视为对任务状态的ACK, 删除任务队列中的任务
-        if task.state is TaskState.SUCCESS or task.state is TaskState.FAILURE:  # type: ignore
-            self.__tasks.pop(task_id)
+            self.__refresh(task)
+
+            # 任务执行完毕后, 若外部获取任务状态则视为对任务状态的ACK, 将任务从内存移入历史记录
+            acknowledged = [self.__tasks.pop(task_id)] if task.is_finished() and task_id in self.__tasks else []
+            for acknowledged_task in acknowledged:
+                self.__archiving[acknowledged_task.task_id] = acknowledged_task
+            acknowledged.extend(self.__evict())
+        self.__archive(acknowledged)
 
         return task
@@ -0,0 +1,55 @@
+import os
+import json
+
+import numpy as np
+
+
+def write_linear_data(path: str, rows: int, seed: int = 0, header: bool = True) -> None:
+    """
+    生成 y = 2.5 * x + 1.0加少量噪声的线性数据, 追加写入 CSV文件
+
+    :param path: 数据文件地址
+    :param rows: 行数
+    :param seed: 随机种子
+    :param header: 是否写入表头, 追加数据时为 False
+    :return: 无
+    """
+
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size = rows)
+    with open(path, 'a', encoding = 'UTF-8') as file:
+        np.savetxt(file, np.column_stack((x, 2.5 * x + 1.0 + rng.normal(scale = 0.1, size = rows))),
+                   delimiter = ',', header = 'x,y' if header else '', comments = '')
+
+
+def write_settings(work_dir: str, rows: int = 203, model: dict = None, sections: dict = None) -> str:
+    """
+    以小数据集及临时目录生成配置文件
+
+    :param work_dir: 临时目录, 数据文件、模型及缓存均写入此处
+    :param rows: 数据行数
+    :param model: 覆盖 model.LinearRegression中的配置项
+    :param sections: 按 (一级配置名, 类名)覆盖对应的配置项, 如 {('control', 'DataController'): {'streaming': True}}
+    :return: 配置文件地址
+    """
+
+    data_path = os.path.join(work_dir, 'linear_data.csv')
+    write_linear_data(data_path, rows)
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../config/settings.json'), 'r', encoding = 'UTF-8') as file:
+        settings = json.load(file)
+
+    settings['basic']['model_dir'] = os.path.join(work_dir, 'saved_models')
+    settings['database']['LocalData']['local_data_file_path']['linear_data'] = data_path
+    settings['database']['LocalData']['cache_dir'] = os.path.join(work_dir, 'cache')
+    settings['service']['TaskManager']['history_path'] = os.path.join(work_dir, 'task_history.sqlite3')
+    settings['model']['LinearRegression'].update({'solver': 'GRADIENT', 'epoch': 5, 'trials': 5, 'batch_size': 16, 'lr': 0.1,
+                                                  **(model or {})})
+    for (section, name), overrides in (sections or {}).items():
+        settings[section].setdefault(name, {}).update(overrides)
+
+    config_path = os.path.join(work_dir, 'settings.json')
+    with open(config_path, 'w', encoding = 'UTF-8') as file:
+        json.dump(settings, file)
+
+    return config_path
@@ -0,0 +1,96 @@
+import contextlib
+import tempfile
+from typing import Iterator
+
+from flask.testing import FlaskClient
+
+import app
+from common import TaskState
+from helpers import write_settings
+
+
+@contextlib.contextmanager
+def configured(config_path: str) -> Iterator[FlaskClient]:
+    """
+    以指定配置文件配置服务, 退出时恢复默认配置文件并关闭数据库连接
+
+    :param config_path: 配置文件地址
+    :return: 测试客户端
+    """
+
+    get_config_path, app.get_config_path = app.get_config_path, lambda: config_path
+    client = app.app.test_client()
+    try:
+        assert client.post('/api/SimpleAI/config').status_code == 204
+        yield client
+    finally:
+        app.get_config_path = get_config_path
+        app.task_manager.configure(get_config_path())
+        app.run.close()
+
+
+def test_process_train_reloads_model() -> None:
+    """
+    子进程训练任务成功后, 服务进程通过 on_success回调重新加载模型并可直接预测
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_path = write_settings(work_dir, model = {'epoch': 30}, sections = {('service', 'TaskManager'): {'backend': 'PROCESS'}})
+        with configured(config_path) as client:
+            assert app.task_manager.isolated
+
+            response = client.post('/api/SimpleAI/train?incremental=false')
+            assert response.status_code == 202
+            task_id = response.get_json()['task_id']
+
+            task = app.task_manager.wait(task_id, None, 0)
+            while not task.is_finished():
+                task = app.task_manager.wait(task_id, task.state, 60)
+            assert task.state is TaskState.SUCCESS, task.info
+
+            # 回调执行完毕后任务才被标记为成功, 此时服务进程中的模型已更新
+            assert abs(app.run.use([10.0]).item() - 26.0) < 5.0
+
+
+def test_wait_until_finished() -> None:
+    """
+    长轮询在任务状态变化时返回, 任务结束后返回最终状态
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        with configured(write_settings(work_dir)) as client:
+            task_id = client.post('/api/SimpleAI/train?incremental=false').get_json()['task_id']
+
+            query = {'timeout': 5.0}
+            for _ in range(100):
+                response = client.get(f'/api/SimpleAI/train/status/{task_id}/wait', query_string = query)
+                query['state'] = response.get_json()['state']
+                if query['state'] in (TaskState.SUCCESS.name, TaskState.FAILURE.name, TaskState.REVOKED.name):
+                    break
+            assert query['state'] == TaskState.SUCCESS.name and response.status_code == 200
+
+
+def test_predict_batch_validation() -> None:
+    """
+    格式错误的批量预测输入返回 400, 合法输入返回每个样本的预测值
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        with configured(write_settings(work_dir)) as client:
+            app.run.train(incremental = False)
+
+            for X in ([[1.0], [2.0, 3.0]], ['1.0', 2.0], [[1.0], 2.0], [True], [[]], [[1.0, 2.0]], [[[1.0]]]):
+                response = client.post('/api/SimpleAI/predict/batch', json = {'X': X})
+                assert response.status_code == 400, X
+                assert response.get_json()['error']
+
+            for X in ([1.0, 2.0], [[1.0], [2]]):
+                response = client.post('/api/SimpleAI/predict/batch', json = {'X': X})
+                assert response.status_code == 200 and len(response.get_json()) == 2
+
+
+if __name__ == '__main__':
+    test_process_train_reloads_model()
+    test_wait_until_finished()
+    test_predict_batch_validation()
+    print('App tests passed')
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import torch
+
+from utils import CheckpointWriter
+
+
+def test_atomic_write() -> None:
+    """
+    写入的是提交时的快照, 写入失败时目标文件保持原内容且不残留临时文件, 异常在 flush时抛出
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'LinearRegression_STATE.pth')
+        writer = CheckpointWriter()
+
+        weights = torch.zeros(4)
+        writer.submit('LinearRegression', {path: {'weights': weights}})
+        # 提交后继续修改参数不影响快照
+        weights += 1
+        writer.flush()
+        assert torch.equal(torch.load(path)['weights'], torch.zeros(4))
+
+        # lambda无法被序列化, 写入失败
+        writer.submit('LinearRegression', {path: {'weights': weights, 'callback': lambda: None}})
+        raised = False
+        try:
+            writer.flush()
+        except Exception:
+            raised = True
+        assert raised
+        assert torch.equal(torch.load(path)['weights'], torch.zeros(4))
+        assert os.listdir(work_dir) == ['LinearRegression_STATE.pth']
+
+        # 异常只抛出一次, 之后的写入正常进行
+        writer.submit('LinearRegression', {path: {'weights': weights}})
+        writer.flush()
+        assert torch.equal(torch.load(path)['weights'], torch.ones(4))
+
+
+if __name__ == '__main__':
+    test_atomic_write()
+    print('CheckpointWriter tests passed')
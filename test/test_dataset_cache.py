@@ -0,0 +1,64 @@
+import torch
+
+from utils import DatasetCache
+
+
+class Holder:
+    """
+    持有指定字节数张量的数据集
+    """
+
+    def __init__(self, nbytes: int):
+        """
+        初始化参数
+
+        :param nbytes: 张量字节数
+        """
+
+        self.data = torch.zeros(nbytes, dtype = torch.uint8)
+
+
+def test_lru_eviction() -> None:
+    """
+    超出字节数上限时淘汰最久未使用的数据集, 版本变化时重新构建, 版本为 None或超过上限的数据集不缓存
+    """
+
+    size = DatasetCache.estimate_size(Holder(1000))
+    cache = DatasetCache(max_bytes = 2 * size)
+    built = []
+
+    def build(name: str, nbytes: int = 1000):
+        """
+        生成记录构建次序的构建函数
+
+        :param name: 数据源标识
+        :param nbytes: 张量字节数
+        :return: 构建函数
+        """
+
+        return lambda: built.append(name) or Holder(nbytes)
+
+    a = cache.get_or_build('a', '1', build('a'))
+    cache.get_or_build('b', '1', build('b'))
+    # 访问 a后 b成为最久未使用的数据集
+    assert cache.get_or_build('a', '1', build('a')) is a
+    cache.get_or_build('c', '1', build('c'))
+    assert set(cache.statistics()['entries']) == {'a', 'c'}
+    assert cache.statistics()['bytes'] <= cache.max_bytes
+
+    cache.get_or_build('b', '1', build('b'))
+    cache.get_or_build('c', '2', build('c'))
+    assert built == ['a', 'b', 'c', 'b', 'c']
+    assert cache.statistics()['entries']['c']['version'] == '2'
+
+    cache.get_or_build('d', None, build('d'))
+    cache.get_or_build('d', None, build('d'))
+    cache.get_or_build('e', '1', build('e', 10 * size))
+    assert built[-3:] == ['d', 'd', 'e']
+    assert not {'d', 'e'} & set(cache.statistics()['entries'])
+    assert cache.statistics()['hits'] == 1
+
+
+if __name__ == '__main__':
+    test_lru_eviction()
+    print('DatasetCache tests passed')
@@ -0,0 +1,125 @@
+import os
+import json
+import socket
+import tempfile
+
+import numpy as np
+import torch
+import torch.multiprocessing
+
+from control import GeneralDispatch
+from common import ModelSaveMode
+
+# 数据并行训练的进程数
+WORLD_SIZE = 2
+
+
+def free_port() -> int:
+    """
+    获得一个空闲端口
+
+    :return: 端口号
+    """
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def write_settings(work_dir: str) -> str:
+    """
+    以小数据集及临时目录生成数据并行训练的配置文件
+
+    :param work_dir: 临时目录
+    :return: 配置文件地址
+    """
+
+    # 示例数据关系: y = 2.5 * x + 1.0
+    rng = np.random.default_rng(0)
+    x = rng.normal(size = 203)
+    data_path = os.path.join(work_dir, 'linear_data.csv')
+    np.savetxt(data_path, np.column_stack((x, 2.5 * x + 1.0 + rng.normal(scale = 0.1, size = len(x)))),
+               delimiter = ',', header = 'x,y', comments = '')
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../config/settings.json'), 'r', encoding = 'UTF-8') as file:
+        settings = json.load(file)
+
+    settings['basic']['model_dir'] = os.path.join(work_dir, 'saved_models')
+    settings['database']['LocalData']['local_data_file_path']['linear_data'] = data_path
+    settings['database']['LocalData']['cache_dir'] = os.path.join(work_dir, 'cache')
+    settings['model']['LinearRegression'].update({'solver': 'GRADIENT', 'epoch': 30, 'trials': 3, 'batch_size': 16, 'lr': 0.1})
+    settings['control']['GeneralDispatch']['distributed_training'].update({
+        'nproc_per_node': WORLD_SIZE, 'nnodes': 1, 'node_rank': 0, 'master_port': free_port()
+    })
+
+    config_path = os.path.join(work_dir, 'settings.json')
+    with open(config_path, 'w', encoding = 'UTF-8') as file:
+        json.dump(settings, file)
+
+    return config_path
+
+
+def train_rank(local_rank: int, config_path: str, work_dir: str) -> None:
+    """
+    单个训练进程, 训练后保存本进程的模型参数
+
+    :param local_rank: 进程序号
+    :param config_path: 配置文件地址
+    :param work_dir: 临时目录
+    :return: 无
+    """
+
+    dispatch = GeneralDispatch.rank_dispatch(config_path, 0, local_rank)
+    dispatch.distributed.init()
+    try:
+        with dispatch:
+            dispatch.train(incremental = False, force = True)
+        torch.save(dispatch.get_model_controller('LinearRegression').pretrained_model.state_dict(),
+                   os.path.join(work_dir, f'rank_{local_rank}.pth'))
+    finally:
+        dispatch.distributed.destroy()
+        dispatch.close()
+
+
+def test_parameters_identical_across_ranks() -> None:
+    """
+    各训练进程训练后的模型参数完全一致, 且与 0号进程保存的模型一致
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_path = write_settings(work_dir)
+        torch.multiprocessing.spawn(train_rank, args = (config_path, work_dir), nprocs = WORLD_SIZE)
+
+        states = [torch.load(os.path.join(work_dir, f'rank_{rank}.pth')) for rank in range(WORLD_SIZE)]
+        saved = torch.load(os.path.join(work_dir, 'saved_models', f'LinearRegression_{ModelSaveMode.FRAME.value}.pth'),
+                           weights_only = False).state_dict()
+        for state in states[1:] + [saved]:
+            assert state.keys() == states[0].keys()
+            assert all(torch.equal(state[layer], states[0][layer]) for layer in state)
+
+
+def test_train_and_eval() -> None:
+    """
+    由总控实例启动数据并行训练, 训练后本进程可直接评估及预测
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        run = GeneralDispatch()
+        run.configure(write_settings(work_dir))
+
+        summary = run.train(incremental = False)
+        assert summary['models']['LinearRegression']['trained']
+        assert summary['distributed']['world_size'] == WORLD_SIZE
+
+        assert all(os.path.exists(path) for path in run.eval())
+        assert abs(run.use([10.0]).item() - 26.0) < 5.0
+
+        # 训练输入未变化时不再训练
+        assert not run.train(incremental = False)['models']['LinearRegression']['trained']
+        run.close()
+
+
+if __name__ == '__main__':
+    test_parameters_identical_across_ranks()
+    test_train_and_eval()
+    print('Distributed training tests passed')
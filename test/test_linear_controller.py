@@ -0,0 +1,163 @@
+import os
+import tempfile
+
+import torch
+
+from control import GeneralDispatch
+from control.model_controller import LinearController
+from common import ModelSaveMode, Checkpoint
+from utils import MetricsRecorder, Trainer
+from utils.task import CancellationToken, ProgressReporter, TaskCancelledError
+from helpers import write_settings, write_linear_data
+
+
+def trained(summary: dict) -> bool:
+    """
+    训练耗时统计中 LinearRegression是否实际进行了训练
+
+    :param summary: GeneralDispatch.train()返回的耗时统计
+    :return: 是否实际训练
+    """
+
+    return summary['models']['LinearRegression']['trained']
+
+
+class CancelAfter(ProgressReporter):
+    """
+    完成指定次数的迭代后请求取消训练的进度报告器
+    """
+
+    def __init__(self, cancel_token: CancellationToken, epoch: int):
+        """
+        初始化参数
+
+        :param cancel_token: 取消令牌
+        :param epoch: 完成此迭代后请求取消
+        """
+
+        super().__init__()
+        self.cancel_token = cancel_token
+        self.epoch = epoch
+
+    def report(self, **fields) -> None:
+        """
+        报告进度, 指定迭代结束时请求取消
+
+        :param fields: 进度字段
+        :return: 无
+        """
+
+        super().report(**fields)
+        if fields.get('epoch', 0) >= self.epoch and fields.get('batch') == fields.get('batches'):
+            self.cancel_token.cancel()
+
+
+def test_fingerprint_skip_and_force() -> None:
+    """
+    训练输入未变化时跳过训练, force时强制训练, 超参数或数据变化时重新训练
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        run = GeneralDispatch()
+        run.configure(write_settings(work_dir))
+        controller = run.get_model_controller('LinearRegression')
+
+        assert trained(run.train(incremental = False))
+        assert not trained(run.train(incremental = False))
+        assert trained(run.train(incremental = False, force = True))
+        assert not trained(run.train(incremental = False))
+
+        controller.lr = 0.05
+        assert trained(run.train(incremental = False))
+        assert not trained(run.train(incremental = False))
+
+        write_linear_data(os.path.join(work_dir, 'linear_data.csv'), 10, seed = 2, header = False)
+        assert trained(run.train(incremental = False))
+        run.close()
+
+
+def test_incremental_after_full_train() -> None:
+    """
+    全量训练后追加数据, 增量学习只读取新增的行并从已保存的检查点继续训练
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        run = GeneralDispatch()
+        run.configure(write_settings(work_dir, rows = 200))
+        controller = run.get_model_controller('LinearRegression')
+
+        assert trained(run.train(incremental = False))
+        assert torch.load(controller.model_path[ModelSaveMode.STATE])[Checkpoint.WATERMARK]['rows'] == 200
+
+        # 没有新增数据时不训练
+        assert not trained(run.train(incremental = True))
+
+        write_linear_data(os.path.join(work_dir, 'linear_data.csv'), 50, seed = 1, header = False)
+        assert trained(run.train(incremental = True))
+        assert len(controller.dataset) == 50
+        assert torch.load(controller.model_path[ModelSaveMode.STATE])[Checkpoint.WATERMARK]['rows'] == 250
+        run.close()
+
+
+def test_resume_after_cancel() -> None:
+    """
+    训练被取消后保存可续训检查点, 再次训练从被取消的迭代继续并在完成后删除检查点
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        run = GeneralDispatch()
+        run.configure(write_settings(work_dir, model = {'epoch': 8, 'trials': 100}))
+        controller = run.get_model_controller('LinearRegression')
+        resume_path = controller.model_path[ModelSaveMode.RESUME]
+
+        cancel_token = CancellationToken()
+        try:
+            run.train(incremental = False, cancel_token = cancel_token, progress_reporter = CancelAfter(cancel_token, 3))
+            raise AssertionError('Training was not cancelled')
+        except TaskCancelledError:
+            pass
+        assert torch.load(resume_path)[Checkpoint.EPOCH] == 3
+
+        # 续训只执行剩余的迭代
+        assert trained(run.train(incremental = False))
+        metrics_path = Trainer.metrics_path(os.path.dirname(resume_path), 'LinearRegression')
+        assert [record['epoch'] for record in MetricsRecorder.load(metrics_path)] == list(range(4, 9))
+        assert not os.path.exists(resume_path)
+
+        # 续训完成后训练输入未变化, 不再训练
+        assert not trained(run.train(incremental = False))
+        run.close()
+
+
+def test_parallel_training() -> None:
+    """
+    max_parallel_training大于 1时多个模型并行训练, 共享同一份数据集且训练后可直接预测
+    """
+
+    model = {'solver': 'GRADIENT', 'epoch': 30, 'trials': 5, 'batch_size': 16, 'lr': 0.1}
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_path = write_settings(work_dir, model = model, sections = {('control', 'GeneralDispatch'): {'max_parallel_training': 2},
+                                                                          ('model', 'LinearRegressionCopy'): model})
+        run = GeneralDispatch()
+        copy = LinearController()
+        copy.model_name = 'LinearRegressionCopy'
+        run.model_controllers.append(copy)
+        run.configure(config_path)
+
+        reporter = ProgressReporter()
+        summary = run.train(incremental = False, progress_reporter = reporter)
+        assert all(timing['trained'] for timing in summary['models'].values()) and len(summary['models']) == 2
+        assert len(summary['datasets']) == 1
+        assert reporter.snapshot()['models_finished'] == 2
+
+        X = torch.tensor([[10.0]])
+        assert all(abs(controller.use(X).item() - 26.0) < 5.0 for controller in run.model_controllers)
+        run.close()
+
+
+if __name__ == '__main__':
+    test_fingerprint_skip_and_force()
+    test_incremental_after_full_train()
+    test_resume_after_cancel()
+    test_parallel_training()
+    print('LinearController tests passed')
@@ -0,0 +1,103 @@
+import os
+import json
+import tempfile
+
+import numpy as np
+
+from database import LocalData
+from helpers import write_settings, write_linear_data
+
+
+def local_data(work_dir: str, use_cache: bool) -> LocalData:
+    """
+    以临时目录中的数据文件及缓存目录配置本地数据
+
+    :param work_dir: 临时目录
+    :param use_cache: 是否启用缓存
+    :return: 本地数据
+    """
+
+    with open(write_settings(work_dir, rows = 100), 'r', encoding = 'UTF-8') as file:
+        settings = json.load(file)
+    settings['database']['LocalData']['use_cache'] = use_cache
+
+    database = LocalData()
+    database.configure(settings)
+    return database
+
+
+def cache_meta(work_dir: str, name: str = 'linear_data') -> dict:
+    """
+    读取数据文件的缓存元数据
+
+    :param work_dir: 临时目录
+    :param name: 数据文件名
+    :return: 缓存元数据
+    """
+
+    with open(os.path.join(work_dir, 'cache', name, 'meta.json'), 'r', encoding = 'UTF-8') as file:
+        return json.load(file)
+
+
+def test_read_since() -> None:
+    """
+    按水位线只读取追加的行, 开启缓存时追加数据在原缓存版本上扩展, 数据文件被截断时返回 None
+    """
+
+    for use_cache in (True, False):
+        with tempfile.TemporaryDirectory() as work_dir:
+            database = local_data(work_dir, use_cache)
+            path = database.local_data_file_path['linear_data']
+
+            data, watermark = database.read_since('linear_data')
+            assert len(data) == 100 and watermark == {'rows': 100, 'offset': os.path.getsize(path)}
+            version = cache_meta(work_dir)['version'] if use_cache else None
+
+            data, watermark = database.read_since('linear_data', watermark)
+            assert len(data) == 0 and watermark['rows'] == 100
+
+            write_linear_data(path, 30, seed = 1, header = False)
+            data, watermark = database.read_since('linear_data', watermark)
+            expected = np.loadtxt(path, delimiter = ',', skiprows = 101)
+            assert np.allclose(data.to_numpy(), expected)
+            assert watermark == {'rows': 130, 'offset': os.path.getsize(path)}
+            if use_cache:
+                assert cache_meta(work_dir)['version'] == version and cache_meta(work_dir)['rows'] == 130
+                assert np.allclose(database.read('linear_data').to_numpy(), np.loadtxt(path, delimiter = ',', skiprows = 1))
+
+            with open(path, 'r+', encoding = 'UTF-8') as file:
+                file.truncate(os.path.getsize(path) // 2)
+            assert database.read_since('linear_data', watermark) is None
+
+
+def test_uncacheable_recorded() -> None:
+    """
+    含非数值列的数据文件被记录为无法缓存, 文件变化前的读取不再尝试构建缓存
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        database = local_data(work_dir, True)
+        path = os.path.join(work_dir, 'labels.csv')
+        with open(path, 'w', encoding = 'UTF-8') as file:
+            file.write('x,label\n1.0,a\n2.0,b\n')
+        database.local_data_file_path['labels'] = path
+
+        assert list(database.read('labels')['label']) == ['a', 'b']
+        meta_path = os.path.join(work_dir, 'cache', 'labels', 'meta.json')
+        assert cache_meta(work_dir, 'labels')['cacheable'] is False
+        recorded = os.stat(meta_path).st_mtime_ns
+
+        assert len(database.read('labels')) == 2
+        assert os.stat(meta_path).st_mtime_ns == recorded
+
+        # 数据文件变化后重新判断
+        with open(path, 'w', encoding = 'UTF-8') as file:
+            file.write('x,label\n1.0,0\n2.0,1\n3.0,1\n')
+        assert len(database.read('labels')) == 3
+        assert cache_meta(work_dir, 'labels')['cacheable'] is True
+
+
+if __name__ == '__main__':
+    test_read_since()
+    test_uncacheable_recorded()
+    print('LocalData tests passed')
@@ -0,0 +1,44 @@
+import os
+import json
+import tempfile
+
+from utils import MetricsRecorder
+
+
+def test_render_reuse() -> None:
+    """
+    记录及格式未变化时复用已渲染的图像, 追加记录或新训练后重新渲染, 不残留临时文件
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'LinearRegression_metrics.jsonl')
+        recorder = MetricsRecorder(path, 'LinearRegression')
+        for epoch in range(1, 4):
+            recorder.record_epoch(epoch, 1.0 / epoch, None, 0.1, [0.01, 0.02])
+
+        svg_path = os.path.join(work_dir, 'LinearRegression_loss.svg')
+        assert MetricsRecorder.render(path, svg_path) == svg_path
+        rendered = os.stat(svg_path).st_mtime_ns
+        with open(f'{svg_path}.json', 'r', encoding = 'UTF-8') as file:
+            assert json.load(file)['run'] == recorder.run
+
+        MetricsRecorder.render(path, svg_path)
+        assert os.stat(svg_path).st_mtime_ns == rendered
+
+        png_path = os.path.join(work_dir, 'LinearRegression_loss.png')
+        MetricsRecorder.render(path, png_path)
+        with open(png_path, 'rb') as file:
+            assert file.read(8) == b'\x89PNG\r\n\x1a\n'
+
+        rerun = MetricsRecorder(path, 'LinearRegression')
+        rerun.record_epoch(1, 0.5, None, 0.1, [0.01])
+        MetricsRecorder.render(path, svg_path)
+        with open(f'{svg_path}.json', 'r', encoding = 'UTF-8') as file:
+            assert json.load(file)['run'] == rerun.run
+
+        assert not [entry for entry in os.listdir(work_dir) if entry.endswith('.tmp')]
+
+
+if __name__ == '__main__':
+    test_render_reuse()
+    print('MetricsRecorder tests passed')
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+
+from common import TaskState
+from utils.task import TaskManager, CancellationToken
+
+
+@TaskManager.long_task
+def hold(gate: threading.Event, cancel_token: CancellationToken = None) -> str:
+    """
+    阻塞至 gate被设置, 期间响应取消请求
+
+    :param gate: 放行事件
+    :param cancel_token: 取消令牌
+    :return: 固定返回 'released'
+    """
+
+    while not gate.wait(0.01):
+        cancel_token.raise_if_cancelled()
+
+    return 'released'
+
+
+@TaskManager.long_task
+def add(a: int, b: int) -> int:
+    """
+    求和
+
+    :param a: 加数
+    :param b: 加数
+    :return: 和
+    """
+
+    return a + b
+
+
+@TaskManager.long_task
+def record(log: list, value: str) -> None:
+    """
+    按执行顺序记录
+
+    :param log: 执行记录
+    :param value: 记录值
+    :return: 无
+    """
+
+    log.append(value)
+
+
+def task_manager(work_dir: str, max_workers: int = 1) -> TaskManager:
+    """
+    以临时目录存放历史记录的线程任务管理器
+
+    :param work_dir: 临时目录
+    :param max_workers: 最大并行任务数
+    :return: 任务管理器
+    """
+
+    manager = TaskManager(max_workers)
+    manager.history_path = os.path.join(work_dir, 'task_history.sqlite3')
+    return manager
+
+
+def finished(manager: TaskManager, task_id: str) -> TaskState:
+    """
+    等待任务结束
+
+    :param manager: 任务管理器
+    :param task_id: 任务 id
+    :return: 最终状态
+    """
+
+    task = manager.wait(task_id, None, 0)
+    while not task.is_finished():
+        task = manager.wait(task_id, task.state, 10)
+
+    return task.state
+
+
+def test_dedup_and_priority() -> None:
+    """
+    未结束的相同任务被合并, 等待中的任务按优先级执行, 合并时优先级提升至较大值
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = task_manager(work_dir)
+        gate = threading.Event()
+        log = []
+
+        blocker = manager.submit(hold, gate)
+        assert manager.submit(hold, gate) == blocker
+
+        low = manager.submit(record, log, 'low')
+        high = manager.submit(record, log, 'high', priority = 5)
+        boosted = manager.submit(record, log, 'boosted')
+        assert manager.submit(record, log, 'boosted', priority = 9) == boosted
+
+        gate.set()
+        for task_id in (blocker, low, high, boosted):
+            assert finished(manager, task_id) is TaskState.SUCCESS
+        assert log == ['boosted', 'high', 'low']
+
+        # 已结束的任务不再合并
+        assert manager.submit(hold, gate) != blocker
+
+
+def test_cancel() -> None:
+    """
+    等待中的任务被直接撤销, 运行中的任务在下一个安全点退出, 之后的任务正常执行
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = task_manager(work_dir)
+        gate = threading.Event()
+
+        running = manager.submit(hold, gate)
+        pending = manager.submit(add, 1, 2)
+        assert manager.cancel(pending).state is TaskState.REVOKED
+
+        manager.cancel(running)
+        assert finished(manager, running) is TaskState.REVOKED
+
+        follow = manager.submit(add, 3, 4)
+        assert finished(manager, follow) is TaskState.SUCCESS
+        assert manager.result(follow).task_future.result() == 7
+        # 被撤销的等待任务出队时被跳过, 不会再被执行
+        assert manager.result(pending).state is TaskState.REVOKED
+
+
+def test_on_success() -> None:
+    """
+    执行回调期间注册的回调在任务结束前执行, 任务成功结束后注册的回调立即执行
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = task_manager(work_dir)
+        gate = threading.Event()
+        results = []
+
+        task_id = manager.submit(hold, gate)
+
+        def register_late(result: str) -> None:
+            """
+            记录返回值, 并在回调执行期间注册新的回调
+
+            :param result: 任务返回值
+            :return: 无
+            """
+
+            results.append(('first', result))
+            manager.on_success(task_id, lambda late: results.append(('late', late)))
+
+        manager.on_success(task_id, register_late)
+        gate.set()
+        assert finished(manager, task_id) is TaskState.SUCCESS
+        assert results == [('first', 'released'), ('late', 'released')]
+
+        manager.on_success(task_id, lambda after: results.append(('after', after)))
+        assert results[-1] == ('after', 'released')
+
+
+def test_history_lookup() -> None:
+    """
+    被 ACK的任务移入历史记录后仍可查询, 不存在的任务抛出 ValueError
+    """
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        manager = task_manager(work_dir)
+        task_id = manager.submit(add, 1, 2)
+        assert finished(manager, task_id) is TaskState.SUCCESS
+
+        assert manager.result(task_id).task_future is not None
+        archived = manager.result(task_id)
+        assert archived.task_future is None and archived.state is TaskState.SUCCESS
+        assert manager.wait(task_id, TaskState.PENDING, 10).state is TaskState.SUCCESS
+
+        try:
+            manager.result('missing')
+            raise AssertionError('Missing task was found')
+        except ValueError:
+            pass
+
+
+if __name__ == '__main__':
+    test_dedup_and_priority()
+    test_cancel()
+    test_on_success()
+    test_history_lookup()
+    print('TaskManager tests passed')